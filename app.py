@@ -1,6 +1,7 @@
 import os
 import atexit
 import logging
+import multiprocessing
 from dotenv import load_dotenv
 
 from flask import Flask
@@ -41,6 +42,19 @@ def load_user(user_id):
     from models import User
     return User.query.get(int(user_id))
 
+# Telegram botunun çalışacağı yer: "worker" (ayrı bot_worker.py süreci) veya
+# "embedded" (web sürecinin içinde; tek süreçli geliştirme ortamı için)
+TELEGRAM_BOT_MODE = os.environ.get("TELEGRAM_BOT_MODE", "worker")
+
+# multiprocessing ile başlatılan yardımcı süreçler (ör. PDF oluşturma havuzu) ana
+# modülü yeniden import ettiği için app'i de import eder; bu süreçlerde tablo
+# oluşturma, bot, outbox dağıtıcısı ve zamanlayıcı başlatılmaz. spawn/forkserver
+# ana modülü, parent_process() ayarlanmadan önce (_inheriting sırasında) import eder.
+IS_CHILD_PROCESS = (
+    multiprocessing.parent_process() is not None
+    or getattr(multiprocessing.current_process(), '_inheriting', False)
+)
+
 # configure the database
 database_url = os.environ.get("DATABASE_URL")
 
@@ -71,8 +85,9 @@ with app.app_context():
     import models  # noqa: F401
     
     # Sadece tabloları oluştur, örnek veri ekleme (bu işlem routes.py'deki init_data ile yapılacak)
-    db.create_all()
-    print("Veritabanı tabloları oluşturuldu/doğrulandı")
+    if not IS_CHILD_PROCESS:
+        db.create_all()
+        print("Veritabanı tabloları oluşturuldu/doğrulandı")
 
 # Import routes after app is created to avoid circular imports
 from routes import *
@@ -121,13 +136,13 @@ def stop_bot():
 # Register shutdown hook
 atexit.register(stop_bot)
 
-# Aylık rapor zamanlayıcısını başlat
+# Aylık rapor zamanlayıcısını başlat (süreçler arasında yalnızca seçilen lider görevleri çalıştırır)
 def start_scheduler():
     try:
-        from scheduler import initialize_scheduler
-        scheduler = initialize_scheduler()
-        print("Aylık rapor zamanlayıcısı başlatıldı")
-        return scheduler
+        from scheduler_leader import scheduler_leader
+        scheduler_leader.start()
+        print("Zamanlayıcı lider seçimi başlatıldı")
+        return scheduler_leader
     except Exception as e:
         print(f"Zamanlayıcı başlatılamadı: {str(e)}")
         return None
@@ -136,15 +151,22 @@ def start_scheduler():
 def stop_scheduler(scheduler):
     if scheduler:
         try:
-            scheduler.shutdown()
+            scheduler.stop()
             print("Zamanlayıcı durduruldu")
         except Exception as e:
             print(f"Zamanlayıcı durdurulurken hata: {str(e)}")
 
 # Start bot and scheduler when app starts
-if os.environ.get("FLASK_ENV") != "test":  # Don't start during testing
+if os.environ.get("FLASK_ENV") != "test" and not IS_CHILD_PROCESS:  # Don't start during testing or in helper processes
     with app.app_context():
-        start_bot()
+        if TELEGRAM_BOT_MODE == "embedded":
+            start_bot()
+            # Outbox'taki Telegram mesajlarını gönderen dağıtıcıyı başlat
+            from outbox import outbox_dispatcher
+            outbox_dispatcher.start()
+        else:
+            # Polling ve gönderim bot_worker.py sürecinde; web worker'ları yalnızca outbox'a yazar
+            print("Telegram bot ayrı süreçte çalışıyor (bot_worker.py), web worker'da başlatılmadı")
         # Zamanlayıcıyı başlat ve global değişkene ata
         background_scheduler = start_scheduler()
         # Uygulama kapatıldığında zamanlayıcıyı durdur
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Aylık rapor PDF oluşturucusunun tekrar kullanımının etkisini ölçer
+
+Her PDF için yeni MonthlyReportRenderer oluşturmak ile tek bir ortak
+oluşturucu kullanmak arasındaki PDF başına ortalama süreyi yazdırır.
+Uygulama veya veritabanı gerektirmez; templates/ dizininin bulunduğu
+proje dizininde çalıştırılmalıdır.
+
+Kullanım:
+    python benchmark_pdf.py
+    python benchmark_pdf.py --count 20
+"""
+import os
+import time
+import argparse
+import tempfile
+from pdf_generator import MonthlyReportRenderer
+
+
+def benchmark_renderer(count=10):
+    """
+    Ortak oluşturucu ile her PDF için yeni oluşturucu arasındaki farkı ölçer
+
+    Returns:
+        dict: PDF başına ortalama süreler (saniye)
+    """
+    branch_data = {'reservation_count': 120, 'total_guests': 410, 'total_revenue': 52000.0}
+    staff_data = [
+        {'name': f'Personel {i}', 'reservation_count': 12, 'total_guests': 41, 'total_revenue': 5200.0}
+        for i in range(10)
+    ]
+
+    def run(shared_renderer):
+        started_at = time.perf_counter()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i in range(count):
+                renderer = shared_renderer or MonthlyReportRenderer()
+                html_content = renderer.render_html(branch_data, staff_data, 'Ocak', 2025, f'Şube {i}')
+                renderer.write_pdf(html_content, os.path.join(tmp_dir, f'{i}.pdf'))
+        return (time.perf_counter() - started_at) / count
+
+    fresh = run(None)
+    shared = run(MonthlyReportRenderer())
+    return {'fresh_per_pdf': round(fresh, 4), 'shared_per_pdf': round(shared, 4)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF oluşturucu tekrar kullanım ölçümü")
+    parser.add_argument('--count', type=int, default=10, help="Her yöntem için oluşturulacak PDF sayısı")
+    args = parser.parse_args()
+
+    result = benchmark_renderer(args.count)
+    print(f"Her PDF için yeni oluşturucu: {result['fresh_per_pdf']} sn/PDF")
+    print(f"Ortak oluşturucu:             {result['shared_per_pdf']} sn/PDF")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Telegram bot süreci
+
+Telegram polling (veya webhook) ve outbox mesajlarının gönderimi yalnızca bu
+süreçte çalışır. gunicorn web worker'ları botu başlatmaz; bildirimleri ve
+komut yanıtlarını outbox tablosuna yazar, bu süreç onları gönderir.
+PostgreSQL'de yeni mesajlar LISTEN/NOTIFY ile hemen alınır.
+
+Kullanım:
+    python bot_worker.py
+"""
+
+import os
+import sys
+import signal
+import logging
+import threading
+
+# app import edilirken web tarafındaki bot başlatma adımı atlanır
+os.environ['TELEGRAM_BOT_MODE'] = 'worker'
+
+from app import app
+import telegram_service
+from outbox import outbox_dispatcher
+from telegram_sender import telegram_sender
+from command_executor import command_executor
+
+logger = logging.getLogger(__name__)
+
+# Bot durumunun kontrol aralığı (saniye)
+BOT_HEALTH_CHECK_INTERVAL = 60
+
+
+def start_bot():
+    """Telegram botunu polling veya webhook modunda başlatır"""
+    use_webhook = os.environ.get('USE_WEBHOOK', 'false').lower() == 'true'
+
+    with app.app_context():
+        if use_webhook:
+            webhook_url = os.environ.get('WEBHOOK_URL')
+            if not webhook_url:
+                logger.error("USE_WEBHOOK=true olarak ayarlandı ancak WEBHOOK_URL tanımlanmamış!")
+                sys.exit(1)
+            telegram_service.start_webhook(
+                webhook_url,
+                int(os.environ.get('WEBHOOK_PORT', 8443)),
+                os.environ.get('WEBHOOK_CERT_PATH'),
+                os.environ.get('WEBHOOK_PRIVATE_KEY_PATH')
+            )
+        else:
+            telegram_service.start_telegram_bot()
+
+
+def configure_logging():
+    """Bot sürecinin loglarını dosyaya ve konsola yazar"""
+    base_dir = os.path.abspath(os.path.dirname(__file__))
+    logs_dir = os.path.join(base_dir, 'logs')
+    os.makedirs(logs_dir, exist_ok=True)
+
+    logging.basicConfig(
+        level=getattr(logging, os.environ.get('LOG_LEVEL', 'INFO').upper(), logging.INFO),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.environ.get('BOT_LOG_FILE', os.path.join(logs_dir, 'bot.log'))),
+            logging.StreamHandler()
+        ],
+        force=True
+    )
+
+
+def main():
+    configure_logging()
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info(f"Sinyal alındı ({signum}), bot süreci durduruluyor...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    logger.info(f"Telegram bot süreci başlatılıyor (PID {os.getpid()})")
+    start_bot()
+    outbox_dispatcher.start()
+
+    while not stop_event.wait(BOT_HEALTH_CHECK_INTERVAL):
+        if not telegram_service.bot_is_running():
+            logger.warning("Telegram bot çalışmıyor, yeniden başlatılıyor")
+            start_bot()
+        command_stats = command_executor.stats()
+        if command_stats['queue_depth']:
+            logger.info(f"Komut havuzu: {command_stats}")
+        logger.debug(f"Outbox: {outbox_dispatcher.stats()}, gönderici: {telegram_sender.stats()}, komutlar: {command_stats}")
+
+    outbox_dispatcher.stop()
+    telegram_service.stop_telegram_bot()
+    command_executor.stop()
+    telegram_sender.stop()
+    logger.info("Telegram bot süreci durduruldu")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Telegram komutlarını işleyen thread sayısı (her biri en fazla bir veritabanı bağlantısı kullanır)
+TELEGRAM_COMMAND_WORKERS = int(os.environ.get('TELEGRAM_COMMAND_WORKERS', 4))
+# İşlenmeyi bekleyebilecek en fazla komut; kuyruk doluysa yeni komut reddedilir
+TELEGRAM_COMMAND_QUEUE_SIZE = int(os.environ.get('TELEGRAM_COMMAND_QUEUE_SIZE', 50))
+
+
+class CommandExecutor:
+    """
+    Telegram komutlarının veritabanı işleri için sabit boyutlu thread havuzu
+
+    Her komut için yeni thread açılmaz; en fazla `workers` komut aynı anda
+    işlenir, `queue_size` komut sırada bekler. Böylece komut yağmurunda açılan
+    thread ve veritabanı bağlantısı sayısı sınırlı kalır. Kuyruk doluysa
+    submit() None döndürür ve çağıran kullanıcıya yoğunluk mesajı verir.
+    """
+
+    def __init__(self, workers=TELEGRAM_COMMAND_WORKERS, queue_size=TELEGRAM_COMMAND_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = None
+        self._pending = 0
+        self._running = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.total_processing = 0.0
+        self.max_processing = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        İşi havuza ekler
+
+        Returns:
+            concurrent.futures.Future veya None: Kuyruk doluysa None
+        """
+        executor = self._ensure_executor()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            logger.warning(f"Telegram komut kuyruğu dolu ({self.queue_size}), komut reddedildi")
+            return None
+
+        queued_at = time.monotonic()
+        with self._lock:
+            self.submitted += 1
+            self._pending += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth())
+        try:
+            return executor.submit(self._run, queued_at, fn, args, kwargs)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+            raise
+
+    def queue_depth(self):
+        """Henüz işlenmeye başlamamış komut sayısı"""
+        return max(0, self._pending - self._running)
+
+    def is_busy(self):
+        """Tüm thread'ler meşgulse True; yeni komut sırada bekler"""
+        return self._pending >= self.workers
+
+    def stop(self, wait=True):
+        """Kuyruktaki işlerin bitmesini bekler ve havuzu kapatır"""
+        with self._lock:
+            executor = self._executor
+            if executor is None or self._pid != os.getpid():
+                return
+            self._executor = None
+        executor.shutdown(wait=wait)
+
+    def stats(self):
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                'running': self._running,
+                'queue_depth': self.queue_depth(),
+                'max_queue_depth': self.max_queue_depth,
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'failed': self.failed,
+                'avg_wait': round(self.total_wait / finished, 3) if finished else 0.0,
+                'avg_processing': round(self.total_processing / finished, 3) if finished else 0.0,
+                'max_processing': round(self.max_processing, 3),
+            }
+
+    def _ensure_executor(self):
+        with self._lock:
+            # fork sonrası her süreç kendi havuzunu açar
+            if self._executor is not None and self._pid == os.getpid():
+                return self._executor
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='telegram-command')
+            self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+            self._pid = os.getpid()
+            self._pending = 0
+            self._running = 0
+            return self._executor
+
+    def _run(self, queued_at, fn, args, kwargs):
+        started_at = time.monotonic()
+        with self._lock:
+            self._running += 1
+            self.total_wait += started_at - queued_at
+        succeeded = False
+        try:
+            result = fn(*args, **kwargs)
+            succeeded = True
+            return result
+        except Exception as e:
+            logger.error(f"Telegram komutu işlenirken hata: {e}", exc_info=True)
+            raise
+        finally:
+            elapsed = time.monotonic() - started_at
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+                self.total_processing += elapsed
+                self.max_processing = max(self.max_processing, elapsed)
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            self._slots.release()
+
+
+# Bot sürecinde Telegram komutlarını işleyen ortak havuz
+command_executor = CommandExecutor()
+atexit.register(command_executor.stop)
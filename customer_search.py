@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+from sqlalchemy import bindparam, func, or_, text
+from app import db
+from models import Customer, normalize_phone
+
+logger = logging.getLogger(__name__)
+
+# Trigram aramaları için gereken en kısa arama terimi
+MIN_TRIGRAM_LENGTH = 3
+
+# Arama altyapısının kullanılabilir olup olmadığı (veritabanı başına bir kez kontrol edilir)
+_backend_lock = threading.Lock()
+_backend_available = {}
+
+# PostgreSQL: pg_trgm GIN indeksleri (ILIKE '%...%' ve benzerlik sıralaması için)
+POSTGRES_SEARCH_INDEXES = ('ix_customers_name_trgm', 'ix_customers_email_trgm', 'ix_customers_phone_digits_trgm')
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_customers_name_trgm ON customers USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_customers_email_trgm ON customers USING gin (email gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_customers_phone_digits_trgm ON customers USING gin (phone_digits gin_trgm_ops)",
+]
+
+# SQLite: customers tablosunu izleyen FTS5 (trigram) gölge tablosu ve senkronizasyon tetikleyicileri
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(
+        name, email, phone_digits,
+        content='customers', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS customers_fts_ai AFTER INSERT ON customers BEGIN
+        INSERT INTO customers_fts(rowid, name, email, phone_digits)
+        VALUES (new.id, new.name, new.email, new.phone_digits);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS customers_fts_ad AFTER DELETE ON customers BEGIN
+        INSERT INTO customers_fts(customers_fts, rowid, name, email, phone_digits)
+        VALUES ('delete', old.id, old.name, old.email, old.phone_digits);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS customers_fts_au AFTER UPDATE ON customers BEGIN
+        INSERT INTO customers_fts(customers_fts, rowid, name, email, phone_digits)
+        VALUES ('delete', old.id, old.name, old.email, old.phone_digits);
+        INSERT INTO customers_fts(rowid, name, email, phone_digits)
+        VALUES (new.id, new.name, new.email, new.phone_digits);
+    END""",
+    "INSERT INTO customers_fts(customers_fts) VALUES ('rebuild')",
+]
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def ensure_search_indexes():
+    """
+    Veritabanına uygun arama indekslerini oluşturur (tekrar çalıştırılabilir)
+
+    Returns:
+        bool: İndeksler oluşturulduysa True
+    """
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        statements = POSTGRES_SEARCH_DDL
+    elif dialect == 'sqlite':
+        statements = SQLITE_SEARCH_DDL
+    else:
+        logger.warning(f"Müşteri arama indeksleri bu veritabanı için desteklenmiyor: {dialect}")
+        return False
+
+    for statement in statements:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+    with _backend_lock:
+        _backend_available.pop(dialect, None)
+    return True
+
+
+def _search_backend():
+    """Kullanılabilir arama altyapısını döndürür: 'trgm', 'fts5' veya None"""
+    dialect = _dialect()
+    with _backend_lock:
+        if dialect in _backend_available:
+            return _backend_available[dialect]
+
+    backend = None
+    try:
+        if dialect == 'postgresql':
+            # Eklentiyle birlikte tüm trigram indeksleri de bulunmalı; biri eksikse sorgu tablo taraması yapar
+            extension = db.session.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).scalar()
+            index_count = db.session.execute(
+                text("SELECT count(*) FROM pg_indexes WHERE tablename = 'customers' AND indexname IN :names")
+                .bindparams(bindparam('names', expanding=True)),
+                {'names': list(POSTGRES_SEARCH_INDEXES)}
+            ).scalar()
+            backend = 'trgm' if extension and index_count == len(POSTGRES_SEARCH_INDEXES) else None
+        elif dialect == 'sqlite':
+            exists = db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customers_fts'")
+            ).scalar()
+            backend = 'fts5' if exists else None
+    except Exception as e:
+        logger.error(f"Arama altyapısı kontrol edilirken hata: {e}")
+        db.session.rollback()
+
+    if backend is None:
+        logger.warning("Müşteri arama indeksleri bulunamadı, ILIKE taramasına dönülüyor "
+                       "(python update_customer_search.py ile oluşturabilirsiniz)")
+
+    with _backend_lock:
+        _backend_available[dialect] = backend
+    return backend
+
+
+def _match_filter(search_query, digits, raw_phone=True):
+    """
+    İsim, e-posta ve telefon için alt-dizgi eşleşme filtresi
+
+    raw_phone=False iken ham telefon sütunu koşula eklenmez; böylece koşulların
+    hepsi trigram indeksli sütunlarda kalır ve PostgreSQL BitmapOr kullanabilir.
+    Telefon eşleşmesi o durumda normalize edilmiş phone_digits üzerinden yapılır.
+    """
+    search_term = f"%{search_query}%"
+    conditions = [Customer.name.ilike(search_term)]
+    if raw_phone:
+        conditions.append(Customer.phone.ilike(search_term))
+    conditions.append(Customer.email.ilike(search_term))
+    if digits:
+        conditions.append(Customer.phone_digits.like(f"%{digits}%"))
+    return or_(*conditions)
+
+
+def _search_trgm(search_query, digits, limit):
+    """PostgreSQL: GIN trigram indeksli eşleşme, benzerliğe göre sıralama"""
+    lowered = search_query.lower()
+    rank = func.greatest(
+        func.similarity(Customer.name, lowered),
+        func.similarity(func.coalesce(Customer.email, ''), lowered),
+        func.similarity(func.coalesce(Customer.phone_digits, ''), digits or lowered),
+    )
+    return Customer.query.filter(
+        _match_filter(search_query, digits, raw_phone=False)
+    ).order_by(rank.desc(), Customer.updated_at.desc()).limit(limit).all()
+
+
+def _search_fts5(search_query, digits, limit):
+    """SQLite: FTS5 trigram gölge tablosunda eşleşme, bm25 puanına göre sıralama"""
+    terms = [search_query]
+    if digits and digits != search_query:
+        terms.append(digits)
+    match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+    rows = db.session.execute(
+        text("SELECT rowid FROM customers_fts WHERE customers_fts MATCH :match ORDER BY rank LIMIT :limit"),
+        {'match': match, 'limit': limit}
+    ).all()
+    ids = [row[0] for row in rows]
+    if not ids:
+        return []
+
+    customers = {c.id: c for c in Customer.query.filter(Customer.id.in_(ids)).all()}
+    return [customers[customer_id] for customer_id in ids if customer_id in customers]
+
+
+def search_customers(search_query, limit=50):
+    """
+    Müşterileri isim, telefon veya e-posta ile arar
+
+    Telefon aramasında numaradaki boşluk, tire ve parantezler yok sayılır.
+    Sonuçlar eşleşme kalitesine göre sıralanır; arama indeksi yoksa veya terim
+    trigram için çok kısaysa ILIKE taramasına dönülür.
+
+    Args:
+        search_query: Arama terimi
+        limit: En fazla sonuç sayısı
+
+    Returns:
+        list: Customer nesneleri
+    """
+    search_query = (search_query or '').strip()
+    if not search_query:
+        return Customer.query.order_by(Customer.updated_at.desc()).limit(limit).all()
+
+    # Terim sadece telefon karakterlerinden oluşuyorsa rakamlarla da ara
+    digits = normalize_phone(search_query)
+    if len(digits) < MIN_TRIGRAM_LENGTH or not all(ch.isdigit() or ch in ' +-()./' for ch in search_query):
+        digits = ''
+
+    if len(search_query) >= MIN_TRIGRAM_LENGTH:
+        backend = _search_backend()
+        try:
+            if backend == 'trgm':
+                return _search_trgm(search_query, digits, limit)
+            if backend == 'fts5':
+                return _search_fts5(search_query, digits, limit)
+        except Exception as e:
+            logger.error(f"İndeksli müşteri araması başarısız, ILIKE taramasına dönülüyor: {e}")
+            db.session.rollback()
+
+    return Customer.query.filter(
+        _match_filter(search_query, digits)
+    ).order_by(Customer.updated_at.desc()).limit(limit).all()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Günlük rapor özetleri (reservation_daily_stats) için yönetim betiği
+
+Kullanım:
+    python daily_stats.py rebuild                          # Tüm geçmişi yeniden oluştur
+    python daily_stats.py rebuild --start 2024-01-01       # Belirli tarihten itibaren
+    python daily_stats.py rebuild --start 2024-01-01 --end 2024-01-31
+    python daily_stats.py check                            # Rollup'ı ham verilerle karşılaştır
+    python daily_stats.py check --fix                      # Uyuşmayan günleri yeniden oluştur
+"""
+import sys
+import argparse
+from datetime import datetime
+from app import app
+from report_service import rebuild_daily_stats, check_daily_stats, get_daily_stats_watermark
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Günlük rapor özetleri yönetimi')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rebuild_parser = subparsers.add_parser('rebuild', help='Rollup tablosunu ham rezervasyonlardan yeniden oluşturur')
+    rebuild_parser.add_argument('--start', type=parse_date, help='Başlangıç tarihi (YYYY-MM-DD)')
+    rebuild_parser.add_argument('--end', type=parse_date, help='Bitiş tarihi (YYYY-MM-DD), varsayılan: dün')
+
+    check_parser = subparsers.add_parser('check', help='Rollup tablosunu ham rezervasyonlarla karşılaştırır')
+    check_parser.add_argument('--start', type=parse_date, help='Başlangıç tarihi (YYYY-MM-DD)')
+    check_parser.add_argument('--end', type=parse_date, help='Bitiş tarihi (YYYY-MM-DD)')
+    check_parser.add_argument('--fix', action='store_true', help='Uyuşmayan günleri yeniden oluştur')
+
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.command == 'rebuild':
+            print("Günlük rapor özetleri yeniden oluşturuluyor...")
+            row_count = rebuild_daily_stats(args.start, args.end)
+            print(f"{row_count} özet satırı yazıldı")
+            print(f"Rollup tamamlanan son gün: {get_daily_stats_watermark()}")
+
+        elif args.command == 'check':
+            if get_daily_stats_watermark() is None:
+                print("Rollup henüz oluşturulmamış. Önce 'python daily_stats.py rebuild' çalıştırın.")
+                return 1
+
+            mismatches = check_daily_stats(args.start, args.end)
+            if not mismatches:
+                print("Rollup ham verilerle tutarlı")
+                return 0
+
+            for mismatch in mismatches:
+                branch_id, staff_id, stat_date = mismatch['key']
+                print(f"Şube {branch_id} / Personel {staff_id} / {stat_date}: "
+                      f"{mismatch['column']} rollup={mismatch['rollup']} ham={mismatch['raw']}")
+            print(f"Toplam {len(mismatches)} uyuşmazlık bulundu")
+
+            if args.fix:
+                dates = sorted({mismatch['key'][2] for mismatch in mismatches})
+                for stat_date in dates:
+                    rebuild_daily_stats(stat_date, stat_date)
+                print(f"{len(dates)} gün yeniden oluşturuldu")
+                return 0
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+from app import db
+
+
+def create_table_indexes(table):
+    """
+    Modelde tanımlı indeksleri oluşturur ve tabloyu analiz eder (tekrar çalıştırılabilir)
+
+    PostgreSQL'de indeksler tabloyu kilitlememek için CONCURRENTLY ile,
+    transaction dışında (AUTOCOMMIT) oluşturulur. Uygulama bağlamında çağrılmalıdır.
+
+    Args:
+        table: SQLAlchemy Table nesnesi (ör. Reservation.__table__)
+
+    Returns:
+        list: Oluşturulan/doğrulanan indeks adları
+    """
+    dialect = db.engine.dialect
+    indexes = sorted(table.indexes, key=lambda index: index.name)
+
+    if dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY bir transaction içinde çalıştırılamaz
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            for index in indexes:
+                statement = str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+                statement = statement.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+                connection.execute(text(statement))
+                print(f"{index.name} indeksi oluşturuldu/doğrulandı.")
+            connection.execute(text(f"ANALYZE {table.name}"))
+    else:
+        for index in indexes:
+            db.session.execute(CreateIndex(index, if_not_exists=True))
+            print(f"{index.name} indeksi oluşturuldu/doğrulandı.")
+        db.session.execute(text(f"ANALYZE {table.name}"))
+        db.session.commit()
+
+    return [index.name for index in indexes]
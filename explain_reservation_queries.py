@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rezervasyon tablosundaki sık kullanılan sorguların EXPLAIN planlarını yazdırır
+
+Sorgular routes.py, telegram_service.py ve report_service.py içindeki erişim
+desenlerinin aynısıdır. Örnek parametreler veritabanındaki ilk şube, personel
+ve müşteriden alınır.
+
+Kullanım:
+    python explain_reservation_queries.py
+    python explain_reservation_queries.py --analyze    # PostgreSQL: EXPLAIN ANALYZE
+"""
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app import app, db
+from models import Reservation, Branch, Staff, Customer
+from report_service import raw_aggregate_query
+from telegram_service import upcoming_reservations_query, REZ_DEFAULT_LIMIT
+
+
+def hot_queries():
+    """
+    İncelenecek sorguları örnek parametrelerle oluşturur
+
+    Returns:
+        list: (sorgu adı, SQLAlchemy sorgusu) çiftleri
+    """
+    branch = Branch.query.order_by(Branch.id).first()
+    staff = Staff.query.order_by(Staff.id).first()
+    customer = Customer.query.order_by(Customer.id).first()
+    branch_id = branch.id if branch else 1
+    staff_id = staff.id if staff else 1
+    customer_id = customer.id if customer else 1
+
+    now = datetime.now() + timedelta(hours=3)
+    today = now.date()
+    week_start = today - timedelta(days=today.weekday())
+    week_end = week_start + timedelta(days=6)
+    month_start = today.replace(day=1)
+
+    return [
+        ('Rezervasyon tablosu (şube + hafta, iptal edilmemiş)', Reservation.query.filter(
+            Reservation.branch_id == branch_id,
+            Reservation.reservation_date.between(week_start, week_end),
+            Reservation.is_canceled == False
+        )),
+        ('Telegram /rez (şube, yaklaşan, iptal edilmemiş, sayfa)', upcoming_reservations_query(
+            branch_id, days=7
+        ).limit(REZ_DEFAULT_LIMIT + 1)),
+        ('Şube raporu (tek şube, ay)', raw_aggregate_query(
+            month_start, today, group_by=('branch_id',), branch_id=branch_id
+        )),
+        ('Şube özeti (tüm şubeler, ay)', raw_aggregate_query(
+            month_start, today, group_by=('branch_id',)
+        )),
+        ('Personel performansı (ay)', raw_aggregate_query(
+            month_start, today, group_by=('staff_id',), staff_ids=[staff_id]
+        )),
+        ('Personel silme', Reservation.query.filter(Reservation.staff_id == staff_id)),
+        ('Müşteri detayı', Reservation.query.filter(
+            Reservation.customer_id == customer_id
+        ).order_by(Reservation.reservation_date.desc())),
+    ]
+
+
+def explain(query, analyze=False):
+    """
+    Sorgunun planını veritabanına uygun EXPLAIN komutuyla döndürür
+
+    Returns:
+        list: Plan satırları
+    """
+    dialect = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+    if dialect.name == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+        return [row[0] for row in db.session.execute(text(prefix + sql)).all()]
+    if dialect.name == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[3] for row in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).all()]
+    return [row[0] for row in db.session.execute(text('EXPLAIN ' + sql)).all()]
+
+
+def print_plans(title, analyze=False):
+    """Tüm sorguların planlarını başlık altında yazdırır"""
+    print(f"\n===== {title} ({db.engine.dialect.name}) =====")
+    for name, query in hot_queries():
+        print(f"\n--- {name}")
+        try:
+            for line in explain(query, analyze=analyze):
+                print(f"    {line}")
+        except Exception as e:
+            db.session.rollback()
+            print(f"    EXPLAIN başarısız: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rezervasyon sorgularının EXPLAIN planları')
+    parser.add_argument('--analyze', action='store_true', help='PostgreSQL için EXPLAIN ANALYZE kullan')
+    args = parser.parse_args()
+
+    with app.app_context():
+        print_plans('Sorgu planları', analyze=args.analyze)
+
+
+if __name__ == '__main__':
+    main()
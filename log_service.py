@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import gzip
+import json
+import logging
+from datetime import datetime, timedelta, time
+from sqlalchemy import tuple_
+from app import db
+from models import Log
+
+logger = logging.getLogger(__name__)
+
+# Log sayfası için varsayılan ve en fazla kayıt sayısı
+LOGS_PER_PAGE = 50
+MAX_LOGS_PER_PAGE = 200
+
+# Loglar UTC tutulur, tarih filtreleri Türkiye saatine göre girilir
+TURKEY_UTC_OFFSET = timedelta(hours=3)
+
+# Bu süreden eski loglar arşiv dosyasına taşınır (gün)
+LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', 180))
+# Tek seferde taşınıp silinecek log sayısı (kilitleri kısa tutmak için)
+LOG_PURGE_CHUNK_SIZE = int(os.environ.get('LOG_PURGE_CHUNK_SIZE', 5000))
+# Aylık JSONL.gz arşiv dosyalarının dizini
+LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR', os.path.join('logs', 'archive'))
+
+
+def encode_log_cursor(log):
+    """Sayfanın son kaydından bir sonraki sayfanın imlecini oluşturur"""
+    return f"{log.created_at.isoformat()}_{log.id}"
+
+
+def decode_log_cursor(cursor):
+    """
+    İmleci (created_at, id) çiftine çevirir
+
+    Returns:
+        tuple veya None: Geçersiz imleçte None
+    """
+    if not cursor:
+        return None
+    try:
+        created_at, log_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(log_id)
+    except ValueError:
+        return None
+
+
+def fetch_logs_page(branch_id=None, log_type=None, action=None, start_date=None, end_date=None,
+                    cursor=None, per_page=LOGS_PER_PAGE):
+    """
+    Logları en yeniden eskiye, imleç (keyset) tabanlı sayfalama ile getirir
+
+    OFFSET yerine son görülen (created_at, id) çiftinden devam edildiği için
+    derin sayfalar ilk sayfa kadar ucuzdur; sorgular
+    (branch_id, log_type, created_at, id) ve (created_at, id) indekslerini kullanır.
+
+    Args:
+        branch_id: Şube ID filtresi
+        log_type: Log tipi filtresi (RESERVATION, TIME, CUSTOMER, SYSTEM)
+        action: İşlem filtresi (CREATE, UPDATE, DELETE, ...)
+        start_date: Başlangıç tarihi (dahil, Türkiye saati)
+        end_date: Bitiş tarihi (dahil, Türkiye saati)
+        cursor: Önceki sayfanın next_cursor değeri
+        per_page: Sayfa başına kayıt sayısı
+
+    Returns:
+        tuple: (loglar, sonraki sayfa imleci veya None)
+    """
+    per_page = max(1, min(per_page, MAX_LOGS_PER_PAGE))
+    query = Log.query
+
+    if branch_id is not None:
+        query = query.filter(Log.branch_id == branch_id)
+    if log_type:
+        query = query.filter(Log.log_type == log_type)
+    if action:
+        query = query.filter(Log.action == action)
+    if start_date:
+        query = query.filter(Log.created_at >= datetime.combine(start_date, time.min) - TURKEY_UTC_OFFSET)
+    if end_date:
+        query = query.filter(
+            Log.created_at < datetime.combine(end_date + timedelta(days=1), time.min) - TURKEY_UTC_OFFSET
+        )
+
+    position = decode_log_cursor(cursor)
+    if position:
+        query = query.filter(tuple_(Log.created_at, Log.id) < position)
+
+    logs = query.order_by(Log.created_at.desc(), Log.id.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(logs) > per_page:
+        logs = logs[:per_page]
+        next_cursor = encode_log_cursor(logs[-1])
+
+    return logs, next_cursor
+
+
+def _log_to_dict(log):
+    return {
+        'id': log.id,
+        'log_type': log.log_type,
+        'action': log.action,
+        'details': log.details,
+        'user_id': log.user_id,
+        'branch_id': log.branch_id,
+        'created_at': log.created_at.isoformat(),
+    }
+
+
+def _append_to_archive(logs, archive_dir):
+    """
+    Logları ay bazında logs-YYYY-MM.jsonl.gz dosyalarına ekler
+
+    Her çağrı dosyaya yeni bir gzip bloğu ekler; gzip/zcat dosyayı tek parça okur.
+
+    Returns:
+        set: Yazılan dosya yolları
+    """
+    by_month = {}
+    for log in logs:
+        by_month.setdefault(log.created_at.strftime('%Y-%m'), []).append(log)
+
+    os.makedirs(archive_dir, exist_ok=True)
+    paths = set()
+    for month, month_logs in by_month.items():
+        path = os.path.join(archive_dir, f"logs-{month}.jsonl.gz")
+        with open(path, 'ab') as raw_file:
+            with gzip.GzipFile(fileobj=raw_file, mode='ab') as archive_file:
+                for log in month_logs:
+                    archive_file.write((json.dumps(_log_to_dict(log), ensure_ascii=False) + '\n').encode('utf-8'))
+            raw_file.flush()
+            os.fsync(raw_file.fileno())
+        paths.add(path)
+    return paths
+
+
+def archive_old_logs(retention_days=LOG_RETENTION_DAYS, chunk_size=LOG_PURGE_CHUNK_SIZE,
+                     archive_dir=LOG_ARCHIVE_DIR, max_chunks=None):
+    """
+    Saklama süresini aşan logları arşiv dosyalarına taşır ve tablodan siler
+
+    Loglar en eskiden başlayarak chunk_size'lık parçalar halinde işlenir; her
+    parça önce arşive yazılıp diske senkronlanır, sonra kendi kısa
+    transaction'ında silinir. Silme öncesi bir kesinti olursa aynı kayıtlar bir
+    sonraki çalışmada tekrar arşive yazılabilir (kayıt kaybı olmaz).
+
+    Args:
+        retention_days: Tabloda tutulacak gün sayısı
+        chunk_size: Parça başına log sayısı
+        archive_dir: Arşiv dizini
+        max_chunks: En fazla işlenecek parça sayısı (None: hepsi)
+
+    Returns:
+        dict: archived (taşınan log sayısı), chunks, files, cutoff
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    archived = 0
+    chunks = 0
+    files = set()
+
+    while max_chunks is None or chunks < max_chunks:
+        logs = Log.query.filter(
+            Log.created_at < cutoff
+        ).order_by(Log.created_at, Log.id).limit(chunk_size).all()
+        if not logs:
+            break
+
+        try:
+            files |= _append_to_archive(logs, archive_dir)
+            ids = [log.id for log in logs]
+            Log.query.filter(Log.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        archived += len(logs)
+        chunks += 1
+        db.session.expunge_all()
+
+        if len(logs) < chunk_size:
+            break
+
+    if archived:
+        logger.info(f"{archived} log kaydı {chunks} parçada arşivlendi (sınır: {cutoff.isoformat()})")
+
+    return {
+        'archived': archived,
+        'chunks': chunks,
+        'files': sorted(files),
+        'cutoff': cutoff,
+    }
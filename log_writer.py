@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from app import app, db
+
+logger = logging.getLogger(__name__)
+
+# 'async': loglar kuyruğa alınır ve arka planda toplu yazılır, 'sync': her log hemen commit edilir
+LOG_WRITER_MODE = os.environ.get('LOG_WRITER_MODE', 'sync' if os.environ.get('FLASK_ENV') == 'test' else 'async')
+# Kuyruktaki logların en fazla ne kadar bekleyeceği (saniye)
+LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', 2))
+# Bu kadar log biriktiğinde süre dolmadan yazılır
+LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', 100))
+# Veritabanı yazamadığında bellekte tutulacak en fazla log sayısı
+LOG_MAX_PENDING = int(os.environ.get('LOG_MAX_PENDING', 10000))
+
+
+class AuditLogWriter:
+    """
+    Denetim logları (logs tablosu) için toplu yazıcı
+
+    Async modda Log.add_log çağrıları kullanıcı işleminin commit'ine eklenmez;
+    kayıtlar işlem içi kuyruğa alınır ve bir arka plan thread'i tarafından
+    LOG_FLUSH_INTERVAL saniyede bir veya LOG_BATCH_SIZE kayıt biriktiğinde tek
+    INSERT ile yazılır. Uygulama kapanırken kuyrukta kalanlar yazılır.
+    """
+
+    def __init__(self, mode=LOG_WRITER_MODE, flush_interval=LOG_FLUSH_INTERVAL,
+                 batch_size=LOG_BATCH_SIZE, max_pending=LOG_MAX_PENDING):
+        self.mode = mode
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0
+
+    def write(self, log_type, action, details, branch_id=None, user_id=None):
+        """Log kaydını moda göre hemen yazar veya kuyruğa ekler"""
+        if self.mode == 'sync':
+            from models import Log
+            log = Log(log_type=log_type, action=action, details=details, branch_id=branch_id, user_id=user_id)
+            db.session.add(log)
+            db.session.commit()
+            return log
+
+        row = {
+            'log_type': log_type,
+            'action': action,
+            'details': details,
+            'branch_id': branch_id,
+            'user_id': user_id,
+            # Kaydın yazıldığı değil, olayın gerçekleştiği an
+            'created_at': datetime.utcnow(),
+        }
+
+        with self._condition:
+            self._ensure_thread()
+            self._pending.append(row)
+            self._trim()
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+        return None
+
+    def flush(self):
+        """
+        Kuyruktaki tüm logları hemen yazar
+
+        Returns:
+            int: Yazılan kayıt sayısı
+        """
+        written = 0
+        while True:
+            with self._condition:
+                if not self._pending:
+                    return written
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+
+            if not self._insert(batch):
+                # Yazılamayanları sıranın başına geri koy, bir sonraki denemede tekrar yazılır
+                with self._condition:
+                    self._pending.extendleft(reversed(batch))
+                    self._trim()
+                return written
+            written += len(batch)
+
+    def stop(self):
+        """Arka plan thread'ini durdurur ve kuyrukta kalanları yazar"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+            thread = self._thread
+        if thread and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self):
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            'mode': self.mode,
+            'pending': pending,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failures': self.failures,
+        }
+
+    def _ensure_thread(self):
+        # gunicorn fork sonrası her worker kendi thread'ini başlatır
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        if self._pid != os.getpid():
+            self._pending.clear()
+            self._stopping = False
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+        self._thread.start()
+
+    def _trim(self):
+        # Veritabanı uzun süre yazılamazsa belleği korumak için en eski kayıtları at
+        while len(self._pending) > self.max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._condition.wait(timeout=self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def _insert(self, rows):
+        """Kayıtları ayrı bir bağlantı üzerinden tek INSERT ile yazar"""
+        from models import Log
+        with self._write_lock:
+            try:
+                with app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(Log.__table__.insert(), rows)
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"{len(rows)} log kaydı yazılamadı: {e}")
+                return False
+            self.written += len(rows)
+            return True
+
+
+# Uygulama genelinde kullanılan log yazıcısı
+audit_log_writer = AuditLogWriter()
+atexit.register(audit_log_writer.stop)
@@ -1,3 +1,10 @@
+import os
+
+# Geliştirme sunucusu tek süreçtir; Telegram botu uygulama içinde çalışır
+# (gunicorn main:app ile çalışırken bot ayrı bot_worker.py sürecindedir)
+if __name__ == "__main__":
+    os.environ.setdefault("TELEGRAM_BOT_MODE", "embedded")
+
 from app import app
 import logging
 
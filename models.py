@@ -1,7 +1,8 @@
+import re
 from app import db
 from datetime import datetime
-from sqlalchemy import ForeignKey, Table, Column
-from sqlalchemy.orm import relationship
+from sqlalchemy import ForeignKey, Table, Column, text
+from sqlalchemy.orm import relationship, validates
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 
@@ -17,15 +18,15 @@ class Setting(db.Model):
     
     @classmethod
     def get(cls, key, default=None):
-        """Get a setting value by key"""
-        setting = cls.query.filter_by(key=key).first()
-        if setting:
-            return setting.value
-        return default
+        """Get a setting value by key (served from settings_cache)"""
+        from settings_cache import settings_cache
+        return settings_cache.get(key, default)
     
     @classmethod
     def set(cls, key, value, description=None):
-        """Set a setting value"""
+        """Set a setting value and invalidate the settings cache in all workers"""
+        from settings_cache import settings_cache, bump_cache_version, SETTINGS_VERSION_NAME
+        
         setting = cls.query.filter_by(key=key).first()
         if setting:
             setting.value = value
@@ -35,9 +36,21 @@ class Setting(db.Model):
         else:
             setting = cls(key=key, value=value, description=description)
             db.session.add(setting)
+        bump_cache_version(SETTINGS_VERSION_NAME)
         db.session.commit()
+        settings_cache.invalidate()
         return setting
 
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+    
+    # Worker'lar arası önbellek geçersiz kılma sayaçları (örn. 'settings')
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CacheVersion {self.name}={self.version}>'
+
 class Branch(db.Model):
     __tablename__ = 'branches'
     
@@ -71,16 +84,23 @@ class Staff(db.Model):
     def __repr__(self):
         return f'<Staff {self.name}>'
 
+def normalize_phone(phone):
+    """Telefon numarasını sadece rakamlardan oluşan aranabilir biçime getirir"""
+    if not phone:
+        return ''
+    return re.sub(r'\D', '', phone)
+
 class Customer(db.Model):
     __tablename__ = 'customers'
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20), nullable=False, unique=True)
+    phone_digits = db.Column(db.String(20), nullable=True, index=True)  # Sadece rakamlar (arama için)
     email = db.Column(db.String(100), nullable=True)
     notes = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     reservations = relationship("Reservation", back_populates="customer")
@@ -88,13 +108,89 @@ class Customer(db.Model):
     def __repr__(self):
         return f'<Customer {self.name}>'
     
+    @validates('phone')
+    def validate_phone(self, key, phone):
+        """Keep the normalized phone column in sync with the phone number"""
+        self.phone_digits = normalize_phone(phone)
+        return phone
+    
+    @classmethod
+    def load_analytics(cls, customers):
+        """
+        Load visit statistics for a list of customers with two grouped queries
+        
+        The results are attached to each customer so that the analytics
+        properties below don't lazy-load every reservation (N+1 queries).
+        """
+        customers = [c for c in customers if c.id is not None]
+        if not customers:
+            return customers
+        
+        customer_ids = [c.id for c in customers]
+        analytics = {
+            customer_id: {
+                'total_visits': 0,
+                'total_spending': 0,
+                'total_people': 0,
+                'last_visit_date': None,
+                'preferred_payment_method': None
+            }
+            for customer_id in customer_ids
+        }
+        
+        totals = db.session.query(
+            Reservation.customer_id,
+            db.func.count(Reservation.id),
+            db.func.sum(db.case((Reservation.payment_status == 'PAID', Reservation.total_price), else_=0)),
+            db.func.sum(Reservation.num_people),
+            db.func.max(Reservation.reservation_date)
+        ).filter(
+            Reservation.customer_id.in_(customer_ids)
+        ).group_by(Reservation.customer_id).all()
+        
+        for customer_id, visits, spending, people, last_visit in totals:
+            analytics[customer_id].update({
+                'total_visits': visits,
+                'total_spending': spending or 0,
+                'total_people': people or 0,
+                'last_visit_date': last_visit
+            })
+        
+        # En sık kullanılan ödeme tipi (eşitlikte ilk kullanılan tip)
+        payment_counts = db.session.query(
+            Reservation.customer_id,
+            Reservation.payment_type,
+            db.func.count(Reservation.id),
+            db.func.min(Reservation.id)
+        ).filter(
+            Reservation.customer_id.in_(customer_ids)
+        ).group_by(Reservation.customer_id, Reservation.payment_type).all()
+        
+        best = {}
+        for customer_id, payment_type, count, first_id in payment_counts:
+            rank = (count, -first_id)
+            if customer_id not in best or rank > best[customer_id][0]:
+                best[customer_id] = (rank, payment_type)
+        for customer_id, (_, payment_type) in best.items():
+            analytics[customer_id]['preferred_payment_method'] = payment_type
+        
+        for customer in customers:
+            customer._analytics = analytics[customer.id]
+        return customers
+    
+    def _get_analytics(self):
+        """Return preloaded analytics, loading them for this customer if needed"""
+        if getattr(self, '_analytics', None) is None:
+            Customer.load_analytics([self])
+        return self._analytics
+    
     @property
     def total_visits(self):
         """Get total number of visits"""
         # Silinmiş müşterileri analiz ekranında gösterme
         if self.name == "Silinmiş Müşteri":
             return 0
-        return len(self.reservations)
+        return self._get_analytics()['total_visits']
     
     @property
     def total_spending(self):
@@ -102,7 +198,7 @@ class Customer(db.Model):
         # Silinmiş müşterileri analiz ekranında gösterme
         if self.name == "Silinmiş Müşteri":
             return 0
-        return sum([r.total_price for r in self.reservations if r.payment_status == 'PAID'])
+        return self._get_analytics()['total_spending']
     
     @property
     def preferred_payment_method(self):
@@ -110,15 +206,7 @@ class Customer(db.Model):
         # Silinmiş müşterileri analiz ekranında gösterme
         if self.name == "Silinmiş Müşteri":
             return None
-            
-        payment_types = {}
-        for r in self.reservations:
-            payment_types[r.payment_type] = payment_types.get(r.payment_type, 0) + 1
-        
-        if not payment_types:
-            return None
-            
-        return max(payment_types.items(), key=lambda x: x[1])[0]
+        return self._get_analytics()['preferred_payment_method']
     
     @property
     def average_group_size(self):
@@ -126,10 +214,11 @@ class Customer(db.Model):
         # Silinmiş müşterileri analiz ekranında gösterme
         if self.name == "Silinmiş Müşteri":
             return 0
-            
-        if not self.reservations:
+        
+        analytics = self._get_analytics()
+        if not analytics['total_visits']:
             return 0
-        return sum([r.num_people for r in self.reservations]) / len(self.reservations)
+        return analytics['total_people'] / analytics['total_visits']
     
     @property
     def last_visit_date(self):
@@ -137,11 +226,7 @@ class Customer(db.Model):
         # Silinmiş müşterileri analiz ekranında gösterme
         if self.name == "Silinmiş Müşteri":
             return None
-            
-        if not self.reservations:
-            return None
-        latest = max(self.reservations, key=lambda r: r.reservation_date)
-        return latest.reservation_date
+        return self._get_analytics()['last_visit_date']
 
 # Kullanıcı-Rol ilişkisi için ara tablo
 user_roles = db.Table('user_roles',
@@ -238,12 +323,29 @@ class Log(db.Model):
     # Relationships
     branch = relationship("Branch")
     
+    __table_args__ = (
+        # Log sayfası: şube/tip filtreli, tarihe göre imleçli sayfalama
+        db.Index('ix_logs_branch_type_created', 'branch_id', 'log_type', 'created_at', 'id'),
+        # Filtresiz sayfalama ve saklama süresi temizliği
+        db.Index('ix_logs_created', 'created_at', 'id'),
+    )
+    
     def __repr__(self):
         return f'<Log {self.log_type} {self.action} at {self.created_at}>'
     
     @classmethod
-    def add_log(cls, log_type, action, details, branch_id=None, user_id=None):
-        """Add a new log entry"""
+    def add_log(cls, log_type, action, details, branch_id=None, user_id=None, commit=True):
+        """
+        Add a new log entry
+
+        By default the entry is handed to the audit log writer (log_writer.py),
+        which batches inserts in the background. commit=False adds the entry to
+        the caller's transaction instead.
+        """
+        if commit:
+            from log_writer import audit_log_writer
+            return audit_log_writer.write(log_type, action, details, branch_id=branch_id, user_id=user_id)
+        
         log = cls(
             log_type=log_type,
             action=action,
@@ -252,7 +354,6 @@ class Log(db.Model):
             user_id=user_id
         )
         db.session.add(log)
-        db.session.commit()
         return log
 
 class Reservation(db.Model):
@@ -282,6 +383,21 @@ class Reservation(db.Model):
     staff = relationship("Staff", back_populates="reservations")
     customer = relationship("Customer", back_populates="reservations")
     
+    __table_args__ = (
+        # Şube bazlı rapor ve arşiv sorguları (iptaller dahil)
+        db.Index('ix_reservations_branch_date', 'branch_id', 'reservation_date'),
+        # Rezervasyon tablosu ve Telegram /rez: sadece iptal edilmemiş rezervasyonlar
+        db.Index('ix_reservations_active_branch_date_time', 'branch_id', 'reservation_date', 'reservation_time',
+                 postgresql_where=text('is_canceled = false'),
+                 sqlite_where=text('is_canceled = 0')),
+        # Personel performansı ve personel silme
+        db.Index('ix_reservations_staff_date', 'staff_id', 'reservation_date'),
+        # Tüm şubeler için tarih aralığı sorguları ve günlük özet yeniden hesaplama
+        db.Index('ix_reservations_date', 'reservation_date'),
+        # Müşteri detay ve analitik sorguları
+        db.Index('ix_reservations_customer_id', 'customer_id'),
+    )
+    
     def __repr__(self):
         return f'<Reservation {self.customer_name} on {self.reservation_date} at {self.reservation_time}>'
     
@@ -313,3 +429,84 @@ class Reservation(db.Model):
         self.customer_id = customer.id
         
         return self
+
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox'
+    
+    # Gönderilecek Telegram mesajları; ilgili değişiklikle aynı transaction içinde yazılır (bkz. outbox.py)
+    id = db.Column(db.Integer, primary_key=True)
+    chat_id = db.Column(db.String(100), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    kind = db.Column(db.String(30), nullable=True)  # RESERVATION_CREATE, RESERVATION_CANCEL, COMMAND_REPLY
+    dedupe_key = db.Column(db.String(100), nullable=True, unique=True)  # Aynı bildirimin iki kez kuyruğa girmesini önler
+    status = db.Column(db.String(10), nullable=False, default='PENDING')  # PENDING, SENDING, SENT, FAILED
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime, nullable=True)  # SENDING durumundaki kaydın sahiplik süresi
+    claim_token = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+        db.Index('ix_outbox_claim_token', 'claim_token'),
+    )
+    
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.kind} {self.status}>'
+
+class ReservationDailyStat(db.Model):
+    __tablename__ = 'reservation_daily_stats'
+    
+    # Şube/personel/gün bazında rezervasyon özetleri (report_service tarafından doldurulur)
+    branch_id = db.Column(db.Integer, primary_key=True)
+    staff_id = db.Column(db.Integer, primary_key=True)
+    stat_date = db.Column(db.Date, primary_key=True)
+    active_count = db.Column(db.Integer, nullable=False, default=0)
+    canceled_count = db.Column(db.Integer, nullable=False, default=0)
+    total_guests = db.Column(db.Integer, nullable=False, default=0)
+    active_revenue = db.Column(db.Float, nullable=False, default=0)
+    canceled_revenue = db.Column(db.Float, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_reservation_daily_stats_stat_date', 'stat_date'),
+    )
+    
+    def __repr__(self):
+        return f'<ReservationDailyStat {self.branch_id}/{self.staff_id} {self.stat_date}>'
+
+class ReportCacheEvent(db.Model):
+    __tablename__ = 'report_cache_events'
+    
+    # Rapor önbelleğini geçersiz kılan değişiklikler (tüm worker'lar tarafından okunur)
+    id = db.Column(db.Integer, primary_key=True)
+    branch_id = db.Column(db.Integer, nullable=True)  # None ise tüm şubeler
+    reservation_date = db.Column(db.Date, nullable=True)  # None ise tüm tarihler
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<ReportCacheEvent {self.branch_id} {self.reservation_date} at {self.created_at}>'
+
+class ArchivedReport(db.Model):
+    __tablename__ = 'archived_reports'
+    
+    # Arşivlenen aylık PDF raporlarının kataloğu (pdf_generator tarafından doldurulur)
+    id = db.Column(db.Integer, primary_key=True)
+    branch_id = db.Column(db.Integer, ForeignKey('branches.id', ondelete='SET NULL'), nullable=True)
+    branch_name = db.Column(db.String(100), nullable=False)  # Rapor oluşturulduğundaki şube adı
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    file_name = db.Column(db.String(255), nullable=False, unique=True)
+    file_size = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        # Şube filtreli sayfalama (en yeni dönem önce)
+        db.Index('ix_archived_reports_branch_period', 'branch_id', 'year', 'month', 'id'),
+        # Filtresiz sayfalama
+        db.Index('ix_archived_reports_period', 'year', 'month', 'id'),
+    )
+    
+    def __repr__(self):
+        return f'<ArchivedReport {self.branch_name} {self.month}/{self.year}>'
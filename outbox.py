@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import uuid
+import atexit
+import select as select_module
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, select, update, event, text
+from sqlalchemy.orm import Session
+from app import app, db
+from models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+# Tek seferde sahiplenilip gönderilecek mesaj sayısı
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 20))
+# Yeni mesaj bildirimi gelmediğinde kuyruğun kontrol aralığı (saniye)
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 5))
+# Başarısız mesaj için en fazla deneme sayısı, sonrasında FAILED olarak bırakılır
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+# Gönderimdeki bir mesajın sahipliği (saniye); süre dolarsa başka bir worker tekrar dener
+OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', 120))
+# Yeniden deneme beklemesi: 10s, 20s, 40s, ... en fazla 1 saat
+OUTBOX_RETRY_BASE = 10
+OUTBOX_RETRY_MAX = 3600
+# Gönderilmiş mesajların tabloda tutulacağı süre (gün)
+OUTBOX_RETENTION_DAYS = int(os.environ.get('OUTBOX_RETENTION_DAYS', 7))
+# PostgreSQL'de yeni mesajları diğer süreçlere (bot worker) bildiren LISTEN/NOTIFY kanalı
+OUTBOX_NOTIFY_CHANNEL = 'outbox_messages'
+# Aynı sohbete birleştirilerek gönderilen mesajların ayracı
+COALESCE_SEPARATOR = "\n\n➖➖➖➖➖➖➖➖\n\n"
+
+
+def enqueue_message(chat_id, message, kind=None, dedupe_key=None):
+    """
+    Telegram mesajını mevcut transaction içinde outbox tablosuna ekler
+
+    Mesaj ancak çağıranın transaction'ı commit edildiğinde gönderilir; transaction
+    geri alınırsa mesaj da hiç gönderilmez. Aynı dedupe_key ile ikinci kez
+    çağrıldığında yeni kayıt eklenmez. PostgreSQL'de transaction'a bir NOTIFY
+    eklenir; mesajları gönderen süreç (bot_worker.py) commit anında uyanır.
+
+    Returns:
+        OutboxMessage: Eklenen veya mevcut kayıt
+    """
+    if dedupe_key:
+        existing = OutboxMessage.query.filter_by(dedupe_key=dedupe_key).first()
+        if existing:
+            return existing
+
+    outbox_message = OutboxMessage(
+        chat_id=str(chat_id),
+        message=message,
+        kind=kind,
+        dedupe_key=dedupe_key,
+        status='PENDING',
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(outbox_message)
+    if not db.session.info.get('outbox_pending') and db.engine.dialect.name == 'postgresql':
+        # NOTIFY transaction'a bağlıdır, yalnızca commit edilirse iletilir
+        db.session.execute(text(f"NOTIFY {OUTBOX_NOTIFY_CHANNEL}"))
+    # Commit sonrası bu süreçteki dağıtıcıyı uyandır
+    db.session.info['outbox_pending'] = True
+    return outbox_message
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_dispatcher_after_commit(session):
+    if session.info.pop('outbox_pending', False):
+        outbox_dispatcher.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_pending_after_rollback(session):
+    session.info.pop('outbox_pending', None)
+
+
+def claim_batch(limit=OUTBOX_BATCH_SIZE, lease_seconds=OUTBOX_LEASE_SECONDS):
+    """
+    Gönderilecek mesajları sahiplenir (SENDING durumuna alır)
+
+    PostgreSQL'de FOR UPDATE SKIP LOCKED ile aynı anda çalışan worker'lar farklı
+    satırları alır. Sahiplik süresi dolmuş SENDING kayıtları (gönderim sırasında
+    ölen worker) tekrar sahiplenilir.
+
+    Returns:
+        list: OutboxMessage nesneleri
+    """
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+
+    claimable = or_(
+        and_(OutboxMessage.status == 'PENDING', OutboxMessage.next_attempt_at <= now),
+        and_(OutboxMessage.status == 'SENDING', OutboxMessage.locked_until < now)
+    )
+    candidate_ids = select(OutboxMessage.id).where(claimable).order_by(
+        OutboxMessage.id
+    ).limit(limit).with_for_update(skip_locked=True)
+
+    db.session.execute(
+        update(OutboxMessage).where(
+            OutboxMessage.id.in_(candidate_ids.scalar_subquery()),
+            claimable
+        ).values(
+            status='SENDING',
+            claim_token=token,
+            locked_until=now + timedelta(seconds=lease_seconds)
+        ).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    return OutboxMessage.query.filter_by(claim_token=token).order_by(OutboxMessage.id).all()
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(OUTBOX_RETRY_BASE * (2 ** max(attempts - 1, 0)), OUTBOX_RETRY_MAX))
+
+
+def mark_sent(outbox_message):
+    outbox_message.status = 'SENT'
+    outbox_message.sent_at = datetime.utcnow()
+    outbox_message.locked_until = None
+    outbox_message.last_error = None
+
+
+def mark_failed(outbox_message, error, retry_after=None):
+    """Başarısız gönderimi yeniden denemeye alır veya deneme hakkı bittiyse FAILED yapar"""
+    outbox_message.attempts = (outbox_message.attempts or 0) + 1
+    outbox_message.last_error = str(error)[:500]
+    outbox_message.locked_until = None
+
+    if outbox_message.attempts >= OUTBOX_MAX_ATTEMPTS:
+        outbox_message.status = 'FAILED'
+        logger.error(f"Outbox mesajı {outbox_message.id} {outbox_message.attempts} denemeden sonra gönderilemedi: {error}")
+        return
+
+    delay = _retry_delay(outbox_message.attempts)
+    if retry_after:
+        delay = max(delay, timedelta(seconds=retry_after))
+    outbox_message.status = 'PENDING'
+    outbox_message.next_attempt_at = datetime.utcnow() + delay
+
+
+def mark_deferred(outbox_message, delay):
+    """
+    Yerel hız sınırı nedeniyle gönderilmeyen mesajı deneme hakkı harcamadan erteler
+
+    Telegram mesajı reddetmediği için attempts artırılmaz; sohbet kuyruğu uzun
+    süre dolu kalsa da mesaj FAILED olmaz.
+    """
+    outbox_message.status = 'PENDING'
+    outbox_message.locked_until = None
+    outbox_message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+
+def coalesce_messages(messages, limit=None):
+    """
+    Aynı sohbete giden mesajları Telegram uzunluk sınırını aşmadan birleştirir
+
+    Kuyruk birikmişse bir şubeye art arda giden bildirimler tek mesajda
+    gönderilir; sohbet başına hız sınırına takılmadan kuyruk daha hızlı boşalır.
+    Mesajların sırası korunur.
+
+    Returns:
+        list: (chat_id, birleştirilmiş metin, [OutboxMessage, ...]) üçlüleri
+    """
+    if limit is None:
+        from telegram_sender import TELEGRAM_MESSAGE_LIMIT
+        limit = TELEGRAM_MESSAGE_LIMIT
+
+    by_chat = {}
+    for outbox_message in messages:
+        by_chat.setdefault(outbox_message.chat_id, []).append(outbox_message)
+
+    groups = []
+    for chat_id, chat_messages in by_chat.items():
+        text, group = None, []
+        for outbox_message in chat_messages:
+            if text is not None and len(text) + len(COALESCE_SEPARATOR) + len(outbox_message.message) <= limit:
+                text += COALESCE_SEPARATOR + outbox_message.message
+                group.append(outbox_message)
+                continue
+            if group:
+                groups.append((chat_id, text, group))
+            text, group = outbox_message.message, [outbox_message]
+        if group:
+            groups.append((chat_id, text, group))
+    return groups
+
+
+def deliver(messages):
+    """
+    Sahiplenilen mesajları gönderir ve sonuçlarını kaydeder
+
+    Aynı sohbetin mesajları birleştirilerek gönderilir. Telegram hız sınırı
+    (429) bildirdiyse mesajlar en erken retry_after süresi sonunda yeniden denenir.
+    Yerel hız sınırına takılan mesajlar deneme sayısı artırılmadan ertelenir.
+
+    Returns:
+        int: Başarıyla gönderilen mesaj sayısı
+    """
+    from telegram_sender import telegram_sender, TelegramThrottled, TELEGRAM_SEND_TIMEOUT
+
+    futures = [(chat_id, group, telegram_sender.submit(chat_id, text))
+               for chat_id, text, group in coalesce_messages(messages)]
+
+    sent = 0
+    for chat_id, group, future in futures:
+        deferred_for = None
+        try:
+            ok = future.result(timeout=TELEGRAM_SEND_TIMEOUT)
+            error = None if ok else 'Telegram gönderimi başarısız'
+        except TelegramThrottled as e:
+            ok, error, deferred_for = False, e, e.retry_after
+        except Exception as e:
+            ok, error = False, e
+        retry_after = None if ok else telegram_sender.blocked_for(chat_id) or None
+        for outbox_message in group:
+            if deferred_for is not None:
+                mark_deferred(outbox_message, deferred_for)
+            elif ok:
+                mark_sent(outbox_message)
+                sent += 1
+            else:
+                mark_failed(outbox_message, error, retry_after=retry_after)
+    db.session.commit()
+    return sent
+
+
+def dispatch_pending(limit=OUTBOX_BATCH_SIZE):
+    """
+    Bekleyen mesajlardan bir grubu sahiplenip gönderir (uygulama bağlamında çağrılmalı)
+
+    Returns:
+        tuple: (sahiplenilen mesaj sayısı, gönderilen mesaj sayısı)
+    """
+    messages = claim_batch(limit)
+    if not messages:
+        return 0, 0
+    return len(messages), deliver(messages)
+
+
+def prune_outbox(max_age=None):
+    """Saklama süresini aşan gönderilmiş mesajları siler"""
+    if max_age is None:
+        max_age = timedelta(days=OUTBOX_RETENTION_DAYS)
+    deleted = OutboxMessage.query.filter(
+        OutboxMessage.status == 'SENT',
+        OutboxMessage.sent_at < datetime.utcnow() - max_age
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+class OutboxDispatcher:
+    """
+    outbox tablosundaki mesajları arka planda gönderen thread
+
+    Yeni mesaj commit edildiğinde aynı süreçteki dağıtıcı hemen uyanır.
+    PostgreSQL'de diğer süreçlerde yazılan mesajlar LISTEN/NOTIFY ile hemen,
+    SQLite'ta en geç OUTBOX_POLL_INTERVAL saniyede alınır. LISTEN bağlantısı
+    beklenirken wake() ve stop() bir pipe üzerinden select'i hemen uyandırır.
+    """
+
+    def __init__(self, poll_interval=OUTBOX_POLL_INTERVAL, batch_size=OUTBOX_BATCH_SIZE):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._last_prune = None
+        self._listener = None
+        self._wake_pipe = None
+        self.claimed = 0
+        self.sent = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._stop_event.clear()
+        if self._wake_pipe is None or self._pid != os.getpid():
+            # fork sonrası her süreç kendi pipe'ını açar
+            self._wake_pipe = os.pipe()
+            for fd in self._wake_pipe:
+                os.set_blocking(fd, False)
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='outbox-dispatcher', daemon=True)
+        self._thread.start()
+        logger.info("Outbox dağıtıcısı başlatıldı")
+
+    def stop(self):
+        self._stop_event.set()
+        self.wake()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=10)
+        self._thread = None
+
+    def wake(self):
+        self._wake_event.set()
+        if self._wake_pipe is not None and self._pid == os.getpid():
+            try:
+                os.write(self._wake_pipe[1], b'\0')
+            except OSError:
+                # Pipe doluysa dağıtıcı zaten uyandırılmış demektir
+                pass
+
+    def stats(self):
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'listening': self._listener is not None,
+            'claimed': self.claimed,
+            'sent': self.sent,
+        }
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            claimed = 0
+            try:
+                with app.app_context():
+                    claimed, sent = dispatch_pending(self.batch_size)
+                    self.claimed += claimed
+                    self.sent += sent
+                    self._prune_if_due()
+                    if self._listener is None:
+                        self._listener = self._open_listener()
+            except Exception as e:
+                logger.error(f"Outbox dağıtımı sırasında hata: {e}", exc_info=True)
+
+            # Grup doluysa beklemeden devam et
+            if claimed >= self.batch_size:
+                continue
+            self._wait()
+        self._close_listener()
+
+    def _open_listener(self):
+        """PostgreSQL'de NOTIFY'ları dinleyen, havuz dışı bir bağlantı açar"""
+        if db.engine.dialect.name != 'postgresql':
+            return None
+        try:
+            connection = db.engine.raw_connection()
+            # Bağlantı havuzdan ayrılır, dağıtıcı durana kadar açık kalır
+            connection.detach()
+            driver_connection = connection.driver_connection
+            driver_connection.autocommit = True
+            with driver_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {OUTBOX_NOTIFY_CHANNEL}")
+            return connection
+        except Exception as e:
+            logger.warning(f"Outbox LISTEN bağlantısı açılamadı, periyodik kontrol kullanılacak: {e}")
+            return None
+
+    def _close_listener(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            try:
+                listener.close()
+            except Exception:
+                pass
+
+    def _wait(self):
+        if self._listener is not None and self._wake_pipe is not None:
+            try:
+                if not self._wake_event.is_set():
+                    driver_connection = self._listener.driver_connection
+                    wake_fd = self._wake_pipe[0]
+                    readable, _, _ = select_module.select([driver_connection, wake_fd], [], [], self.poll_interval)
+                    if driver_connection in readable:
+                        driver_connection.poll()
+                        driver_connection.notifies.clear()
+                    if wake_fd in readable:
+                        self._drain_wake_pipe()
+                self._wake_event.clear()
+                return
+            except Exception as e:
+                logger.warning(f"Outbox LISTEN bağlantısı koptu: {e}")
+                self._close_listener()
+
+        self._wake_event.wait(timeout=self.poll_interval)
+        self._wake_event.clear()
+
+    def _drain_wake_pipe(self):
+        try:
+            while os.read(self._wake_pipe[0], 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _prune_if_due(self):
+        now = datetime.utcnow()
+        if self._last_prune is None or now - self._last_prune > timedelta(hours=1):
+            self._last_prune = now
+            deleted = prune_outbox()
+            if deleted:
+                logger.info(f"{deleted} gönderilmiş outbox mesajı silindi")
+
+
+# Uygulama genelinde kullanılan outbox dağıtıcısı
+outbox_dispatcher = OutboxDispatcher()
+atexit.register(outbox_dispatcher.stop)
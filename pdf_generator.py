@@ -2,11 +2,278 @@
 # -*- coding: utf-8 -*-
 
 import os
+import json
+import hashlib
+import logging
 import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from weasyprint import HTML, CSS
 from jinja2 import Environment, FileSystemLoader
 
-def generate_monthly_report_pdf(branch_data, staff_data, month, year, branch_name):
+try:
+    from weasyprint.text.fonts import FontConfiguration
+except ImportError:
+    try:
+        # WeasyPrint < 53
+        from weasyprint.fonts import FontConfiguration
+    except ImportError:
+        FontConfiguration = None
+
+logger = logging.getLogger(__name__)
+
+# Aylık arşivde şube PDF'lerini paralel oluşturan süreç sayısı (1: seri, havuz kullanılmaz)
+PDF_RENDER_WORKERS = int(os.environ.get('PDF_RENDER_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Arşivlenen PDF'lerin dizini ve girdi özetlerinin tutulduğu manifest dosyası
+REPORTS_DIR = os.path.join('static', 'reports')
+REPORT_MANIFEST_NAME = 'manifest.json'
+
+# Ay isimleri (Türkçe)
+MONTH_NAMES = {
+    1: 'Ocak', 2: 'Şubat', 3: 'Mart', 4: 'Nisan', 5: 'Mayıs', 6: 'Haziran',
+    7: 'Temmuz', 8: 'Ağustos', 9: 'Eylül', 10: 'Ekim', 11: 'Kasım', 12: 'Aralık'
+}
+
+# Aylık rapor PDF'lerinin stil dosyası
+REPORT_CSS = '''
+@page {
+    size: A4;
+    margin: 1.5cm;
+    @bottom-center {
+        content: "Sayfa " counter(page) "/" counter(pages);
+        font-size: 10px;
+        color: #666;
+    }
+}
+body {
+    font-family: Arial, sans-serif;
+    line-height: 1.5;
+    color: #333;
+}
+.header {
+    text-align: center;
+    margin-bottom: 30px;
+    padding-bottom: 20px;
+    border-bottom: 2px solid #1a73e8;
+}
+.report-title {
+    font-size: 28px;
+    font-weight: bold;
+    margin-bottom: 10px;
+    color: #1a73e8;
+}
+.report-subtitle {
+    font-size: 20px;
+    margin-bottom: 10px;
+    color: #444;
+}
+.section {
+    margin-bottom: 30px;
+    page-break-inside: avoid;
+}
+.section-title {
+    font-size: 20px;
+    font-weight: bold;
+    margin-bottom: 15px;
+    padding-bottom: 8px;
+    border-bottom: 1px solid #ddd;
+    color: #1a73e8;
+}
+.summary-box {
+    display: flex;
+    justify-content: space-between;
+    margin-bottom: 25px;
+    flex-wrap: wrap;
+}
+.summary-item {
+    width: 30%;
+    background-color: #f4f8ff;
+    padding: 18px;
+    border-radius: 8px;
+    box-shadow: 0 3px 8px rgba(0,0,0,0.1);
+    margin-bottom: 15px;
+    border-left: 5px solid #1a73e8;
+}
+.summary-label {
+    font-weight: bold;
+    display: block;
+    margin-bottom: 8px;
+    color: #555;
+    font-size: 14px;
+}
+.summary-value {
+    font-size: 22px;
+    font-weight: bold;
+    color: #1a73e8;
+}
+.performance-metrics {
+    display: flex;
+    justify-content: space-between;
+    margin-top: 20px;
+    flex-wrap: wrap;
+}
+.metric-item {
+    width: 30%;
+    background-color: #f9f9f9;
+    padding: 15px;
+    border-radius: 8px;
+    margin-bottom: 15px;
+    text-align: center;
+    border-top: 3px solid #34a853;
+}
+.metric-title {
+    font-weight: bold;
+    font-size: 14px;
+    color: #555;
+    margin-bottom: 8px;
+}
+.metric-value {
+    font-size: 18px;
+    color: #34a853;
+    font-weight: bold;
+}
+table {
+    width: 100%;
+    border-collapse: collapse;
+    margin-bottom: 20px;
+    box-shadow: 0 2px 5px rgba(0,0,0,0.1);
+}
+th, td {
+    border: 1px solid #ddd;
+    padding: 12px;
+    text-align: left;
+}
+th {
+    background-color: #1a73e8;
+    color: white;
+    font-weight: bold;
+}
+tr:nth-child(even) {
+    background-color: #f9f9f9;
+}
+.text-center {
+    text-align: center;
+}
+.text-right {
+    text-align: right;
+}
+.footer {
+    margin-top: 40px;
+    padding-top: 20px;
+    border-top: 1px solid #ddd;
+    text-align: center;
+    color: #666;
+    font-size: 12px;
+}
+'''
+
+
+class MonthlyReportRenderer:
+    """
+    Aylık rapor PDF'leri için yeniden kullanılabilir oluşturucu
+
+    Jinja şablonu, CSS ve WeasyPrint font yapılandırması bir kez hazırlanır ve
+    her şube/ay için tekrar kullanılır. Her süreç get_report_renderer() ile
+    kendi örneğini bir kez oluşturur.
+    """
+
+    def __init__(self, template_dir='templates', template_name='report_pdf_template.html', css=REPORT_CSS):
+        self.env = Environment(loader=FileSystemLoader(template_dir))
+        self.template = self.env.get_template(template_name)
+        self.font_config = FontConfiguration() if FontConfiguration else None
+        if self.font_config is not None:
+            self.stylesheets = [CSS(string=css, font_config=self.font_config)]
+        else:
+            self.stylesheets = [CSS(string=css)]
+
+    def render_html(self, branch_data, staff_data, month_name, year, branch_name):
+        return self.template.render(
+            branch_name=branch_name,
+            month_name=month_name,
+            year=year,
+            branch_data=branch_data,
+            staff_data=staff_data,
+            current_date=datetime.datetime.now().strftime('%d.%m.%Y')
+        )
+
+    def write_pdf(self, html_content, pdf_path):
+        if self.font_config is not None:
+            HTML(string=html_content).write_pdf(pdf_path, stylesheets=self.stylesheets, font_config=self.font_config)
+        else:
+            HTML(string=html_content).write_pdf(pdf_path, stylesheets=self.stylesheets)
+
+
+_report_renderer = None
+
+def get_report_renderer():
+    """Bu sürecin rapor oluşturucusunu döndürür (ilk çağrıda oluşturulur)"""
+    global _report_renderer
+    if _report_renderer is None:
+        _report_renderer = MonthlyReportRenderer()
+    return _report_renderer
+
+def monthly_report_path(branch_name, month, year):
+    """Şubenin aylık rapor PDF'inin yolu (ŞubeAdı_YYYY_M_AyAdı.pdf)"""
+    month_name = MONTH_NAMES.get(month, str(month))
+    return os.path.join(REPORTS_DIR, f"{branch_name}_{year}_{month}_{month_name}.pdf")
+
+def _template_fingerprint(template_dir='templates', template_name='report_pdf_template.html'):
+    # Şablon veya CSS değişirse tüm raporlar yeniden oluşturulur
+    digest = hashlib.sha256(REPORT_CSS.encode('utf-8'))
+    try:
+        with open(os.path.join(template_dir, template_name), 'rb') as template_file:
+            digest.update(template_file.read())
+    except OSError:
+        pass
+    return digest.hexdigest()
+
+def report_input_hash(job, template_fingerprint=None):
+    """
+    Rapor girdilerinin (branch_data, staff_data, dönem, şube adı, şablon) özeti
+
+    Args:
+        job: generate_monthly_report_pdf argümanları
+        template_fingerprint: Şablon/CSS özeti (verilmezse hesaplanır)
+
+    Returns:
+        str: SHA-256 özeti
+    """
+    if template_fingerprint is None:
+        template_fingerprint = _template_fingerprint()
+    payload = json.dumps({
+        'branch_data': job['branch_data'],
+        'staff_data': job['staff_data'],
+        'month': job['month'],
+        'year': job['year'],
+        'branch_name': job['branch_name'],
+        'template': template_fingerprint,
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def load_report_manifest(reports_dir=REPORTS_DIR):
+    """
+    Arşivlenen raporların girdi özetlerini okur
+
+    Returns:
+        dict: PDF dosya adı -> {'hash', 'generated_at'}
+    """
+    try:
+        with open(os.path.join(reports_dir, REPORT_MANIFEST_NAME), encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+def save_report_manifest(manifest, reports_dir=REPORTS_DIR):
+    """Manifest'i geçici dosyaya yazıp yerine taşır (yarım yazılmış dosya kalmaz)"""
+    os.makedirs(reports_dir, exist_ok=True)
+    path = os.path.join(reports_dir, REPORT_MANIFEST_NAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def generate_monthly_report_pdf(branch_data, staff_data, month, year, branch_name, renderer=None):
     """
     Aylık rapor için PDF dosyası oluşturur
     
@@ -16,189 +283,97 @@ def generate_monthly_report_pdf(branch_data, staff_data, month, year, branch_nam
         month: Ay (1-12)
         year: Yıl
         branch_name: Şube adı
+        renderer: MonthlyReportRenderer (verilmezse sürecin ortak oluşturucusu)
     
     Returns:
         str: Oluşturulan PDF dosyasının yolu
     """
     # PDF dosyaları için klasör oluştur
-    pdf_dir = os.path.join('static', 'reports')
-    if not os.path.exists(pdf_dir):
-        os.makedirs(pdf_dir)
-    
-    # Ay isimlerini Türkçe olarak belirle
-    month_names = {
-        1: 'Ocak', 2: 'Şubat', 3: 'Mart', 4: 'Nisan', 5: 'Mayıs', 6: 'Haziran',
-        7: 'Temmuz', 8: 'Ağustos', 9: 'Eylül', 10: 'Ekim', 11: 'Kasım', 12: 'Aralık'
-    }
+    if not os.path.exists(REPORTS_DIR):
+        os.makedirs(REPORTS_DIR)
     
-    month_name = month_names.get(month, str(month))
-    report_name = f"{branch_name}_{year}_{month}_{month_name}"
-    pdf_path = os.path.join(pdf_dir, f"{report_name}.pdf")
+    month_name = MONTH_NAMES.get(month, str(month))
+    pdf_path = monthly_report_path(branch_name, month, year)
     
-    # Template dosyasını yükle
-    env = Environment(loader=FileSystemLoader('templates'))
-    template = env.get_template('report_pdf_template.html')
+    if renderer is None:
+        renderer = get_report_renderer()
     
-    # Template'e verileri gönder
-    html_content = template.render(
-        branch_name=branch_name,
-        month_name=month_name,
-        year=year,
-        branch_data=branch_data,
-        staff_data=staff_data,
-        current_date=datetime.datetime.now().strftime('%d.%m.%Y')
-    )
-    
-    # CSS ekle
-    css = CSS(string='''
-    @page {
-        size: A4;
-        margin: 1.5cm;
-        @bottom-center {
-            content: "Sayfa " counter(page) "/" counter(pages);
-            font-size: 10px;
-            color: #666;
-        }
-    }
-    body {
-        font-family: Arial, sans-serif;
-        line-height: 1.5;
-        color: #333;
-    }
-    .header {
-        text-align: center;
-        margin-bottom: 30px;
-        padding-bottom: 20px;
-        border-bottom: 2px solid #1a73e8;
-    }
-    .report-title {
-        font-size: 28px;
-        font-weight: bold;
-        margin-bottom: 10px;
-        color: #1a73e8;
-    }
-    .report-subtitle {
-        font-size: 20px;
-        margin-bottom: 10px;
-        color: #444;
-    }
-    .section {
-        margin-bottom: 30px;
-        page-break-inside: avoid;
-    }
-    .section-title {
-        font-size: 20px;
-        font-weight: bold;
-        margin-bottom: 15px;
-        padding-bottom: 8px;
-        border-bottom: 1px solid #ddd;
-        color: #1a73e8;
-    }
-    .summary-box {
-        display: flex;
-        justify-content: space-between;
-        margin-bottom: 25px;
-        flex-wrap: wrap;
-    }
-    .summary-item {
-        width: 30%;
-        background-color: #f4f8ff;
-        padding: 18px;
-        border-radius: 8px;
-        box-shadow: 0 3px 8px rgba(0,0,0,0.1);
-        margin-bottom: 15px;
-        border-left: 5px solid #1a73e8;
-    }
-    .summary-label {
-        font-weight: bold;
-        display: block;
-        margin-bottom: 8px;
-        color: #555;
-        font-size: 14px;
-    }
-    .summary-value {
-        font-size: 22px;
-        font-weight: bold;
-        color: #1a73e8;
-    }
-    .performance-metrics {
-        display: flex;
-        justify-content: space-between;
-        margin-top: 20px;
-        flex-wrap: wrap;
-    }
-    .metric-item {
-        width: 30%;
-        background-color: #f9f9f9;
-        padding: 15px;
-        border-radius: 8px;
-        margin-bottom: 15px;
-        text-align: center;
-        border-top: 3px solid #34a853;
-    }
-    .metric-title {
-        font-weight: bold;
-        font-size: 14px;
-        color: #555;
-        margin-bottom: 8px;
-    }
-    .metric-value {
-        font-size: 18px;
-        color: #34a853;
-        font-weight: bold;
-    }
-    table {
-        width: 100%;
-        border-collapse: collapse;
-        margin-bottom: 20px;
-        box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-    }
-    th, td {
-        border: 1px solid #ddd;
-        padding: 12px;
-        text-align: left;
-    }
-    th {
-        background-color: #1a73e8;
-        color: white;
-        font-weight: bold;
-    }
-    tr:nth-child(even) {
-        background-color: #f9f9f9;
-    }
-    .text-center {
-        text-align: center;
-    }
-    .text-right {
-        text-align: right;
-    }
-    .footer {
-        margin-top: 40px;
-        padding-top: 20px;
-        border-top: 1px solid #ddd;
-        text-align: center;
-        color: #666;
-        font-size: 12px;
-    }
-    ''')
-    
-    # HTML'i PDF'e dönüştür
-    HTML(string=html_content).write_pdf(pdf_path, stylesheets=[css])
+    # Şablonu verilerle doldur ve PDF'e dönüştür
+    html_content = renderer.render_html(branch_data, staff_data, month_name, year, branch_name)
+    renderer.write_pdf(html_content, pdf_path)
     
     return pdf_path
 
-def archive_and_reset_monthly_data(branch_id=None):
+def render_monthly_reports(jobs, workers=PDF_RENDER_WORKERS):
+    """
+    Birden fazla şubenin aylık PDF raporunu oluşturur
+
+    workers > 1 ise PDF'ler ayrı süreçlerde paralel oluşturulur; toplam süre
+    yaklaşık en yavaş şubenin süresi kadar olur. Süreçler "spawn" ile başlatılır,
+    böylece uygulamanın thread'leri ve veritabanı bağlantıları kopyalanmaz.
+    spawn ana modülü yeniden import ettiğinden app yardımcı süreçte de yüklenir;
+    app.IS_CHILD_PROCESS sayesinde bu süreçlerde bot, outbox dağıtıcısı ve
+    zamanlayıcı başlatılmaz.
+
+    Args:
+        jobs: generate_monthly_report_pdf argümanlarını içeren sözlükler
+        workers: Süreç sayısı
+
+    Returns:
+        list: Her iş için PDF yolu; oluşturulamayan raporlar için None
+    """
+    if workers <= 1 or len(jobs) <= 1:
+        results = []
+        for job in jobs:
+            try:
+                results.append(generate_monthly_report_pdf(**job))
+            except Exception as e:
+                logger.error(f"{job['branch_name']} için PDF oluşturulamadı: {e}", exc_info=True)
+                results.append(None)
+        return results
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as executor:
+        futures = [executor.submit(generate_monthly_report_pdf, **job) for job in jobs]
+        results = []
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"{job['branch_name']} için PDF oluşturulamadı: {e}", exc_info=True)
+                results.append(None)
+        return results
+
+def month_date_range(year, month):
+    """
+    Ayın tarih aralığı: [ayın ilk günü, ayın son günü]
+
+    Yarı açık [ayın ilk günü, sonraki ayın ilk günü) aralığının DATE kolonu
+    için karşılığıdır; reservation_date üzerindeki indeksler kullanılabilir
+    (extract('month', ...) filtresinin aksine).
+    """
+    start_date = datetime.date(year, month, 1)
+    next_month_start = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return start_date, next_month_start - datetime.timedelta(days=1)
+
+def archive_and_reset_monthly_data(branch_id=None, force=False):
     """
     Aylık verileri arşivler ve istatistikleri sıfırlar
     
+    Girdileri (branch_data, staff_data) son arşivden beri değişmeyen ve PDF'i
+    diskte duran şubeler yeniden oluşturulmaz; bu raporlar 'skipped': True
+    ile döner.
+    
     Args:
         branch_id: Belirli bir şube için arşivleme yapmak isterseniz şube ID'si (opsiyonel)
+        force: True ise değişmemiş raporlar da yeniden oluşturulur
     
     Returns:
         bool: İşlemin başarılı olup olmadığı
     """
-    from models import db, Branch, Log, Reservation
-    from sqlalchemy import extract, func
+    from models import db, Branch, Log, Staff
+    from report_service import aggregate_reservations, empty_metrics, sum_metrics
+    from report_catalog import record_archived_report
     
     current_date = datetime.datetime.now()
     previous_month = current_date.month - 1 if current_date.month > 1 else 12
@@ -211,50 +386,81 @@ def archive_and_reset_monthly_data(branch_id=None):
     
     branches = branches_query.all()
     archived_reports = []
+    jobs = []
+    
+    # Önceki ayın tüm şube/personel toplamları tek gruplanmış sorguyla
+    metrics_by_staff = aggregate_reservations(
+        *month_date_range(previous_year, previous_month),
+        group_by=('branch_id', 'staff_id'),
+        branch_id=branch_id or None
+    )
+    
+    staff_by_branch = {}
+    for staff in Staff.query.filter(Staff.branch_id.in_([branch.id for branch in branches])).order_by(Staff.id):
+        staff_by_branch.setdefault(staff.branch_id, []).append(staff)
     
     for branch in branches:
-        # Önceki ay için rezervasyon verilerini topla
-        reservations = Reservation.query.filter(
-            Reservation.branch_id == branch.id,
-            extract('month', Reservation.reservation_date) == previous_month,
-            extract('year', Reservation.reservation_date) == previous_year,
-            Reservation.is_canceled == False
-        ).all()
-        
-        # Personel performans verilerini hesapla
+        # Personel performans verileri
         staff_data = []
-        for staff in branch.staff:
-            staff_reservations = [r for r in reservations if r.staff_id == staff.id]
-            
-            staff_data.append({
-                'name': staff.name,
-                'reservation_count': len(staff_reservations),
-                'total_guests': sum(r.num_people for r in staff_reservations),
-                'total_revenue': sum(r.total_price for r in staff_reservations)
-            })
+        for staff in staff_by_branch.get(branch.id, []):
+            staff_data.append(dict(
+                metrics_by_staff.get((branch.id, staff.id), empty_metrics()),
+                name=staff.name
+            ))
         
-        # Şube toplam verilerini hesapla
-        branch_data = {
-            'reservation_count': len(reservations),
-            'total_guests': sum(r.num_people for r in reservations),
-            'total_revenue': sum(r.total_price for r in reservations)
-        }
+        # Şube toplamları (silinmiş personelin rezervasyonları dahil, iptal gelirleriyle birlikte)
+        branch_data = sum_metrics([
+            metrics for (metrics_branch_id, _staff_id), metrics in metrics_by_staff.items()
+            if metrics_branch_id == branch.id
+        ])
         
-        # PDF raporu oluştur
-        pdf_path = generate_monthly_report_pdf(
-            branch_data=branch_data,
-            staff_data=staff_data,
-            month=previous_month,
-            year=previous_year,
-            branch_name=branch.name
-        )
+        jobs.append({
+            'branch_data': branch_data,
+            'staff_data': staff_data,
+            'month': previous_month,
+            'year': previous_year,
+            'branch_name': branch.name
+        })
+    
+    # Girdisi değişmemiş raporları atla
+    manifest = load_report_manifest()
+    template_fingerprint = _template_fingerprint()
+    input_hashes = [report_input_hash(job, template_fingerprint) for job in jobs]
+    changed = []
+    for index, (branch, job, input_hash) in enumerate(zip(branches, jobs, input_hashes)):
+        pdf_path = monthly_report_path(job['branch_name'], job['month'], job['year'])
+        entry = manifest.get(os.path.basename(pdf_path))
+        if not force and entry and entry.get('hash') == input_hash and os.path.exists(pdf_path):
+            archived_reports.append({
+                'branch_name': branch.name,
+                'pdf_path': pdf_path,
+                'month': previous_month,
+                'year': previous_year,
+                'skipped': True
+            })
+        else:
+            changed.append(index)
+    
+    # PDF raporlarını oluştur (şubeler paralel)
+    pdf_paths = render_monthly_reports([jobs[index] for index in changed])
+    
+    generated_at = datetime.datetime.utcnow().isoformat()
+    for index, pdf_path in zip(changed, pdf_paths):
+        if pdf_path is None:
+            continue
+        branch = branches[index]
+        manifest[os.path.basename(pdf_path)] = {'hash': input_hashes[index], 'generated_at': generated_at}
+        
+        # Rapor kataloğuna ekle (aylık raporlar sayfası bu tablodan okunur)
+        record_archived_report(branch.id, branch.name, previous_year, previous_month, pdf_path, commit=False)
         
         # Arşivlenen rapor bilgisini kaydet
         archived_reports.append({
             'branch_name': branch.name,
             'pdf_path': pdf_path,
             'month': previous_month,
-            'year': previous_year
+            'year': previous_year,
+            'skipped': False
         })
         
         # Log kaydı oluştur
@@ -265,6 +471,10 @@ def archive_and_reset_monthly_data(branch_id=None):
             branch_id=branch.id
         )
     
+    if any(pdf_path is not None for pdf_path in pdf_paths):
+        db.session.commit()
+        save_report_manifest(manifest)
+    
     return archived_reports
 
 if __name__ == "__main__":
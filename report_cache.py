@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import copy
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from app import db
+from models import ReportCacheEvent
+
+logger = logging.getLogger(__name__)
+
+# Önbellekteki bir raporun en fazla ne kadar süre tutulacağı (saniye)
+REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', 300))
+# Önbellekte tutulacak en fazla rapor sayısı
+REPORT_CACHE_MAX_ENTRIES = int(os.environ.get('REPORT_CACHE_MAX_ENTRIES', 500))
+# Commit edilmemiş transaction'lardaki değişiklikleri kaçırmamak için tolerans
+EVENT_CLOCK_MARGIN = timedelta(seconds=30)
+
+
+class ReportCache:
+    """
+    Rapor sayfalarının hesaplanmış verileri için işlem içi (in-process) önbellek
+
+    Her kayıt, hesaplandığı andan sonra ilgili şube ve tarih aralığında bir
+    rezervasyon değişikliği (ReportCacheEvent) olup olmadığı kontrol edilerek
+    döndürülür. Olaylar veritabanında tutulduğu için diğer gunicorn worker'larında
+    yapılan değişiklikler de önbelleği geçersiz kılar.
+    """
+
+    def __init__(self, ttl=REPORT_CACHE_TTL, max_entries=REPORT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Önbellekteki raporu döndürür
+
+        Args:
+            key: (route, period, start_date, end_date, branch_id)
+
+        Returns:
+            Geçerli kayıt varsa hesaplanmış veri, yoksa None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None:
+            self._count('misses')
+            return None
+
+        computed_at, value = entry
+        if datetime.utcnow() - computed_at > timedelta(seconds=self.ttl) or self._has_changes(key, computed_at):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            self._count('invalidations')
+            self._count('misses')
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        self._count('hits')
+        return copy.deepcopy(value)
+
+    def set(self, key, value, computed_at):
+        """Hesaplanan raporu önbelleğe ekler"""
+        with self._lock:
+            self._entries[key] = (computed_at, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Önbelleği tamamen boşaltır"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Önbellek isabet/ıska sayaçlarını döndürür"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'hit_ratio': (self.hits / lookups) if lookups else 0,
+                'ttl': self.ttl,
+            }
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @staticmethod
+    def _has_changes(key, computed_at):
+        """Kayıt hesaplandıktan sonra ilgili şube/tarih aralığında değişiklik olmuş mu?"""
+        _, _, start_date, end_date, branch_id = key
+
+        query = ReportCacheEvent.query.filter(
+            ReportCacheEvent.created_at >= computed_at - EVENT_CLOCK_MARGIN,
+            or_(
+                ReportCacheEvent.reservation_date.is_(None),
+                ReportCacheEvent.reservation_date.between(start_date, end_date)
+            )
+        )
+        # Tek şubelik raporlar sadece o şubenin değişikliklerinden etkilenir
+        if branch_id is not None:
+            query = query.filter(or_(
+                ReportCacheEvent.branch_id.is_(None),
+                ReportCacheEvent.branch_id == branch_id
+            ))
+
+        return db.session.query(query.exists()).scalar()
+
+
+report_cache = ReportCache()
+
+
+def cached_report(route, period, start_date, end_date, branch_id, compute):
+    """
+    Rapor verisini önbellekten döndürür, yoksa hesaplayıp önbelleğe ekler
+
+    Args:
+        route: Rapor sayfasının adı
+        period: Seçilen dönem
+        start_date: Başlangıç tarihi
+        end_date: Bitiş tarihi
+        branch_id: Şube ID'si (tüm şubeleri kapsayan raporlarda None)
+        compute: Veriyi hesaplayan parametresiz fonksiyon
+
+    Returns:
+        compute() fonksiyonunun döndürdüğü veri
+    """
+    key = (route, period, start_date, end_date, branch_id)
+    value = report_cache.get(key)
+    if value is not None:
+        return value
+
+    computed_at = datetime.utcnow()
+    value = compute()
+    report_cache.set(key, value, computed_at)
+    return value
+
+
+def invalidate_reports(branch_id=None, reservation_date=None):
+    """
+    Rapor önbelleğini geçersiz kılan bir olayı mevcut oturuma ekler
+
+    Olay, değişikliğe neden olan kayıtla aynı commit içinde yazılır.
+
+    Args:
+        branch_id: Etkilenen şube (None ise tüm şubeler)
+        reservation_date: Etkilenen tarih (None ise tüm tarihler)
+    """
+    db.session.add(ReportCacheEvent(branch_id=branch_id, reservation_date=reservation_date))
+
+
+def prune_report_cache_events(max_age=timedelta(days=1)):
+    """
+    Önbellek süresinden daha eski olayları siler
+
+    Returns:
+        int: Silinen olay sayısı
+    """
+    max_age = max(max_age, timedelta(seconds=REPORT_CACHE_TTL) + EVENT_CLOCK_MARGIN)
+    deleted = ReportCacheEvent.query.filter(
+        ReportCacheEvent.created_at < datetime.utcnow() - max_age
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
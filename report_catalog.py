@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import logging
+from datetime import datetime
+from sqlalchemy import tuple_
+from app import db
+from models import ArchivedReport, Branch
+
+logger = logging.getLogger(__name__)
+
+# Aylık raporlar sayfası için varsayılan ve en fazla kayıt sayısı
+REPORTS_PER_PAGE = 24
+MAX_REPORTS_PER_PAGE = 100
+
+
+def record_archived_report(branch_id, branch_name, year, month, pdf_path, commit=True):
+    """
+    Oluşturulan PDF'i kataloğa ekler veya yeniden oluşturulduysa kaydını günceller
+
+    Returns:
+        ArchivedReport: Eklenen veya güncellenen kayıt
+    """
+    file_name = os.path.basename(pdf_path)
+    file_size = os.path.getsize(pdf_path) if os.path.exists(pdf_path) else 0
+
+    report = ArchivedReport.query.filter_by(file_name=file_name).first()
+    if report is None:
+        report = ArchivedReport(file_name=file_name)
+        db.session.add(report)
+    report.branch_id = branch_id
+    report.branch_name = branch_name
+    report.year = year
+    report.month = month
+    report.file_size = file_size
+    report.created_at = datetime.utcnow()
+
+    if commit:
+        db.session.commit()
+    return report
+
+
+def encode_report_cursor(report):
+    """Sayfanın son kaydından bir sonraki sayfanın imlecini oluşturur"""
+    return f"{report.year}_{report.month}_{report.id}"
+
+
+def decode_report_cursor(cursor):
+    """
+    İmleci (year, month, id) üçlüsüne çevirir
+
+    Returns:
+        tuple veya None: Geçersiz imleçte None
+    """
+    if not cursor:
+        return None
+    try:
+        year, month, report_id = (int(part) for part in cursor.split('_'))
+        return year, month, report_id
+    except ValueError:
+        return None
+
+
+def fetch_archived_reports_page(branch_id=None, cursor=None, per_page=REPORTS_PER_PAGE):
+    """
+    Arşivlenen raporları en yeni dönemden eskiye, imleç tabanlı sayfalama ile getirir
+
+    (branch_id, year, month, id) ve (year, month, id) indekslerini kullanır;
+    rapor dizini taranmaz.
+
+    Args:
+        branch_id: Şube ID filtresi
+        cursor: Önceki sayfanın next_cursor değeri
+        per_page: Sayfa başına kayıt sayısı
+
+    Returns:
+        tuple: (raporlar, sonraki sayfa imleci veya None)
+    """
+    per_page = max(1, min(per_page, MAX_REPORTS_PER_PAGE))
+    query = ArchivedReport.query
+
+    if branch_id is not None:
+        query = query.filter(ArchivedReport.branch_id == branch_id)
+
+    position = decode_report_cursor(cursor)
+    if position:
+        query = query.filter(tuple_(ArchivedReport.year, ArchivedReport.month, ArchivedReport.id) < position)
+
+    reports = query.order_by(
+        ArchivedReport.year.desc(), ArchivedReport.month.desc(), ArchivedReport.id.desc()
+    ).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(reports) > per_page:
+        reports = reports[:per_page]
+        next_cursor = encode_report_cursor(reports[-1])
+
+    return reports, next_cursor
+
+
+def sync_report_catalog(reports_dir):
+    """
+    Dizindeki, katalogda olmayan PDF'leri kataloğa ekler (ilk kurulum için)
+
+    Dosya adı ŞubeAdı_YYYY_M_AyAdı.pdf biçimindedir; şube adı alt çizgi
+    içerebileceği için yıl, ay ve ay adı sondan ayrılır.
+
+    Returns:
+        tuple: (eklenen rapor sayısı, adı çözümlenemeyen dosyalar)
+    """
+    if not os.path.isdir(reports_dir):
+        return 0, []
+
+    known_files = {file_name for (file_name,) in db.session.query(ArchivedReport.file_name)}
+    branch_ids = {branch.name: branch.id for branch in Branch.query.all()}
+
+    added = 0
+    skipped = []
+    for file_name in sorted(os.listdir(reports_dir)):
+        if not file_name.endswith('.pdf') or file_name in known_files:
+            continue
+        try:
+            branch_name, year, month, _month_name = file_name[:-len('.pdf')].rsplit('_', 3)
+            year, month = int(year), int(month)
+        except ValueError:
+            skipped.append(file_name)
+            continue
+
+        file_stats = os.stat(os.path.join(reports_dir, file_name))
+        db.session.add(ArchivedReport(
+            branch_id=branch_ids.get(branch_name),
+            branch_name=branch_name,
+            year=year,
+            month=month,
+            file_name=file_name,
+            file_size=file_stats.st_size,
+            created_at=datetime.utcfromtimestamp(file_stats.st_mtime)
+        ))
+        added += 1
+
+    db.session.commit()
+    if added:
+        logger.info(f"{added} rapor kataloğa eklendi")
+    return added, skipped
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta
+from sqlalchemy import func, case, and_, insert
+from app import db
+from models import Reservation, ReservationDailyStat, Setting
+from report_cache import invalidate_reports
+
+# Rapor sayfalarının kullandığı metrik anahtarları
+METRIC_KEYS = (
+    'active_count',
+    'canceled_count',
+    'reservation_count',
+    'total_guests',
+    'active_revenue',
+    'canceled_revenue',
+    'total_revenue',
+)
+
+# Rollup tablosunun hangi güne kadar eksiksiz olduğunu tutan ayar
+DAILY_STATS_WATERMARK_KEY = 'daily_stats_built_through'
+
+
+def turkey_today():
+    """Türkiye saatine (UTC+3) göre bugünün tarihi"""
+    return (datetime.now() + timedelta(hours=3)).date()
+
+
+def empty_metrics():
+    """Hiç rezervasyonu olmayan bir şube/personel için sıfır değerli metrikler"""
+    return {key: 0 for key in METRIC_KEYS}
+
+
+def sum_metrics(metrics_list):
+    """
+    Birden fazla metrik sözlüğünü toplar
+
+    Args:
+        metrics_list: empty_metrics() yapısındaki sözlüklerin listesi
+
+    Returns:
+        dict: Toplanmış metrikler
+    """
+    total = empty_metrics()
+    for metrics in metrics_list:
+        for key in METRIC_KEYS:
+            total[key] += metrics[key]
+    return total
+
+
+def _merge_results(target, source):
+    """Aynı anahtarlı metrikleri toplayarak source sonuçlarını target'a ekler"""
+    for key, metrics in source.items():
+        if key in target:
+            target[key] = sum_metrics([target[key], metrics])
+        else:
+            target[key] = metrics
+    return target
+
+
+def _build_results(rows, group_count):
+    """GROUP BY sorgu satırlarını anahtar -> metrik sözlüğüne dönüştürür"""
+    results = {}
+    for row in rows:
+        key = row[0] if group_count == 1 else tuple(row[:group_count])
+        active_count, canceled_count, total_guests, active_revenue, canceled_revenue = row[group_count:]
+
+        metrics = {
+            'active_count': active_count or 0,
+            'canceled_count': canceled_count or 0,
+            'total_guests': total_guests or 0,
+            'active_revenue': active_revenue or 0,
+            'canceled_revenue': canceled_revenue or 0,
+        }
+        metrics['reservation_count'] = metrics['active_count'] + metrics['canceled_count']
+        metrics['total_revenue'] = metrics['active_revenue'] + metrics['canceled_revenue']
+        results[key] = metrics
+    return results
+
+
+def _raw_metric_columns():
+    """Ham rezervasyon satırları üzerinde koşullu toplam kolonları"""
+    is_active = Reservation.is_canceled == False
+    is_canceled = Reservation.is_canceled == True
+
+    return [
+        func.sum(case((is_active, 1), else_=0)),
+        func.sum(case((is_canceled, 1), else_=0)),
+        func.sum(case((is_active, Reservation.num_people), else_=0)),
+        func.sum(case((is_active, Reservation.total_price), else_=0)),
+        # İptal edilen rezervasyonlardan kalan gelir (iade olmayan iptallerdeki ön ödemeler)
+        func.sum(case((and_(is_canceled, Reservation.cancel_revenue > 0), Reservation.cancel_revenue), else_=0)),
+    ]
+
+
+def raw_aggregate_query(start_date, end_date, group_by=('branch_id',), branch_id=None, staff_ids=None):
+    """Ham reservations tablosu üzerinde gruplanmış metrik sorgusu (çalıştırılmadan)"""
+    columns = [getattr(Reservation, name) for name in group_by]
+
+    query = db.session.query(*columns, *_raw_metric_columns()).filter(
+        Reservation.reservation_date >= start_date,
+        Reservation.reservation_date <= end_date
+    )
+
+    if branch_id is not None:
+        query = query.filter(Reservation.branch_id == branch_id)
+    if staff_ids is not None:
+        query = query.filter(Reservation.staff_id.in_(staff_ids))
+
+    return query.group_by(*columns)
+
+
+def _aggregate_raw(start_date, end_date, group_by, branch_id, staff_ids):
+    """Metrikleri doğrudan reservations tablosundan hesaplar"""
+    query = raw_aggregate_query(start_date, end_date, group_by, branch_id, staff_ids)
+    return _build_results(query.all(), len(group_by))
+
+
+def _aggregate_rollup(start_date, end_date, group_by, branch_id, staff_ids):
+    """Metrikleri günlük rollup tablosundan hesaplar"""
+    columns = [getattr(ReservationDailyStat, name) for name in group_by]
+
+    query = db.session.query(
+        *columns,
+        func.sum(ReservationDailyStat.active_count),
+        func.sum(ReservationDailyStat.canceled_count),
+        func.sum(ReservationDailyStat.total_guests),
+        func.sum(ReservationDailyStat.active_revenue),
+        func.sum(ReservationDailyStat.canceled_revenue),
+    ).filter(
+        ReservationDailyStat.stat_date >= start_date,
+        ReservationDailyStat.stat_date <= end_date
+    )
+
+    if branch_id is not None:
+        query = query.filter(ReservationDailyStat.branch_id == branch_id)
+    if staff_ids is not None:
+        query = query.filter(ReservationDailyStat.staff_id.in_(staff_ids))
+
+    return _build_results(query.group_by(*columns).all(), len(columns))
+
+
+def aggregate_reservations(start_date, end_date, group_by=('branch_id',), branch_id=None, staff_ids=None,
+                           use_rollup=True):
+    """
+    Rezervasyon metriklerini koşullu GROUP BY sorgularıyla hesaplar
+
+    Kapanmış günler (rollup'ın tamamlandığı son güne kadar) reservation_daily_stats
+    tablosundan, bugün ve sonrası ham rezervasyon satırlarından okunur. Her iki kaynak
+    da tek bir GROUP BY sorgusuyla okunduğundan şube veya personel sayısı arttıkça
+    sorgu sayısı artmaz.
+
+    Args:
+        start_date: Başlangıç tarihi (dahil)
+        end_date: Bitiş tarihi (dahil)
+        group_by: Gruplanacak kolon adları ('branch_id', 'staff_id')
+        branch_id: Sadece bu şubenin rezervasyonları (opsiyonel)
+        staff_ids: Sadece bu personellerin rezervasyonları (opsiyonel)
+        use_rollup: False ise tüm aralık ham satırlardan hesaplanır
+
+    Returns:
+        dict: Tek kolonla gruplamada kolon değeri, aksi halde değerlerin tuple'ı
+              -> empty_metrics() yapısında metrikler
+    """
+    raw_start = start_date
+    results = {}
+
+    if use_rollup:
+        built_through = get_daily_stats_watermark()
+        if built_through is not None:
+            rollup_end = min(end_date, built_through, turkey_today() - timedelta(days=1))
+            if start_date <= rollup_end:
+                results = _aggregate_rollup(start_date, rollup_end, group_by, branch_id, staff_ids)
+                raw_start = rollup_end + timedelta(days=1)
+
+    if raw_start <= end_date:
+        raw_results = _aggregate_raw(raw_start, end_date, group_by, branch_id, staff_ids)
+        _merge_results(results, raw_results)
+
+    return results
+
+
+def get_daily_stats_watermark():
+    """
+    Rollup tablosunun eksiksiz olduğu son günü döndürür
+
+    Returns:
+        date: Son tamamlanan gün veya rollup hiç oluşturulmadıysa None
+    """
+    value = Setting.get(DAILY_STATS_WATERMARK_KEY)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def rebuild_daily_stats(start_date=None, end_date=None):
+    """
+    reservation_daily_stats tablosunu ham rezervasyonlardan yeniden oluşturur
+
+    Belirtilen aralıktaki rollup satırları silinir ve tek bir INSERT ... SELECT
+    sorgusuyla yeniden hesaplanır. Sadece kapanmış günler (dünden öncesi) işlenir.
+
+    Args:
+        start_date: Başlangıç tarihi (verilmezse tüm geçmiş)
+        end_date: Bitiş tarihi (verilmezse dün)
+
+    Returns:
+        int: Yazılan rollup satırı sayısı
+    """
+    yesterday = turkey_today() - timedelta(days=1)
+    if end_date is None or end_date > yesterday:
+        end_date = yesterday
+
+    built_through = get_daily_stats_watermark()
+
+    delete_query = ReservationDailyStat.query.filter(ReservationDailyStat.stat_date <= end_date)
+    if start_date is not None:
+        delete_query = delete_query.filter(ReservationDailyStat.stat_date >= start_date)
+    delete_query.delete(synchronize_session=False)
+
+    source = db.session.query(
+        Reservation.branch_id,
+        Reservation.staff_id,
+        Reservation.reservation_date,
+        *_raw_metric_columns()
+    ).filter(Reservation.reservation_date <= end_date)
+    if start_date is not None:
+        source = source.filter(Reservation.reservation_date >= start_date)
+    source = source.group_by(
+        Reservation.branch_id,
+        Reservation.staff_id,
+        Reservation.reservation_date
+    )
+
+    result = db.session.execute(
+        insert(ReservationDailyStat).from_select(
+            ['branch_id', 'staff_id', 'stat_date', 'active_count', 'canceled_count',
+             'total_guests', 'active_revenue', 'canceled_revenue'],
+            source
+        )
+    )
+
+    # Aralık mevcut rollup ile bitişikse tamamlanan son günü ilerlet
+    contiguous = start_date is None or (
+        built_through is not None and start_date <= built_through + timedelta(days=1)
+    )
+    if contiguous and (built_through is None or end_date > built_through):
+        Setting.set(DAILY_STATS_WATERMARK_KEY, end_date.isoformat(), 'Günlük rapor özetlerinin tamamlandığı son gün')
+    else:
+        db.session.commit()
+
+    return result.rowcount
+
+
+def roll_forward_daily_stats():
+    """
+    Rollup'ı dünün sonuna kadar ilerletir (zamanlanmış görev için)
+
+    Rollup hiç oluşturulmadıysa tüm geçmiş için yeniden oluşturulur.
+
+    Returns:
+        int: Yazılan rollup satırı sayısı
+    """
+    built_through = get_daily_stats_watermark()
+    if built_through is None:
+        return rebuild_daily_stats()
+
+    if built_through >= turkey_today() - timedelta(days=1):
+        return 0
+    return rebuild_daily_stats(start_date=built_through + timedelta(days=1))
+
+
+def reservation_stat_snapshot(reservation):
+    """
+    Bir rezervasyonun günlük rollup'a katkısını döndürür
+
+    Rezervasyon değiştirilmeden önce ve sonra alınan iki görüntü
+    apply_daily_stats_change() fonksiyonuna verilerek fark uygulanır.
+
+    Args:
+        reservation: Reservation nesnesi
+
+    Returns:
+        tuple: ((branch_id, staff_id, stat_date), katkı sözlüğü)
+    """
+    # Henüz flush edilmemiş yeni kayıtta is_canceled None'dır (varsayılan: False)
+    is_canceled = bool(reservation.is_canceled)
+    is_active = not is_canceled
+    cancel_revenue = reservation.cancel_revenue or 0
+
+    contribution = {
+        'active_count': 1 if is_active else 0,
+        'canceled_count': 1 if is_canceled else 0,
+        'total_guests': reservation.num_people if is_active else 0,
+        'active_revenue': reservation.total_price if is_active else 0,
+        'canceled_revenue': cancel_revenue if is_canceled and cancel_revenue > 0 else 0,
+    }
+    key = (reservation.branch_id, reservation.staff_id, reservation.reservation_date)
+    return key, contribution
+
+
+def _upsert_daily_stat(key, delta):
+    """Tek bir rollup satırına fark değerlerini ekler (yoksa satırı oluşturur)"""
+    branch_id, staff_id, stat_date = key
+    table = ReservationDailyStat.__table__
+    values = dict(branch_id=branch_id, staff_id=staff_id, stat_date=stat_date, **delta)
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        stmt = dialect_insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['branch_id', 'staff_id', 'stat_date'],
+            set_={column: table.c[column] + stmt.excluded[column] for column in delta}
+        )
+        db.session.execute(stmt)
+        return
+
+    # Diğer veritabanları için önce güncelle, satır yoksa ekle
+    result = db.session.execute(
+        table.update().where(
+            table.c.branch_id == branch_id,
+            table.c.staff_id == staff_id,
+            table.c.stat_date == stat_date
+        ).values({column: table.c[column] + value for column, value in delta.items()})
+    )
+    if result.rowcount == 0:
+        db.session.execute(table.insert().values(**values))
+
+
+def apply_daily_stats_change(before=None, after=None):
+    """
+    Bir rezervasyon değişikliğini günlük rollup'a fark olarak uygular
+
+    Değişiklik mevcut oturuma eklenir ve rezervasyonla aynı commit içinde yazılır.
+    Şube, personel veya tarih değiştiyse eski anahtardan çıkarılıp yeni anahtara eklenir.
+    Etkilenen şube ve tarihler için rapor önbelleği de geçersiz kılınır.
+
+    Args:
+        before: Değişiklikten önceki reservation_stat_snapshot() (yeni kayıtta None)
+        after: Değişiklikten sonraki reservation_stat_snapshot() (silinen kayıtta None)
+    """
+    deltas = {}
+    if before is not None:
+        key, contribution = before
+        delta = deltas.setdefault(key, {column: 0 for column in contribution})
+        for column, value in contribution.items():
+            delta[column] -= value
+    if after is not None:
+        key, contribution = after
+        delta = deltas.setdefault(key, {column: 0 for column in contribution})
+        for column, value in contribution.items():
+            delta[column] += value
+
+    changed = set()
+    for key, delta in deltas.items():
+        if any(delta.values()):
+            _upsert_daily_stat(key, delta)
+            changed.add((key[0], key[2]))
+
+    # Etkilenen şube/tarihlerin rapor önbelleğini geçersiz kıl
+    for branch_id, stat_date in changed:
+        invalidate_reports(branch_id=branch_id, reservation_date=stat_date)
+
+
+def delete_daily_stats(branch_id=None, staff_id=None):
+    """
+    Silinen şube/personelin rollup satırlarını kaldırır (rezervasyonlar toplu silindiğinde)
+
+    Args:
+        branch_id: Şube ID'si (opsiyonel)
+        staff_id: Personel ID'si (opsiyonel)
+    """
+    query = ReservationDailyStat.query
+    if branch_id is not None:
+        query = query.filter(ReservationDailyStat.branch_id == branch_id)
+    if staff_id is not None:
+        query = query.filter(ReservationDailyStat.staff_id == staff_id)
+    query.delete(synchronize_session=False)
+
+    # Personel bazlı silmede şube bilinmediğinden tüm raporlar yenilenir
+    invalidate_reports(branch_id=branch_id)
+
+
+def check_daily_stats(start_date=None, end_date=None):
+    """
+    Rollup tablosunu ham rezervasyon verileriyle karşılaştırır
+
+    Args:
+        start_date: Başlangıç tarihi (verilmezse tüm geçmiş)
+        end_date: Bitiş tarihi (verilmezse rollup'ın tamamlandığı son gün)
+
+    Returns:
+        list: Uyuşmayan her değer için {'key', 'column', 'rollup', 'raw'} sözlükleri
+    """
+    built_through = get_daily_stats_watermark()
+    if built_through is None:
+        return []
+    if end_date is None or end_date > built_through:
+        end_date = built_through
+    if start_date is None:
+        start_date = datetime.min.date()
+    if start_date > end_date:
+        return []
+
+    group_by = ('branch_id', 'staff_id', 'reservation_date')
+    raw = _aggregate_raw(start_date, end_date, group_by, None, None)
+
+    rollup_columns = ('branch_id', 'staff_id', 'stat_date')
+    rollup = _aggregate_rollup(start_date, end_date, rollup_columns, None, None)
+
+    mismatches = []
+    for key in sorted(set(raw) | set(rollup)):
+        raw_metrics = raw.get(key, empty_metrics())
+        rollup_metrics = rollup.get(key, empty_metrics())
+        for column in METRIC_KEYS:
+            if abs((rollup_metrics[column] or 0) - (raw_metrics[column] or 0)) > 0.005:
+                mismatches.append({
+                    'key': key,
+                    'column': column,
+                    'rollup': rollup_metrics[column],
+                    'raw': raw_metrics[column],
+                })
+    return mismatches
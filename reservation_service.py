@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import Branch, Staff, Reservation, Customer, Log
+from report_service import reservation_stat_snapshot, apply_daily_stats_change
+from outbox import enqueue_message
+from telegram_service import build_reservation_message
+
+
+def _get_or_create_customer(name, phone):
+    """
+    Telefon numarasına göre müşteriyi bulur, yoksa oluşturur (commit etmeden)
+
+    Aynı numarayla eşzamanlı iki rezervasyon geldiğinde benzersizlik hatası
+    savepoint ile yakalanır ve diğer işlemin oluşturduğu müşteri kullanılır.
+
+    Returns:
+        tuple: (Customer, yeni oluşturuldu mu)
+    """
+    customer = Customer.query.filter_by(phone=phone).first()
+    if customer:
+        return customer, False
+
+    try:
+        with db.session.begin_nested():
+            customer = Customer(name=name, phone=phone)
+            db.session.add(customer)
+    except IntegrityError:
+        customer = Customer.query.filter_by(phone=phone).first()
+        if customer is None:
+            raise
+        return customer, False
+
+    return customer, True
+
+
+def _get_branch_and_staff(branch_id, staff_id):
+    """Şube ve personeli tek sorguda getirir"""
+    row = db.session.query(Branch, Staff).outerjoin(
+        Staff, Staff.id == staff_id
+    ).filter(Branch.id == branch_id).first()
+    if row:
+        return row
+    return db.session.get(Branch, branch_id), db.session.get(Staff, staff_id)
+
+
+def create_reservation(customer_name, customer_phone, num_people, total_price, advance_payment_percentage,
+                       payment_type, payment_status, branch_id, staff_id, reservation_date, reservation_time):
+    """
+    Yeni rezervasyonu tek transaction ve tek commit ile oluşturur
+
+    Müşteri kaydı (bul veya oluştur), rezervasyon, ilk rezervasyon kontrolü,
+    günlük rapor özeti, log kayıtları ve şubenin Telegram bildirimi (outbox)
+    aynı transaction içinde yazılır.
+    Hata durumunda transaction geri alınır ve hata yükseltilir.
+
+    Dönen değerler commit öncesinde okunur; commit sonrası süresi dolan
+    nesneler için veritabanına tekrar gidilmez.
+
+    Returns:
+        dict: Yanıt için gereken rezervasyon, müşteri, şube ve personel bilgileri
+    """
+    try:
+        branch, staff = _get_branch_and_staff(branch_id, staff_id)
+        customer, customer_created = _get_or_create_customer(customer_name, customer_phone)
+
+        # Yeni müşterinin geçmiş rezervasyonu olamaz; mevcut müşteri için sadece varlık kontrolü yeterli
+        if customer_created:
+            is_first_reservation = True
+        else:
+            is_first_reservation = not db.session.query(
+                Reservation.query.filter_by(customer_id=customer.id).exists()
+            ).scalar()
+
+        reservation = Reservation(
+            customer_id=customer.id,
+            customer_name=customer_name,
+            customer_phone=customer_phone,
+            num_people=num_people,
+            total_price=total_price,
+            advance_payment_percentage=advance_payment_percentage,
+            payment_type=payment_type,
+            payment_status=payment_status,
+            branch_id=branch_id,
+            staff_id=staff_id,
+            reservation_date=reservation_date,
+            reservation_time=reservation_time,
+        )
+        db.session.add(reservation)
+
+        # Günlük rapor özetini aynı transaction içinde güncelle
+        apply_daily_stats_change(after=reservation_stat_snapshot(reservation))
+
+        if is_first_reservation:
+            Log.add_log(
+                log_type="CUSTOMER",
+                action="CREATE",
+                details=f"New customer created: {customer_name} ({customer_phone})",
+                branch_id=branch_id,
+                commit=False
+            )
+
+        Log.add_log(
+            log_type="RESERVATION",
+            action="CREATE",
+            details=f"New reservation created: {customer_name} on {reservation_date} at {reservation_time}",
+            branch_id=branch_id,
+            commit=False
+        )
+
+        # Rezervasyon ID'sini almak için flush; yanıt bilgileri commit öncesinde toplanır
+        db.session.flush()
+
+        # Şube bildirimi commit ile birlikte kuyruğa girer, gönderim isteği bekletmez
+        if branch and branch.telegram_enabled and branch.telegram_chat_id:
+            enqueue_message(
+                branch.telegram_chat_id,
+                build_reservation_message(reservation, branch, staff),
+                kind='RESERVATION_CREATE',
+                dedupe_key=f"reservation:{reservation.id}:create"
+            )
+
+        result = {
+            'reservation_id': reservation.id,
+            'customer_id': customer.id,
+            'is_first_reservation': is_first_reservation,
+            'telegram_enabled': branch.telegram_enabled if branch else False,
+            'telegram_chat_id': branch.telegram_chat_id if branch else None,
+            'branch_name': branch.name if branch else 'Unknown',
+            'staff_name': staff.name if staff else 'Unknown',
+        }
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return result
@@ -1,16 +1,23 @@
 from flask import render_template, request, redirect, url_for, jsonify, flash, session, send_file
 from app import app, db, login_manager
-from models import Branch, Staff, Reservation, Customer, Log, Setting, User, Role
+from models import Branch, Staff, Reservation, Customer, Log, Setting, User, Role, OutboxMessage
 from forms import LoginForm, UserForm, RoleForm
 from datetime import datetime, timedelta, date, time
-from sqlalchemy import func, extract, and_, case, or_, text
+from sqlalchemy import or_, text
 from flask_login import login_user, logout_user, login_required, current_user
 import calendar
 import asyncio
 import logging
-from threading import Thread
 # Telegram servisini aktif hale getiriyoruz
-from telegram_service import send_message, send_reservation_notification, send_cancellation_notification
+from telegram_service import send_message, send_reservation_notification, send_cancellation_notification, build_cancellation_message
+from report_service import (aggregate_reservations, empty_metrics, sum_metrics, reservation_stat_snapshot,
+                            apply_daily_stats_change, delete_daily_stats)
+from report_cache import cached_report, invalidate_reports, report_cache
+from customer_search import search_customers
+from reservation_service import create_reservation
+from log_service import fetch_logs_page, LOGS_PER_PAGE
+from settings_cache import settings_cache, bump_cache_version, SETTINGS_VERSION_NAME
+from outbox import enqueue_message
 from functools import wraps
 import os
 
@@ -69,6 +76,30 @@ def get_date_range(period, request_obj):
         
     return start_date, end_date
 
+def load_reservation_grid(branch_id, start_date, end_date):
+    """
+    Bir şubenin tarih aralığındaki aktif rezervasyonlarını tek sorguda yükler
+    
+    Args:
+        branch_id: Şube ID'si
+        start_date: Başlangıç tarihi (dahil)
+        end_date: Bitiş tarihi (dahil)
+    
+    Returns:
+        dict: (reservation_date, reservation_time) -> Reservation eşlemesi
+    """
+    reservations = Reservation.query.filter(
+        Reservation.branch_id == branch_id,
+        Reservation.reservation_date.between(start_date, end_date),
+        Reservation.is_canceled == False  # İptal edilmeyen rezervasyonları göster
+    ).order_by(Reservation.id).all()
+    
+    grid = {}
+    for res in reservations:
+        # Aynı hücrede birden fazla kayıt varsa ilk oluşturulanı göster
+        grid.setdefault((res.reservation_date, res.reservation_time), res)
+    return grid
+
 # Logger kurulumu
 logger = logging.getLogger(__name__)
 
@@ -223,15 +254,12 @@ def reservation():
     # Get existing reservations for this branch and selected date range
     reservations = {}
     if branch_id:
+        # Tüm hafta tek sorguda yüklenir, hücreler bellekteki indeksten okunur
+        grid = load_reservation_grid(branch_id, dates[0], dates[-1])
         for d in dates:
             for h in hours:
                 time_obj = datetime.strptime(h, "%H:%M").time()
-                res = Reservation.query.filter(
-                    Reservation.branch_id == branch_id,
-                    Reservation.reservation_date == d,
-                    Reservation.reservation_time == time_obj,
-                    Reservation.is_canceled == False  # İptal edilmeyen rezervasyonları göster
-                ).first()
+                res = grid.get((d, time_obj))
                 
                 if res:
                     key = f"{d.isoformat()}-{h}"
@@ -289,8 +317,8 @@ def save_reservation():
         if form_token:
             print(f"Form token received: {form_token}")
             
-        # Create new reservation
-        new_reservation = Reservation(
+        # Müşteri, rezervasyon, rapor özeti ve loglar tek transaction ile yazılır
+        result = create_reservation(
             customer_name=data['customerName'],
             customer_phone=data['customerPhone'],
             num_people=int(data['numPeople']),
@@ -303,46 +331,14 @@ def save_reservation():
             reservation_date=datetime.strptime(data['reservationDate'], "%Y-%m-%d").date(),
             reservation_time=datetime.strptime(data['reservationTime'], "%H:%M").time(),
         )
-        
-        # Use save_with_customer method to automatically associate with customer record
-        # This no longer creates logs directly
-        new_reservation.save_with_customer()
-        db.session.add(new_reservation)
-        db.session.commit()
-        
-        # Check if a new customer was created during reservation and log it
-        customer = Customer.query.filter_by(phone=new_reservation.customer_phone).first()
-        is_first_reservation = Reservation.query.filter_by(customer_id=customer.id).count() == 1
-        
-        # Add logs after commit to improve performance
-        if is_first_reservation:
-            Log.add_log(
-                log_type="CUSTOMER",
-                action="CREATE",
-                details=f"New customer created: {new_reservation.customer_name} ({new_reservation.customer_phone})",
-                branch_id=new_reservation.branch_id
-            )
-            
-        # Add reservation log entry
-        Log.add_log(
-            log_type="RESERVATION",
-            action="CREATE",
-            details=f"New reservation created: {new_reservation.customer_name} on {new_reservation.reservation_date} at {new_reservation.reservation_time}",
-            branch_id=new_reservation.branch_id
-        )
-        
-        # Get branch and staff details for response
-        branch = Branch.query.get(new_reservation.branch_id)
-        staff = Staff.query.get(new_reservation.staff_id)
-        
         response = {
             'success': True, 
-            'id': new_reservation.id,
+            'id': result['reservation_id'],
             # Include details for client-side Telegram notification if needed
-            'telegram_enabled': branch.telegram_enabled if branch else False,
-            'telegram_chat_id': branch.telegram_chat_id if branch else None,
-            'branch_name': branch.name if branch else 'Unknown',
-            'staff_name': staff.name if staff else 'Unknown'
+            'telegram_enabled': result['telegram_enabled'],
+            'telegram_chat_id': result['telegram_chat_id'],
+            'branch_name': result['branch_name'],
+            'staff_name': result['staff_name']
         }
         
         return jsonify(response)
@@ -361,8 +357,10 @@ def send_telegram_notification():
         if not data or not data.get('reservation_id'):
             return jsonify({'success': False, 'error': 'Geçersiz veri'})
             
-        # Create a separate session to avoid conflicts
-        from telegram_service import send_message
+        # Sunucu tarafında zaten kuyruğa alındıysa (save_reservation) tekrar gönderme
+        dedupe_key = f"reservation:{data.get('reservation_id')}:create"
+        if OutboxMessage.query.filter_by(dedupe_key=dedupe_key).first():
+            return jsonify({'success': True, 'queued': True})
         
         # Ödeme tipini Türkçeleştir
         payment_type = data.get('payment_type', '-')
@@ -409,13 +407,11 @@ def send_telegram_notification():
         if not chat_id:
             return jsonify({'success': False, 'error': 'Telegram chat ID mevcut değil'})
             
-        result = send_message(chat_id, message)
-        
-        if result:
-            print(f"Telegram notification sent successfully for reservation ID: {data.get('reservation_id')}")
-            return jsonify({'success': True})
-        else:
-            return jsonify({'success': False, 'error': 'Telegram bildirimi gönderilirken bir hata oluştu'})
+        # Bildirimi outbox'a ekle, arka planda yeniden denemelerle gönderilir
+        enqueue_message(chat_id, message, kind='RESERVATION_CREATE', dedupe_key=dedupe_key)
+        db.session.commit()
+        print(f"Telegram notification queued for reservation ID: {data.get('reservation_id')}")
+        return jsonify({'success': True, 'queued': True})
             
     except Exception as e:
         print(f"Error sending Telegram notification: {e}")
@@ -423,88 +419,39 @@ def send_telegram_notification():
         print(f"Detailed error: {traceback.format_exc()}")
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/branch_summary')
-def branch_summary():
-    """Tüm şubelerin özet raporu"""
-    branches = Branch.query.all()
-    selected_period = request.args.get('period', 'this_month')
-    
-    # Store selected branch in session (for consistency across pages, even if not needed here)
-    branch_id = request.args.get('branch_id', session.get('selected_branch_id'))
-    if branch_id:
-        session['selected_branch_id'] = int(branch_id)
-    
-    # Tarih aralığını belirle
-    start_date, end_date = get_date_range(selected_period, request)
+def build_branch_summary_data(branches, start_date, end_date):
+    """
+    Şube özet raporunun verilerini hesaplar
     
+    Returns:
+        tuple: (branch_data, total_data)
+    """
     branch_data = []
     total_reservation_count = 0
     total_guests = 0
     total_revenue = 0
     
+    # Tüm şubelerin metrikleri tek GROUP BY sorgusuyla hesaplanır
+    branch_metrics = aggregate_reservations(start_date, end_date, group_by=('branch_id',))
+    
     # Her şube için verileri topla
     for branch in branches:
-        # Aktif rezervasyon sayısı
-        active_reservation_count = Reservation.query.filter(
-            Reservation.branch_id == branch.id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == False
-        ).count()
-        
-        # İptal edilen rezervasyon sayısı
-        canceled_reservation_count = Reservation.query.filter(
-            Reservation.branch_id == branch.id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == True
-        ).count()
-        
-        # Toplam rezervasyon sayısı (aktif + iptal)
-        branch_reservation_count = active_reservation_count + canceled_reservation_count
-        
-        # Misafir sayısı (sadece aktif rezervasyonlar)
-        branch_total_guests = db.session.query(func.sum(Reservation.num_people)).filter(
-            Reservation.branch_id == branch.id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == False
-        ).scalar() or 0
-        
-        # Toplam ciro - aktif rezervasyonlar
-        active_reservations_revenue = db.session.query(func.sum(Reservation.total_price)).filter(
-            Reservation.branch_id == branch.id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == False
-        ).scalar() or 0
-        
-        # İptal edilen rezervasyonlardan kalan gelir (iade olmayan iptal işlemlerindeki ön ödemeler)
-        canceled_reservations_revenue = db.session.query(func.sum(Reservation.cancel_revenue)).filter(
-            Reservation.branch_id == branch.id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == True,
-            Reservation.cancel_revenue > 0
-        ).scalar() or 0
-        
-        # Toplam gelir = aktif rezervasyonlar + iptal edilenlerden kalan ön ödemeler
-        branch_total_revenue = active_reservations_revenue + canceled_reservations_revenue
+        metrics = branch_metrics.get(branch.id, empty_metrics())
         
         # Genel toplamlara ekle
-        total_reservation_count += branch_reservation_count
-        total_guests += branch_total_guests
-        total_revenue += branch_total_revenue
+        total_reservation_count += metrics['reservation_count']
+        total_guests += metrics['total_guests']
+        total_revenue += metrics['total_revenue']
         
         # Şube verilerini ekle
         branch_data.append({
             'id': branch.id,
             'name': branch.name,
-            'active_count': active_reservation_count,
-            'canceled_count': canceled_reservation_count,
-            'reservation_count': branch_reservation_count,
-            'total_guests': branch_total_guests,
-            'total_revenue': branch_total_revenue,
+            'active_count': metrics['active_count'],
+            'canceled_count': metrics['canceled_count'],
+            'reservation_count': metrics['reservation_count'],
+            'total_guests': metrics['total_guests'],
+            'total_revenue': metrics['total_revenue'],
             'revenue_percentage': 0  # Daha sonra hesaplanacak
         })
     
@@ -525,6 +472,28 @@ def branch_summary():
         'total_revenue': total_revenue
     }
     
+    return branch_data, total_data
+
+@app.route('/branch_summary')
+def branch_summary():
+    """Tüm şubelerin özet raporu"""
+    branches = Branch.query.all()
+    selected_period = request.args.get('period', 'this_month')
+    
+    # Store selected branch in session (for consistency across pages, even if not needed here)
+    branch_id = request.args.get('branch_id', session.get('selected_branch_id'))
+    if branch_id:
+        session['selected_branch_id'] = int(branch_id)
+    
+    # Tarih aralığını belirle
+    start_date, end_date = get_date_range(selected_period, request)
+    
+    # Hesaplanan veriler önbellekten okunur, değişiklik olduğunda yeniden hesaplanır
+    branch_data, total_data = cached_report(
+        'branch_summary', selected_period, start_date, end_date, None,
+        lambda: build_branch_summary_data(branches, start_date, end_date)
+    )
+    
     return render_template(
         'branch_summary.html',
         branches=branches,
@@ -535,6 +504,52 @@ def branch_summary():
         end_date=end_date.strftime('%Y-%m-%d') if end_date else ''
     )
 
+def build_branch_report_data(branch_id, start_date, end_date):
+    """
+    Şube raporu sayfasının personel ve şube verilerini hesaplar
+    
+    Returns:
+        tuple: (staff_data, branch_data)
+    """
+    staff_data = []
+    
+    # Get data for each staff
+    staff_members = Staff.query.filter_by(branch_id=branch_id).all()
+    
+    # Şubenin personel bazlı metrikleri tek GROUP BY sorgusuyla hesaplanır
+    staff_metrics = aggregate_reservations(
+        start_date, end_date, group_by=('staff_id',), branch_id=branch_id
+    )
+    
+    for staff in staff_members:
+        metrics = staff_metrics.get(staff.id, empty_metrics())
+        
+        staff_data.append({
+            'name': staff.name,
+            'reservation_count': metrics['reservation_count'],
+            'active_count': metrics['active_count'],
+            'canceled_count': metrics['canceled_count'],
+            'total_guests': metrics['total_guests'],
+            'total_revenue': metrics['total_revenue'],
+            'active_revenue': metrics['active_revenue'],
+            'canceled_revenue': metrics['canceled_revenue']
+        })
+    
+    # Şube özeti, şubedeki tüm personel gruplarının toplamıdır
+    branch_metrics = sum_metrics(staff_metrics.values())
+    
+    branch_data = {
+        'reservation_count': branch_metrics['reservation_count'],
+        'active_count': branch_metrics['active_count'],
+        'canceled_count': branch_metrics['canceled_count'],
+        'total_guests': branch_metrics['total_guests'],
+        'total_revenue': branch_metrics['total_revenue'],
+        'active_revenue': branch_metrics['active_revenue'],
+        'canceled_revenue': branch_metrics['canceled_revenue']
+    }
+    
+    return staff_data, branch_data
+
 @app.route('/reports')
 def reports():
     """Report & Statistics page"""
@@ -577,129 +592,11 @@ def reports():
             start_date = date(1900, 1, 1)  # Beginning of time
             end_date = date(2100, 12, 31)  # Far in the future
         
-        # Get data for each staff
-        staff_members = Staff.query.filter_by(branch_id=branch_id).all()
-        
-        for staff in staff_members:
-            # Aktif rezervasyon sayısı
-            active_reservation_count = Reservation.query.filter(
-                Reservation.staff_id == staff.id,
-                Reservation.branch_id == branch_id,
-                Reservation.reservation_date >= start_date,
-                Reservation.reservation_date <= end_date,
-                Reservation.is_canceled == False
-            ).count()
-            
-            # İptal edilen rezervasyon sayısı
-            canceled_reservation_count = Reservation.query.filter(
-                Reservation.staff_id == staff.id,
-                Reservation.branch_id == branch_id,
-                Reservation.reservation_date >= start_date,
-                Reservation.reservation_date <= end_date,
-                Reservation.is_canceled == True
-            ).count()
-            
-            # Toplam rezervasyon sayısı (aktif + iptal)
-            reservation_count = active_reservation_count + canceled_reservation_count
-            
-            # Misafir sayısını sadece aktif rezervasyonlardan hesapla
-            total_guests = db.session.query(func.sum(Reservation.num_people)).filter(
-                Reservation.staff_id == staff.id,
-                Reservation.branch_id == branch_id,
-                Reservation.reservation_date >= start_date,
-                Reservation.reservation_date <= end_date,
-                Reservation.is_canceled == False
-            ).scalar() or 0
-            
-            # Personelin aktif rezervasyonlarından gelir
-            active_reservations_revenue = db.session.query(func.sum(Reservation.total_price)).filter(
-                Reservation.staff_id == staff.id,
-                Reservation.branch_id == branch_id,
-                Reservation.reservation_date >= start_date,
-                Reservation.reservation_date <= end_date,
-                Reservation.is_canceled == False
-            ).scalar() or 0
-            
-            # Personelin iptal edilen rezervasyonlarından kalan gelir
-            canceled_reservations_revenue = db.session.query(func.sum(Reservation.cancel_revenue)).filter(
-                Reservation.staff_id == staff.id,
-                Reservation.branch_id == branch_id,
-                Reservation.reservation_date >= start_date,
-                Reservation.reservation_date <= end_date,
-                Reservation.is_canceled == True,
-                Reservation.cancel_revenue > 0
-            ).scalar() or 0
-            
-            # Toplam gelir
-            total_revenue = active_reservations_revenue + canceled_reservations_revenue
-            
-            staff_data.append({
-                'name': staff.name,
-                'reservation_count': reservation_count,
-                'active_count': active_reservation_count,
-                'canceled_count': canceled_reservation_count,
-                'total_guests': total_guests,
-                'total_revenue': total_revenue,
-                'active_revenue': active_reservations_revenue,
-                'canceled_revenue': canceled_reservations_revenue
-            })
-        
-        # Get branch summary data - Aktif rezervasyonlar
-        active_reservation_count = Reservation.query.filter(
-            Reservation.branch_id == branch_id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == False
-        ).count()
-        
-        # İptal edilmiş rezervasyonlar
-        canceled_reservation_count = Reservation.query.filter(
-            Reservation.branch_id == branch_id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == True
-        ).count()
-        
-        # Toplam rezervasyon sayısı (aktif + iptal)
-        branch_reservation_count = active_reservation_count + canceled_reservation_count
-        
-        # Misafir sayısını sadece aktif rezervasyonlardan hesapla
-        branch_total_guests = db.session.query(func.sum(Reservation.num_people)).filter(
-            Reservation.branch_id == branch_id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == False
-        ).scalar() or 0
-        
-        # Aktif rezervasyonların toplam geliri
-        active_reservations_revenue = db.session.query(func.sum(Reservation.total_price)).filter(
-            Reservation.branch_id == branch_id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == False
-        ).scalar() or 0
-        
-        # İptal edilmiş rezervasyonlardan kalan gelir (ön ödemeler)
-        canceled_reservations_revenue = db.session.query(func.sum(Reservation.cancel_revenue)).filter(
-            Reservation.branch_id == branch_id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == True,
-            Reservation.cancel_revenue > 0
-        ).scalar() or 0
-        
-        # Toplam gelir = aktif rezervasyonlar + iptal edilenlerden kalan ön ödemeler
-        branch_total_revenue = active_reservations_revenue + canceled_reservations_revenue
-        
-        branch_data = {
-            'reservation_count': branch_reservation_count,
-            'active_count': active_reservation_count,
-            'canceled_count': canceled_reservation_count,
-            'total_guests': branch_total_guests,
-            'total_revenue': branch_total_revenue,
-            'active_revenue': active_reservations_revenue,
-            'canceled_revenue': canceled_reservations_revenue
-        }
+        # Hesaplanan veriler önbellekten okunur, değişiklik olduğunda yeniden hesaplanır
+        staff_data, branch_data = cached_report(
+            'reports', selected_period, start_date, end_date, branch_id,
+            lambda: build_branch_report_data(branch_id, start_date, end_date)
+        )
     
     return render_template(
         'reports.html',
@@ -736,6 +633,10 @@ def add_branch():
         )
         
         db.session.add(new_branch)
+        db.session.flush()
+        
+        # Şube listesi değiştiği için raporları yenile
+        invalidate_reports(branch_id=new_branch.id)
         db.session.commit()
         
         return jsonify({'success': True, 'id': new_branch.id})
@@ -786,6 +687,8 @@ def update_branch():
             
         branch.telegram_enabled = telegram_enabled
         
+        # Şube adı raporlarda gösterildiği için raporları yenile
+        invalidate_reports(branch_id=branch.id)
         db.session.commit()
         
         return jsonify({'success': True})
@@ -811,6 +714,7 @@ def delete_branch():
         # Delete related staff and reservations
         Staff.query.filter_by(branch_id=branch_id).delete()
         Reservation.query.filter_by(branch_id=branch_id).delete()
+        delete_daily_stats(branch_id=int(branch_id))
         
         # Delete branch
         db.session.delete(branch)
@@ -858,6 +762,9 @@ def add_staff():
         )
         
         db.session.add(new_staff)
+        
+        # Personel listesi değiştiği için şube raporlarını yenile
+        invalidate_reports(branch_id=int(staff_branch_id))
         db.session.commit()
         
         return jsonify({'success': True, 'id': new_staff.id})
@@ -884,6 +791,11 @@ def update_staff():
         if not staff:
             return jsonify({'success': False, 'error': 'Personel bulunamadı'})
         
+        # Personelin eski ve yeni şubesinin raporlarını yenile
+        invalidate_reports(branch_id=staff.branch_id)
+        if str(staff.branch_id) != str(staff_branch_id):
+            invalidate_reports(branch_id=int(staff_branch_id))
+        
         # Update staff
         staff.name = staff_name
         staff.phone = staff_phone
@@ -913,6 +825,7 @@ def delete_staff():
         
         # Delete reservations for this staff
         Reservation.query.filter_by(staff_id=staff_id).delete()
+        delete_daily_stats(staff_id=int(staff_id))
         
         # Delete staff
         db.session.delete(staff)
@@ -923,6 +836,44 @@ def delete_staff():
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)})
 
+def build_branch_comparison_data(branches, start_date, end_date):
+    """
+    Şube karşılaştırma raporunun verilerini hesaplar
+    
+    Returns:
+        list: Şube bazında karşılaştırma verileri
+    """
+    # Get data for all branches
+    branch_data = []
+    
+    # Tüm şubelerin metrikleri tek GROUP BY sorgusuyla hesaplanır
+    branch_metrics = aggregate_reservations(start_date, end_date, group_by=('branch_id',))
+    
+    for branch in branches:
+        metrics = branch_metrics.get(branch.id, empty_metrics())
+        active_reservation_count = metrics['active_count']
+        
+        # Calculate average price per reservation (if there are active reservations)
+        avg_price = metrics['active_revenue'] / active_reservation_count if active_reservation_count > 0 else 0
+        
+        # Calculate average guests per reservation (if there are active reservations)
+        avg_guests = metrics['total_guests'] / active_reservation_count if active_reservation_count > 0 else 0
+        
+        branch_data.append({
+            'name': branch.name,
+            'reservation_count': metrics['reservation_count'],
+            'active_count': active_reservation_count,
+            'canceled_count': metrics['canceled_count'],
+            'total_guests': metrics['total_guests'],
+            'total_revenue': metrics['total_revenue'],
+            'active_revenue': metrics['active_revenue'],
+            'canceled_revenue': metrics['canceled_revenue'],
+            'avg_price': avg_price,
+            'avg_guests': avg_guests
+        })
+    
+    return branch_data
+
 @app.route('/branch_comparison')
 def branch_comparison():
     """Branch comparison report page"""
@@ -956,75 +907,11 @@ def branch_comparison():
         start_date = date(1900, 1, 1)  # Beginning of time
         end_date = date(2100, 12, 31)  # Far in the future
     
-    # Get data for all branches
-    branch_data = []
-    
-    for branch in branches:
-        # Aktif rezervasyon sayısı
-        active_reservation_count = Reservation.query.filter(
-            Reservation.branch_id == branch.id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == False
-        ).count()
-        
-        # İptal edilen rezervasyon sayısı
-        canceled_reservation_count = Reservation.query.filter(
-            Reservation.branch_id == branch.id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == True
-        ).count()
-        
-        # Toplam rezervasyon sayısı (aktif + iptal)
-        reservation_count = active_reservation_count + canceled_reservation_count
-        
-        # Misafir sayısını sadece aktif rezervasyonlardan hesapla
-        total_guests = db.session.query(func.sum(Reservation.num_people)).filter(
-            Reservation.branch_id == branch.id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == False
-        ).scalar() or 0
-        
-        # Aktif rezervasyonlardan gelir
-        active_reservations_revenue = db.session.query(func.sum(Reservation.total_price)).filter(
-            Reservation.branch_id == branch.id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == False
-        ).scalar() or 0
-        
-        # İptal edilen rezervasyonlardan kalan gelir
-        canceled_reservations_revenue = db.session.query(func.sum(Reservation.cancel_revenue)).filter(
-            Reservation.branch_id == branch.id,
-            Reservation.reservation_date >= start_date,
-            Reservation.reservation_date <= end_date,
-            Reservation.is_canceled == True,
-            Reservation.cancel_revenue > 0
-        ).scalar() or 0
-        
-        # Toplam gelir
-        total_revenue = active_reservations_revenue + canceled_reservations_revenue
-        
-        # Calculate average price per reservation (if there are active reservations)
-        avg_price = active_reservations_revenue / active_reservation_count if active_reservation_count > 0 else 0
-        
-        # Calculate average guests per reservation (if there are active reservations)
-        avg_guests = total_guests / active_reservation_count if active_reservation_count > 0 else 0
-        
-        branch_data.append({
-            'name': branch.name,
-            'reservation_count': reservation_count,
-            'active_count': active_reservation_count,
-            'canceled_count': canceled_reservation_count,
-            'total_guests': total_guests,
-            'total_revenue': total_revenue,
-            'active_revenue': active_reservations_revenue,
-            'canceled_revenue': canceled_reservations_revenue,
-            'avg_price': avg_price,
-            'avg_guests': avg_guests
-        })
+    # Hesaplanan veriler önbellekten okunur, değişiklik olduğunda yeniden hesaplanır
+    branch_data = cached_report(
+        'branch_comparison', selected_period, start_date, end_date, None,
+        lambda: build_branch_comparison_data(branches, start_date, end_date)
+    )
     
     return render_template(
         'branch_comparison.html',
@@ -1033,6 +920,21 @@ def branch_comparison():
         branch_data=branch_data
     )
 
+@app.route('/api/report_cache_stats', methods=['GET'])
+@login_required
+@role_required('can_view_reports')
+def report_cache_stats():
+    """Rapor önbelleğinin isabet/ıska sayaçları (bu worker için)"""
+    return jsonify({'success': True, 'pid': os.getpid(), 'stats': report_cache.stats()})
+
+@app.route('/api/scheduler_status', methods=['GET'])
+@login_required
+@role_required('can_view_settings')
+def scheduler_status():
+    """Zamanlanmış görevleri çalıştıran lider sürecin bilgileri"""
+    from scheduler_leader import scheduler_leader
+    return jsonify({'success': True, 'status': scheduler_leader.status()})
+
 @app.route('/api/get_reservation', methods=['GET'])
 def get_reservation():
     """Get reservation details by ID"""
@@ -1079,6 +981,9 @@ def update_reservation():
         if not reservation:
             return jsonify({'success': False, 'error': 'Rezervasyon bulunamadı'})
         
+        # Değişiklikten önceki rapor katkısını sakla (şube/personel/tarih değişebilir)
+        stats_before = reservation_stat_snapshot(reservation)
+        
         # Update reservation
         reservation.customer_name = data.get('customerName')
         reservation.customer_phone = data.get('customerPhone')
@@ -1094,6 +999,9 @@ def update_reservation():
             reservation.reservation_date = datetime.strptime(data.get('reservationDate'), "%Y-%m-%d").date()
             reservation.reservation_time = datetime.strptime(data.get('reservationTime'), "%H:%M").time()
         
+        # Günlük rapor özetinde eski anahtardan çıkar, yeni anahtara ekle
+        apply_daily_stats_change(before=stats_before, after=reservation_stat_snapshot(reservation))
+        
         db.session.commit()
         
         return jsonify({'success': True})
@@ -1132,6 +1040,9 @@ def delete_reservation():
         cancel_type = "REFUND" if with_refund else "NORMAL"
         cancel_type_tr = "TAM İADE" if with_refund else "NORMAL"
         
+        # İptal öncesi rapor katkısını sakla
+        stats_before = reservation_stat_snapshot(reservation)
+        
         # Rezervasyonu iptal olarak işaretle (silme)
         reservation.is_canceled = True
         reservation.cancel_type = cancel_type
@@ -1141,21 +1052,18 @@ def delete_reservation():
             reservation.cancel_revenue = advance_payment
         else:
             reservation.cancel_revenue = 0
+        
+        # Günlük rapor özetini aynı transaction içinde güncelle
+        apply_daily_stats_change(before=stats_before, after=reservation_stat_snapshot(reservation))
             
-        # Send Telegram notification about reservation cancellation
+        # Telegram iptal bildirimini aynı transaction içinde kuyruğa ekle (outbox)
         if branch and branch.telegram_enabled and branch.telegram_chat_id:
-            try:
-                # Import is at top of file now, so no need to import again here
-                # Use the new function directly
-                thread = Thread(
-                    target=send_cancellation_notification,
-                    args=(reservation, branch, staff, with_refund, "Web Kullanıcısı"),
-                    daemon=True
-                )
-                thread.start()
-                print(f"Started Telegram cancellation notification thread for reservation: {reservation.id}")
-            except Exception as e:
-                print(f"Failed to send Telegram cancellation notification: {str(e)}")
+            enqueue_message(
+                branch.telegram_chat_id,
+                build_cancellation_message(reservation, branch, staff, with_refund, "Web Kullanıcısı"),
+                kind='RESERVATION_CANCEL',
+                dedupe_key=f"reservation:{reservation.id}:cancel"
+            )
         
         # Log kaydı oluştur
         Log.add_log(
@@ -1197,6 +1105,7 @@ def init_data():
             try:
                 # İlişkili verileri temizle
                 Reservation.query.delete()
+                delete_daily_stats()
                 Staff.query.delete()
                 Branch.query.delete()
                 db.session.commit()
@@ -1406,39 +1315,18 @@ def staff_performance():
             # Get staff members for the branch
             staff_members = Staff.query.filter_by(branch_id=branch_id).all()
             
+            # Personel metrikleri (personelin tüm şubelerdeki rezervasyonları) tek sorguda
+            staff_metrics = aggregate_reservations(
+                start_date, end_date, group_by=('staff_id',),
+                staff_ids=[staff.id for staff in staff_members]
+            )
+            
             for staff in staff_members:
-                # Aktif rezervasyonları al
-                active_reservations = Reservation.query.filter(
-                    Reservation.staff_id == staff.id,
-                    Reservation.reservation_date >= start_date,
-                    Reservation.reservation_date <= end_date,
-                    Reservation.is_canceled == False
-                ).all()
-                
-                # İptal edilen rezervasyonları al (gelir hesabı için)
-                canceled_reservations = Reservation.query.filter(
-                    Reservation.staff_id == staff.id,
-                    Reservation.reservation_date >= start_date,
-                    Reservation.reservation_date <= end_date,
-                    Reservation.is_canceled == True
-                ).all()
+                metrics = staff_metrics.get(staff.id, empty_metrics())
                 
-                # Misafir sayısı sadece aktif rezervasyonlar için
-                total_guests = sum(r.num_people for r in active_reservations)
-                
-                # Aktif rezervasyonların geliri
-                active_revenue = sum(r.total_price for r in active_reservations)
-                
-                # İptal edilmiş rezervasyonlardan kalan gelir (iade olmayan iptallerdeki ön ödemeler)
-                cancel_revenue = sum(r.cancel_revenue or 0 for r in canceled_reservations)
-                
-                # Toplam gelir
-                total_revenue = active_revenue + cancel_revenue
-                
-                # Toplam rezervasyon sayısı (iptal edilenler dahil)
-                active_reservation_count = len(active_reservations)
-                canceled_reservation_count = len(canceled_reservations)
-                reservation_count = active_reservation_count + canceled_reservation_count
+                total_guests = metrics['total_guests']
+                total_revenue = metrics['total_revenue']
+                active_reservation_count = metrics['active_count']
                 
                 # Ortalama misafir sayısı (sadece aktif rezervasyonlar için)
                 avg_guests = total_guests / active_reservation_count if active_reservation_count > 0 else 0
@@ -1450,13 +1338,13 @@ def staff_performance():
                     'id': staff.id,
                     'name': staff.name,
                     'phone': staff.phone,
-                    'reservation_count': reservation_count,
+                    'reservation_count': metrics['reservation_count'],
                     'active_reservations': active_reservation_count,
-                    'canceled_reservations': canceled_reservation_count,
+                    'canceled_reservations': metrics['canceled_count'],
                     'total_guests': total_guests,
                     'total_revenue': total_revenue,
-                    'active_revenue': active_revenue,
-                    'canceled_revenue': cancel_revenue,
+                    'active_revenue': metrics['active_revenue'],
+                    'canceled_revenue': metrics['canceled_revenue'],
                     'avg_guests_per_reservation': avg_guests,
                     'avg_revenue_per_reservation': avg_revenue
                 })
@@ -1551,6 +1439,8 @@ def factory_reset():
             # Şimdi tüm verileri temizle
             db.session.execute(text("""
                 DELETE FROM reservations;
+                DELETE FROM reservation_daily_stats;
+                DELETE FROM report_cache_events;
                 DELETE FROM customers;
                 DELETE FROM staff;
                 DELETE FROM logs;
@@ -1564,8 +1454,13 @@ def factory_reset():
                 DELETE FROM settings;
             """))
             
+            # Tüm rapor ve ayar önbelleklerini geçersiz kıl
+            invalidate_reports()
+            bump_cache_version(SETTINGS_VERSION_NAME)
+            
             # Commit the changes
             db.session.commit()
+            settings_cache.invalidate()
             
             # Başlangıç verilerini oluştur
             # 1. Yaygın şubeler
@@ -1701,31 +1596,52 @@ def logs():
     if selected_branch and selected_branch != 'all':
         session['selected_branch_id'] = int(selected_branch)
     
-    # Get log type filter from query params
+    # Get filters from query params
     log_type = request.args.get('log_type', 'all')
     branch_id = request.args.get('branch_id', 'all')
+    action = request.args.get('action', 'all')
+    start_date_str = request.args.get('start_date', '')
+    end_date_str = request.args.get('end_date', '')
+    cursor = request.args.get('cursor')
     
-    # Base query
-    query = Log.query
-    
-    # Apply filters
-    if log_type != 'all':
-        query = query.filter(Log.log_type == log_type)
-        
-    if branch_id != 'all' and branch_id:
-        query = query.filter(Log.branch_id == branch_id)
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else None
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else None
+    except ValueError:
+        start_date = end_date = None
     
-    # Sort by most recent first and limit to 15 entries
-    logs_list = query.order_by(Log.created_at.desc()).limit(15).all()
+    try:
+        per_page = int(request.args.get('per_page', LOGS_PER_PAGE))
+    except ValueError:
+        per_page = LOGS_PER_PAGE
+    
+    # İmleç tabanlı sayfalama: en yeniden eskiye, sonraki sayfa next_cursor ile
+    logs_list, next_cursor = fetch_logs_page(
+        branch_id=int(branch_id) if branch_id and branch_id != 'all' else None,
+        log_type=log_type if log_type != 'all' else None,
+        action=action if action != 'all' else None,
+        start_date=start_date,
+        end_date=end_date,
+        cursor=cursor,
+        per_page=per_page
+    )
     
     log_types = ['RESERVATION', 'TIME', 'CUSTOMER', 'SYSTEM']
+    log_actions = ['CREATE', 'UPDATE', 'DELETE', 'CANCEL', 'CLEAR', 'INIT', 'LOGIN', 'LOGOUT', 'RESET', 'ARCHIVE']
     
     return render_template(
         'logs.html',
         logs=logs_list,
         log_types=log_types,
+        log_actions=log_actions,
         selected_log_type=log_type,
         selected_branch_id=branch_id,
+        selected_action=action,
+        start_date=start_date_str,
+        end_date=end_date_str,
+        cursor=cursor,
+        next_cursor=next_cursor,
+        per_page=per_page,
         branches=branches
     )
 
@@ -1743,22 +1659,11 @@ def customers():
     # Search query
     search_query = request.args.get('search', '')
     
-    # Base query
-    query = Customer.query
-    
-    # Apply search filter if present
-    if search_query:
-        search_term = f"%{search_query}%"
-        query = query.filter(
-            or_(
-                Customer.name.ilike(search_term),
-                Customer.phone.ilike(search_term),
-                Customer.email.ilike(search_term)
-            )
-        )
+    # İndeksli arama (arama yoksa en son güncellenenler), sonuçlar eşleşmeye göre sıralı
+    customers_list = search_customers(search_query, limit=50)
     
-    # Sort by most recent first
-    customers_list = query.order_by(Customer.updated_at.desc()).limit(50).all()
+    # Müşteri istatistiklerini tüm sayfa için toplu sorgularla yükle
+    Customer.load_analytics(customers_list)
     
     return render_template(
         'customers.html',
@@ -2257,6 +2162,7 @@ def delete_customer():
                     branch_id=reservation.branch_id
                 )
                 
+                apply_daily_stats_change(before=reservation_stat_snapshot(reservation))
                 db.session.delete(reservation)
         else:
             # Just unlink customer from reservations
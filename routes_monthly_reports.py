@@ -2,53 +2,15 @@
 # -*- coding: utf-8 -*-
 
 import os
-from datetime import datetime
+from datetime import timedelta
 from flask import render_template, request, redirect, url_for, flash, session
 from app import app
 from models import Branch
+from report_catalog import fetch_archived_reports_page, REPORTS_PER_PAGE
 
 @app.route('/monthly-reports')
 def monthly_reports():
-    """Aylık raporlar sayfası - Arşivlenmiş PDF raporları listeler"""
-    # reports klasörünü kontrol et, yoksa oluştur
-    pdf_dir = os.path.join('static', 'reports')
-    if not os.path.exists(pdf_dir):
-        os.makedirs(pdf_dir)
-    
-    # PDF dosyalarını listele
-    report_files = []
-    for file in os.listdir(pdf_dir):
-        if file.endswith('.pdf'):
-            # Dosya adından bilgileri ayıkla (ŞubeAdı_YYYY_MM_AyAdı.pdf)
-            try:
-                file_parts = file.replace('.pdf', '').split('_')
-                if len(file_parts) >= 4:
-                    branch_name = file_parts[0]
-                    year = file_parts[1]
-                    month = file_parts[2]
-                    month_name = file_parts[3]
-                    
-                    # Dosya istatistiklerini al
-                    file_path = os.path.join(pdf_dir, file)
-                    file_stats = os.stat(file_path)
-                    created_date = datetime.fromtimestamp(file_stats.st_ctime)
-                    
-                    report_files.append({
-                        'branch_name': branch_name,
-                        'year': year,
-                        'month': month,
-                        'month_name': month_name,
-                        'file_name': file,
-                        'file_path': os.path.join('reports', file),
-                        'created_date': created_date.strftime('%d.%m.%Y %H:%M')
-                    })
-            except Exception as e:
-                # Dosya adı beklenen formatta değilse atla
-                continue
-    
-    # Oluşturma tarihine göre azalan sırayla sırala (en yeniler üstte)
-    report_files = sorted(report_files, key=lambda x: x['file_name'], reverse=True)
-    
+    """Aylık raporlar sayfası - Arşivlenmiş PDF raporları katalogdan listeler"""
     # Şube listesini al
     branches = Branch.query.all()
     
@@ -60,11 +22,39 @@ def monthly_reports():
         selected_branch_id = branches[0].id
         session['selected_branch_id'] = int(selected_branch_id)
     
+    # Rapor listesi şube filtresi (varsayılan: tüm şubeler)
+    filter_branch_id = request.args.get('branch_id', type=int)
+    cursor = request.args.get('cursor')
+    per_page = request.args.get('per_page', REPORTS_PER_PAGE, type=int)
+    
+    reports, next_cursor = fetch_archived_reports_page(
+        branch_id=filter_branch_id,
+        cursor=cursor,
+        per_page=per_page
+    )
+    
+    report_files = [{
+        'id': report.id,
+        'branch_id': report.branch_id,
+        'branch_name': report.branch_name,
+        'year': report.year,
+        'month': report.month,
+        'month_name': report.file_name[:-len('.pdf')].rsplit('_', 1)[-1],
+        'file_name': report.file_name,
+        'file_path': os.path.join('reports', report.file_name),
+        'file_size': report.file_size,
+        'created_date': (report.created_at + timedelta(hours=3)).strftime('%d.%m.%Y %H:%M')
+    } for report in reports]
+    
     return render_template(
         'monthly_reports.html',
         report_files=report_files,
         branches=branches,
-        selected_branch_id=selected_branch_id
+        selected_branch_id=selected_branch_id,
+        filter_branch_id=filter_branch_id,
+        cursor=cursor,
+        next_cursor=next_cursor,
+        per_page=per_page
     )
 
 
@@ -72,17 +62,22 @@ def monthly_reports():
 def generate_test_report():
     """Test amaçlı olarak bir rapor oluştur"""
     branch_id = request.args.get('branch_id', type=int)
+    force = request.args.get('force', 'false').lower() == 'true'
     
     # Yönetici yetkilendirmesi (gerçek uygulamada yetkisiz erişimi engellemek için)
     # Şu anda basitlik için atlandı
     
     try:
         from scheduler import generate_test_report
-        reports = generate_test_report(branch_id)
+        reports = generate_test_report(branch_id, force=force)
         
         if reports and len(reports) > 0:
             # Başarı mesajı ve oluşturulan rapor bağlantısı
-            flash(f'Rapor başarıyla oluşturuldu! {len(reports)} şube için rapor arşivlendi.', 'success')
+            skipped = sum(1 for report in reports if report.get('skipped'))
+            message = f'Rapor başarıyla oluşturuldu! {len(reports)} şube için rapor arşivlendi.'
+            if skipped:
+                message += f' Verisi değişmeyen {skipped} rapor yeniden oluşturulmadı.'
+            flash(message, 'success')
             return redirect(url_for('monthly_reports'))
         else:
             flash('Rapor oluşturulamadı! Hiç veri bulunamadı veya bir hata oluştu.', 'warning')
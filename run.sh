@@ -35,6 +35,17 @@ pip install -r vps_requirements.txt
 echo "Veritabanı tabloları kontrol ediliyor..."
 python -c "from app import app, db; app.app_context().push(); db.create_all()"
 
+# Telegram bot süreci (polling ve bildirim gönderimi) varsayılan olarak başlatılmaz.
+# Üretimde bot, Supervisor'daki reservation_bot programı olarak çalışır; aynı token
+# ile ikinci bir bot süreci Telegram'da 409 Conflict hatasına yol açar.
+# Yalnızca Supervisor'ın olmadığı geliştirme ortamında RUN_BOT_WORKER=true ile açın.
+if [ "${RUN_BOT_WORKER:-false}" = "true" ]; then
+    echo "Telegram bot süreci başlatılıyor (RUN_BOT_WORKER=true)..."
+    python bot_worker.py &
+else
+    echo "Telegram bot süreci başlatılmadı (ayrı olarak: python bot_worker.py veya RUN_BOT_WORKER=true)"
+fi
+
 # Uygulamayı başlat
 echo "Uygulama başlatılıyor..."
 exec gunicorn --workers 2 --bind 0.0.0.0:5000 --reload wsgi:app
\ No newline at end of file
@@ -26,7 +26,42 @@ def initialize_scheduler():
         # Basit bir scheduler oluştur
         scheduler = BackgroundScheduler()
         
-        # Test için şimdilik başlatma işlemi yeterli, cron zamanlaması ayrıca yapılacak
+        # Günlük rapor özetlerini her gece (Türkiye saatiyle) bir önceki güne kadar ilerlet
+        scheduler.add_job(
+            daily_stats_job,
+            'cron',
+            hour=0,
+            minute=15,
+            timezone='Europe/Istanbul',
+            id='daily_stats_job',
+            replace_existing=True
+        )
+        
+        # Saklama süresini aşan logları her gece arşive taşı
+        scheduler.add_job(
+            log_retention_job,
+            'cron',
+            hour=3,
+            minute=30,
+            timezone='Europe/Istanbul',
+            id='log_retention_job',
+            replace_existing=True
+        )
+        
+        # Önceki ayın şube raporlarını her ayın 1'inde PDF olarak arşivle
+        scheduler.add_job(
+            monthly_report_job,
+            'cron',
+            day=1,
+            hour=2,
+            minute=0,
+            timezone='Europe/Istanbul',
+            id='monthly_report_job',
+            replace_existing=True,
+            misfire_grace_time=6 * 60 * 60,
+            coalesce=True
+        )
+        
         logger.info("Scheduler başlatıldı")
         scheduler.start()
         return scheduler
@@ -34,31 +69,85 @@ def initialize_scheduler():
         logger.error(f"Scheduler başlatılırken hata: {str(e)}")
         return None
 
+def daily_stats_job():
+    """
+    Her gece çalışacak görev
+    - Günlük rapor özetlerini (reservation_daily_stats) dünün sonuna kadar ilerletir
+    - Rapor önbelleğinin eski geçersiz kılma olaylarını temizler
+    """
+    try:
+        from app import app
+        from report_service import roll_forward_daily_stats
+        from report_cache import prune_report_cache_events
+        
+        with app.app_context():
+            row_count = roll_forward_daily_stats()
+            pruned_events = prune_report_cache_events()
+        logger.info(f"Günlük rapor özetleri güncellendi: {row_count} satır yazıldı")
+        logger.info(f"Eski rapor önbelleği olayları silindi: {pruned_events}")
+        return True
+    except Exception as e:
+        logger.error(f"Günlük rapor özetleri güncellenirken hata: {str(e)}", exc_info=True)
+        return False
+
+def log_retention_job():
+    """
+    Her gece çalışacak görev
+    - Saklama süresini (LOG_RETENTION_DAYS) aşan logları aylık JSONL.gz dosyalarına taşır
+    """
+    try:
+        from app import app
+        from log_service import archive_old_logs
+        
+        with app.app_context():
+            result = archive_old_logs()
+            if result['archived']:
+                from models import Log
+                Log.add_log(
+                    log_type='SYSTEM',
+                    action='ARCHIVE',
+                    details=f"{result['archived']} eski log kaydı arşive taşındı: {', '.join(result['files'])}"
+                )
+        logger.info(f"Log saklama görevi tamamlandı: {result['archived']} kayıt {result['chunks']} parçada "
+                    f"arşive taşındı ({', '.join(result['files']) or 'dosya yok'})")
+        return result
+    except Exception as e:
+        logger.error(f"Log saklama görevi sırasında hata: {str(e)}", exc_info=True)
+        return None
+
 def monthly_report_job():
     """
     Her ayın başında çalışacak görev
-    - Önceki ayın raporlarını PDF olarak arşivler
+    - Önceki ayın raporlarını PDF olarak arşivler (şube PDF'leri PDF_RENDER_WORKERS süreçte paralel)
     """
     try:
+        from app import app
+        
         logger.info("Aylık rapor arşivleme işlemi başlatılıyor...")
-        reports = archive_and_reset_monthly_data()
+        started_at = datetime.now()
+        with app.app_context():
+            reports = archive_and_reset_monthly_data()
         
         for report in reports:
-            logger.info(f"Rapor arşivlendi: {report['branch_name']} - {report['month']}/{report['year']} - {report['pdf_path']}")
+            status = "değişmedi, atlandı" if report.get('skipped') else "arşivlendi"
+            logger.info(f"Rapor {status}: {report['branch_name']} - {report['month']}/{report['year']} - {report['pdf_path']}")
         
-        logger.info(f"Aylık rapor arşivleme tamamlandı. Toplam {len(reports)} rapor oluşturuldu.")
+        rendered = sum(1 for report in reports if not report.get('skipped'))
+        logger.info(f"Aylık rapor arşivleme tamamlandı. Toplam {len(reports)} rapor, {rendered} tanesi "
+                    f"{(datetime.now() - started_at).total_seconds():.1f} saniyede yeniden oluşturuldu.")
         return True
     except Exception as e:
         logger.error(f"Aylık rapor arşivleme sırasında hata: {str(e)}", exc_info=True)
         return False
 
-def generate_test_report(branch_id=None):
+def generate_test_report(branch_id=None, force=False):
     """
-    Test amaçlı olarak hemen bir rapor oluşturur
+    Test amaçlı olarak hemen bir rapor oluşturur (verisi değişmeyen raporlar force=True değilse atlanır)
     """
     try:
-        reports = archive_and_reset_monthly_data(branch_id)
-        logger.info(f"Test raporu oluşturuldu: {len(reports)} rapor")
+        reports = archive_and_reset_monthly_data(branch_id, force=force)
+        rendered = sum(1 for report in reports if not report.get('skipped'))
+        logger.info(f"Test raporu oluşturuldu: {len(reports)} rapor, {rendered} yeniden oluşturuldu")
         return reports
     except Exception as e:
         logger.error(f"Test raporu oluşturma sırasında hata: {str(e)}", exc_info=True)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import fcntl
+import socket
+import atexit
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import text
+from app import app, db
+
+logger = logging.getLogger('scheduler')
+
+# Lider olmayan süreçlerin kilidi tekrar deneme / liderin bağlantısını kontrol etme aralığı (saniye)
+SCHEDULER_LEADER_CHECK_INTERVAL = float(os.environ.get('SCHEDULER_LEADER_CHECK_INTERVAL', 15))
+# SQLite kurulumunda kullanılan kilit dosyası
+SCHEDULER_LOCK_FILE = os.environ.get(
+    'SCHEDULER_LOCK_FILE',
+    os.path.join(os.path.abspath(os.path.dirname(__file__)), 'instance', 'scheduler.lock')
+)
+# PostgreSQL advisory lock anahtarı (uygulamaya özgü sabit bir sayı)
+SCHEDULER_ADVISORY_LOCK_KEY = 727301
+# Lider bağlantısının pg_stat_activity'de görünen adı
+SCHEDULER_APPLICATION_NAME = 'rezervasyon-scheduler'
+
+
+class PostgresLeaderLock:
+    """
+    PostgreSQL session seviyesinde advisory lock
+
+    Kilit havuz dışı, ayrılmış bir bağlantıda tutulur. Lider süreç ölürse veya
+    bağlantısı koparsa PostgreSQL kilidi kendiliğinden bırakır.
+    """
+
+    def __init__(self, key=SCHEDULER_ADVISORY_LOCK_KEY):
+        self.key = key
+        self._connection = None
+
+    def try_acquire(self):
+        connection = db.engine.raw_connection()
+        try:
+            # Bağlantı havuzdan ayrılır, kilit süresince açık kalır
+            connection.detach()
+            driver_connection = connection.driver_connection
+            driver_connection.autocommit = True
+            with driver_connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", (self.key,))
+                acquired = cursor.fetchone()[0]
+                if acquired:
+                    cursor.execute(
+                        "SELECT set_config('application_name', %s, false)",
+                        (f"{SCHEDULER_APPLICATION_NAME}:{socket.gethostname()}:{os.getpid()}",)
+                    )
+        except Exception:
+            connection.close()
+            raise
+
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        return True
+
+    def is_held(self):
+        if self._connection is None:
+            return False
+        try:
+            with self._connection.driver_connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except Exception as e:
+            logger.error(f"Zamanlayıcı kilit bağlantısı koptu: {e}")
+            self.release()
+            return False
+
+    def release(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def current_leader(self):
+        """Kilidi tutan bağlantının bilgileri (host, pid), lider yoksa None"""
+        row = db.session.execute(text("""
+            SELECT a.application_name, a.backend_start
+            FROM pg_locks l JOIN pg_stat_activity a ON a.pid = l.pid
+            WHERE l.locktype = 'advisory' AND l.granted
+              AND l.classid = 0 AND l.objid = :key AND l.objsubid = 1
+        """), {'key': self.key}).first()
+        if row is None:
+            return None
+        info = {'since': row.backend_start.isoformat() if row.backend_start else None}
+        parts = (row.application_name or '').split(':')
+        if len(parts) == 3 and parts[0] == SCHEDULER_APPLICATION_NAME:
+            info['host'] = parts[1]
+            info['pid'] = int(parts[2]) if parts[2].isdigit() else parts[2]
+        return info
+
+
+class FileLeaderLock:
+    """
+    SQLite kurulumu için flock tabanlı kilit
+
+    Kilit dosyasına liderin host ve PID bilgisi yazılır. Süreç ölünce işletim
+    sistemi kilidi bırakır.
+    """
+
+    def __init__(self, path=SCHEDULER_LOCK_FILE):
+        self.path = path
+        self._file = None
+
+    def try_acquire(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{socket.gethostname()}:{os.getpid()}:{datetime.utcnow().isoformat()}\n")
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    def is_held(self):
+        return self._file is not None
+
+    def release(self):
+        lock_file, self._file = self._file, None
+        if lock_file is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
+            except Exception:
+                pass
+
+    def current_leader(self):
+        """Kilit dosyasındaki lider bilgileri (host, pid), lider yoksa None"""
+        try:
+            with open(self.path) as lock_file:
+                # Kilit alınabiliyorsa dosyadaki bilgi eski bir lidere aittir
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    return None
+                except OSError:
+                    pass
+                content = lock_file.read().strip()
+        except FileNotFoundError:
+            return None
+
+        parts = content.split(':', 2)
+        if len(parts) != 3:
+            return None
+        return {
+            'host': parts[0],
+            'pid': int(parts[1]) if parts[1].isdigit() else parts[1],
+            'since': parts[2],
+        }
+
+
+class SchedulerLeader:
+    """
+    gunicorn worker'ları ve bot süreci arasında tek zamanlayıcı lideri seçer
+
+    Her süreç kilidi almayı dener; alan süreç BackgroundScheduler'ı başlatır,
+    diğerleri SCHEDULER_LEADER_CHECK_INTERVAL saniyede bir tekrar dener. Lider
+    süreç kapanırsa veya kilit bağlantısını kaybederse başka bir süreç kilidi
+    alarak görevleri devralır. PostgreSQL'de advisory lock, SQLite'ta dosya
+    kilidi kullanılır.
+    """
+
+    def __init__(self, check_interval=SCHEDULER_LEADER_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = None
+        self._scheduler = None
+        self._thread = None
+        self._pid = None
+        self._stop_event = threading.Event()
+        self.elected_at = None
+
+    @property
+    def is_leader(self):
+        return self._scheduler is not None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._stop_event.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='scheduler-leader', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=10)
+        self._thread = None
+        self._step_down()
+
+    def status(self):
+        """Bu sürecin durumu ve şu anki liderin bilgileri"""
+        current_leader = None
+        try:
+            current_leader = self._get_lock().current_leader()
+        except Exception as e:
+            logger.error(f"Zamanlayıcı lideri okunamadı: {e}")
+        return {
+            'pid': os.getpid(),
+            'is_leader': self.is_leader,
+            'elected_at': self.elected_at.isoformat() if self.elected_at else None,
+            'leader': current_leader,
+        }
+
+    def _get_lock(self):
+        if self._lock is None:
+            if db.engine.dialect.name == 'postgresql':
+                self._lock = PostgresLeaderLock()
+            else:
+                self._lock = FileLeaderLock()
+        return self._lock
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                with app.app_context():
+                    self._check()
+            except Exception as e:
+                logger.error(f"Zamanlayıcı lider seçimi sırasında hata: {e}", exc_info=True)
+            self._stop_event.wait(self.check_interval)
+
+    def _check(self):
+        lock = self._get_lock()
+        if self.is_leader:
+            if not lock.is_held():
+                logger.warning(f"Zamanlayıcı kilidi kaybedildi (PID {os.getpid()}), görevler durduruluyor")
+                self._step_down()
+            return
+
+        if not lock.try_acquire():
+            return
+
+        try:
+            from scheduler import initialize_scheduler
+            scheduler = initialize_scheduler()
+        except Exception:
+            lock.release()
+            raise
+        if scheduler is None:
+            lock.release()
+            return
+        self._scheduler = scheduler
+        self.elected_at = datetime.utcnow()
+        logger.info(f"Zamanlayıcı lideri seçildi: PID {os.getpid()}")
+
+    def _step_down(self):
+        scheduler, self._scheduler = self._scheduler, None
+        if scheduler is not None:
+            try:
+                scheduler.shutdown(wait=False)
+            except Exception as e:
+                logger.error(f"Zamanlayıcı durdurulurken hata: {e}")
+        if self._lock is not None:
+            self._lock.release()
+        self.elected_at = None
+
+
+# Uygulama genelinde kullanılan zamanlayıcı lider seçimi
+scheduler_leader = SchedulerLeader()
+atexit.register(scheduler_leader.stop)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import logging
+import threading
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import Setting, CacheVersion
+
+logger = logging.getLogger(__name__)
+
+# Ayarların en fazla ne kadar süre önbellekte tutulacağı (saniye)
+SETTINGS_CACHE_TTL = int(os.environ.get('SETTINGS_CACHE_TTL', 300))
+# Diğer worker'lardaki değişiklikler için sürüm sayacının kontrol aralığı (saniye)
+SETTINGS_VERSION_CHECK_INTERVAL = float(os.environ.get('SETTINGS_VERSION_CHECK_INTERVAL', 5))
+# cache_versions tablosundaki sayaç adı
+SETTINGS_VERSION_NAME = 'settings'
+
+
+def get_cache_version(name):
+    """Sayaç değerini döndürür (hiç artırılmadıysa 0)"""
+    return db.session.query(CacheVersion.version).filter_by(name=name).scalar() or 0
+
+
+def bump_cache_version(name):
+    """
+    Sayacı mevcut transaction içinde bir artırır
+
+    Commit edildiğinde diğer worker'lar bir sonraki kontrolde önbelleklerini yeniler.
+    """
+    updated = CacheVersion.query.filter_by(name=name).update(
+        {CacheVersion.version: CacheVersion.version + 1}, synchronize_session=False
+    )
+    if updated:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(CacheVersion(name=name, version=1))
+    except IntegrityError:
+        # Başka bir worker sayacı aynı anda oluşturdu
+        CacheVersion.query.filter_by(name=name).update(
+            {CacheVersion.version: CacheVersion.version + 1}, synchronize_session=False
+        )
+
+
+class SettingsCache:
+    """
+    settings tablosu için işlem içi (in-process) önbellek
+
+    Tüm ayarlar tek sorguyla yüklenir ve SETTINGS_CACHE_TTL saniye boyunca
+    bellekten okunur. Setting.set ayarlar sürüm sayacını artırır; diğer gunicorn
+    worker'ları sayacı en fazla SETTINGS_VERSION_CHECK_INTERVAL saniyede bir
+    tek satırlık bir sorguyla kontrol eder ve değiştiyse ayarları yeniden yükler.
+    """
+
+    def __init__(self, ttl=SETTINGS_CACHE_TTL, check_interval=SETTINGS_VERSION_CHECK_INTERVAL):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._values = None
+        self._version = None
+        self._loaded_at = 0
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.version_checks = 0
+
+    def get(self, key, default=None):
+        """Ayar değerini döndürür"""
+        values = self._current_values()
+        if key in values:
+            return values[key]
+        return default
+
+    def invalidate(self):
+        """Bu worker'daki önbelleği temizler, bir sonraki okumada ayarlar yeniden yüklenir"""
+        with self._lock:
+            self._values = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded': self._values is not None,
+                'version': self._version,
+                'hits': self.hits,
+                'loads': self.loads,
+                'version_checks': self.version_checks,
+            }
+
+    def _current_values(self):
+        now = time.monotonic()
+        with self._lock:
+            values = self._values
+            version = self._version
+            fresh = values is not None and now - self._loaded_at < self.ttl
+            checked = now - self._checked_at < self.check_interval
+
+        if fresh and checked:
+            with self._lock:
+                self.hits += 1
+            return values
+
+        if fresh:
+            # Süre dolmadı ama diğer worker'larda değişiklik olmuş olabilir
+            current_version = get_cache_version(SETTINGS_VERSION_NAME)
+            with self._lock:
+                self.version_checks += 1
+                if current_version == version:
+                    self._checked_at = now
+                    self.hits += 1
+                    return values
+
+        # Sürüm ayarlardan önce okunur; arada yapılan bir değişiklik bir sonraki kontrolde yakalanır
+        current_version = get_cache_version(SETTINGS_VERSION_NAME)
+        values = dict(db.session.query(Setting.key, Setting.value).all())
+
+        with self._lock:
+            self._values = values
+            self._version = current_version
+            self._loaded_at = now
+            self._checked_at = now
+            self.loads += 1
+        return values
+
+
+# Uygulama genelinde kullanılan ayar önbelleği
+settings_cache = SettingsCache()
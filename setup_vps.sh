@@ -98,6 +98,19 @@ stopasgroup=true
 killasgroup=true
 stderr_logfile=/var/www/rezervasyon/logs/supervisor.err.log
 stdout_logfile=/var/www/rezervasyon/logs/supervisor.out.log
+
+# Telegram bot süreci (polling ve bildirim gönderimi web worker'larından ayrı çalışır)
+# Bot yalnızca supervisor ile başlatılır; ikinci bir bot süreci Telegram'da 409 Conflict hatasına yol açar
+[program:reservation_bot]
+command=/var/www/rezervasyon/venv/bin/python bot_worker.py
+directory=/var/www/rezervasyon
+user=$USERNAME
+autostart=true
+autorestart=true
+stopasgroup=true
+killasgroup=true
+stderr_logfile=/var/www/rezervasyon/logs/bot_worker.err.log
+stdout_logfile=/var/www/rezervasyon/logs/bot_worker.out.log
 EOF
 
 # Nginx yapılandırması
@@ -137,6 +150,7 @@ systemctl enable rezervasyon
 supervisorctl reread
 supervisorctl update
 supervisorctl start rezervasyon
+supervisorctl start reservation_bot
 
 # SSL sertifikası kurulumu (isteğe bağlı)
 echo -e "\n${YELLOW}SSL sertifikası kurmak ister misiniz? (evet/hayır)${NC}"
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import atexit
+import asyncio
+import logging
+import threading
+from flask import has_app_context
+from telegram_service import Bot, ParseMode, HAS_TELEGRAM, TELEGRAM_MESSAGE_LIMIT, get_bot_token
+
+if HAS_TELEGRAM:
+    from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+# Aynı anda gönderilebilecek en fazla mesaj (HTTP bağlantı havuzu boyutu)
+TELEGRAM_SEND_CONCURRENCY = int(os.environ.get('TELEGRAM_SEND_CONCURRENCY', 8))
+# Tek bir mesaj için beklenecek en uzun süre (saniye)
+TELEGRAM_SEND_TIMEOUT = float(os.environ.get('TELEGRAM_SEND_TIMEOUT', 30))
+# Sohbet başına gönderim hızı (Telegram gruplar için dakikada ~20 mesaja izin verir)
+TELEGRAM_CHAT_RATE_PER_MINUTE = float(os.environ.get('TELEGRAM_CHAT_RATE_PER_MINUTE', 20))
+# Sohbet başına art arda beklemeden gönderilebilecek mesaj sayısı
+TELEGRAM_CHAT_BURST = int(os.environ.get('TELEGRAM_CHAT_BURST', 3))
+# Bot genelinde saniyede en fazla mesaj (Telegram sınırı ~30)
+TELEGRAM_GLOBAL_RATE_PER_SECOND = float(os.environ.get('TELEGRAM_GLOBAL_RATE_PER_SECOND', 25))
+
+
+class TokenBucket:
+    """
+    Basit token bucket hız sınırlayıcı
+
+    reserve() bir sonraki mesaj için sıra ayırır ve beklenmesi gereken süreyi
+    döndürür. Token'lar eksiye düşebilir; böylece aynı sohbete art arda gelen
+    mesajlar sırayla ve eşit aralıklarla gönderilir.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def reserve(self, now=None):
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def is_idle(self, now):
+        return self.tokens + (now - self.updated_at) * self.rate >= self.capacity
+
+
+class TelegramThrottled(Exception):
+    """
+    Mesaj yerel hız sınırı nedeniyle gönderilmedi (Telegram'a hiç iletilmedi)
+
+    retry_after: Sohbete bir sonraki gönderimin yapılabileceği en erken süre (saniye)
+    """
+
+    def __init__(self, chat_id, retry_after):
+        super().__init__(f"Telegram chat {chat_id} için gönderim sırası dolu, {retry_after:.0f} saniye sonra denenecek")
+        self.chat_id = chat_id
+        self.retry_after = retry_after
+
+
+def _retry_after_seconds(error):
+    """Telegram RetryAfter (429) hatasındaki bekleme süresini döndürür, yoksa None"""
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is None:
+        return None
+    if hasattr(retry_after, 'total_seconds'):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class TelegramSender:
+    """
+    Telegram mesajları için kalıcı gönderici
+
+    Tek bir arka plan thread'inde sürekli çalışan bir asyncio event loop'u ve
+    tek bir Bot örneği (keep-alive HTTP bağlantı havuzu ile) kullanır. Her
+    mesaj için yeni event loop ve yeni TLS bağlantısı açılmaz. submit() herhangi
+    bir thread'den çağrılabilir ve concurrent.futures.Future döndürür.
+
+    Gönderimler sohbet başına ve bot genelinde token bucket ile sınırlanır.
+    Telegram 429 (RetryAfter) döndürürse o sohbete bildirilen süre dolana kadar
+    mesaj gönderilmez; kalan süre blocked_for() ile okunabilir. Sırası max_wait
+    içinde gelmeyecek mesajlar gönderilmeden TelegramThrottled ile reddedilir.
+    """
+
+    def __init__(self, concurrency=TELEGRAM_SEND_CONCURRENCY, chat_rate_per_minute=TELEGRAM_CHAT_RATE_PER_MINUTE,
+                 chat_burst=TELEGRAM_CHAT_BURST, global_rate_per_second=TELEGRAM_GLOBAL_RATE_PER_SECOND):
+        self.concurrency = concurrency
+        self.chat_rate = chat_rate_per_minute / 60.0
+        self.chat_burst = chat_burst
+        self.global_rate = global_rate_per_second
+        # Hız sınırı için en fazla bekleme; gönderim zaman aşımından kısa tutulur
+        self.max_wait = TELEGRAM_SEND_TIMEOUT / 2
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._bot = None
+        self._bot_token = None
+        self._semaphore = None
+        self._bot_lock = None
+        self._global_bucket = None
+        self._chat_buckets = {}
+        self._blocked_until = {}
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.throttled = 0
+        self.throttle_wait = 0.0
+
+    def submit(self, chat_id, text, parse_mode=ParseMode.HTML):
+        """
+        Mesajı gönderim kuyruğuna ekler
+
+        Returns:
+            concurrent.futures.Future: Gönderim başarılıysa True, değilse False döner;
+            mesaj yerel hız sınırı nedeniyle gönderilmediyse TelegramThrottled yükseltir
+        """
+        token = self._resolve_token()
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._send(token, chat_id, text, parse_mode), loop)
+
+    def send(self, chat_id, text, parse_mode=ParseMode.HTML, timeout=TELEGRAM_SEND_TIMEOUT):
+        """Mesajı gönderir ve sonucunu bekler"""
+        try:
+            return self.submit(chat_id, text, parse_mode).result(timeout=timeout)
+        except Exception as e:
+            logger.error(f"Telegram mesajı gönderilemedi ({chat_id}): {e}")
+            return False
+
+    def stop(self):
+        """Bot'un HTTP bağlantılarını kapatır ve event loop'u durdurur"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or self._pid != os.getpid():
+                return
+            self._loop = None
+            self._thread = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_bot(), loop).result(timeout=10)
+        except Exception as e:
+            logger.error(f"Telegram bot bağlantıları kapatılırken hata: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=10)
+
+    def blocked_for(self, chat_id):
+        """Telegram'ın bu sohbet için istediği kalan bekleme süresi (saniye, yoksa 0)"""
+        blocked_until = self._blocked_until.get(self._normalize_chat_id(chat_id))
+        if not blocked_until:
+            return 0.0
+        return max(0.0, blocked_until - time.monotonic())
+
+    def stats(self):
+        return {
+            'running': self._loop is not None,
+            'sent': self.sent,
+            'failed': self.failed,
+            'rate_limited': self.rate_limited,
+            'throttled': self.throttled,
+            'throttle_wait': round(self.throttle_wait, 2),
+            'chats': len(self._chat_buckets),
+        }
+
+    def _resolve_token(self):
+        # Token veritabanından okunabileceği için çağıran thread'de, uygulama bağlamında çözülür
+        if has_app_context():
+            return get_bot_token()
+        from app import app
+        with app.app_context():
+            return get_bot_token()
+
+    def _ensure_loop(self):
+        with self._lock:
+            # gunicorn fork sonrası her worker kendi loop'unu ve bağlantılarını açar
+            if self._loop is not None and self._pid == os.getpid():
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+                self._bot_lock = asyncio.Lock()
+                loop.call_soon(ready.set)
+                loop.run_forever()
+                loop.close()
+
+            self._bot = None
+            self._bot_token = None
+            self._global_bucket = TokenBucket(self.global_rate, max(1, int(self.global_rate)))
+            self._chat_buckets = {}
+            self._blocked_until = {}
+            self._loop = loop
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=run, name='telegram-sender', daemon=True)
+            self._thread.start()
+            ready.wait()
+            return loop
+
+    async def _get_bot(self, token):
+        # Token veritabanından değiştirildiyse bot yeni token ile yeniden oluşturulur
+        if not token:
+            return None
+
+        async with self._bot_lock:
+            if self._bot is not None and self._bot_token == token:
+                return self._bot
+
+            await self._close_bot()
+            if HAS_TELEGRAM:
+                request = HTTPXRequest(connection_pool_size=self.concurrency)
+                bot = Bot(token=token, request=request)
+                await bot.initialize()
+            else:
+                bot = Bot(token=token)
+            self._bot = bot
+            self._bot_token = token
+            return bot
+
+    async def _close_bot(self):
+        bot, self._bot, self._bot_token = self._bot, None, None
+        if bot is not None and HAS_TELEGRAM:
+            await bot.shutdown()
+
+    @staticmethod
+    def _normalize_chat_id(chat_id):
+        # Sayısal chat ID'leri int'e çevir
+        if isinstance(chat_id, str) and chat_id.lstrip('-').isdigit():
+            return int(chat_id)
+        return chat_id
+
+    def _reserve_slot(self, chat_id):
+        """
+        Sohbet ve bot geneli için gönderim sırası ayırır
+
+        Event loop tek thread'de çalıştığından bu hesaplama atomiktir.
+
+        Returns:
+            float: Gönderimden önce beklenecek süre (saniye)
+
+        Raises:
+            TelegramThrottled: Bekleme max_wait'i aşıyorsa (ayrılan sıra geri verilir)
+        """
+        now = time.monotonic()
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        blocked_until = self._blocked_until.get(chat_id)
+        if blocked_until and blocked_until <= now:
+            del self._blocked_until[chat_id]
+            blocked_until = None
+
+        delay = max(bucket.reserve(now), self._global_bucket.reserve(now))
+        if blocked_until:
+            delay = max(delay, blocked_until - now)
+
+        if delay > self.max_wait:
+            # Çağıranın zaman aşımından önce gönderilemeyecek; ayrılan sırayı geri ver
+            bucket.tokens += 1
+            self._global_bucket.tokens += 1
+            raise TelegramThrottled(chat_id, delay)
+
+        # Uzun süredir boşta olan sohbetlerin sayaçlarını bırak
+        if len(self._chat_buckets) > 1000:
+            for idle_chat_id in [c for c, b in self._chat_buckets.items() if b.is_idle(now)]:
+                del self._chat_buckets[idle_chat_id]
+        return delay
+
+    async def _send(self, token, chat_id, text, parse_mode):
+        chat_id = self._normalize_chat_id(chat_id)
+
+        try:
+            delay = self._reserve_slot(chat_id)
+        except TelegramThrottled as e:
+            self.throttled += 1
+            logger.warning(str(e))
+            raise
+        if delay > 0:
+            self.throttle_wait += delay
+            await asyncio.sleep(delay)
+
+        async with self._semaphore:
+            try:
+                bot = await self._get_bot(token)
+                if bot is None:
+                    logger.error("Telegram Bot Token is not set")
+                    self.failed += 1
+                    return False
+
+                result = bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                if asyncio.iscoroutine(result):
+                    await result
+                self.sent += 1
+                logger.info(f"Message successfully sent to chat {chat_id}")
+                return True
+            except Exception as e:
+                self.failed += 1
+                retry_after = _retry_after_seconds(e)
+                if retry_after is not None:
+                    # Telegram'ın istediği süre boyunca bu sohbete gönderim yapma
+                    self.rate_limited += 1
+                    self._blocked_until[chat_id] = time.monotonic() + retry_after
+                    logger.warning(f"Telegram chat {chat_id} için hız sınırı: {retry_after:.0f} saniye beklenecek")
+                    return False
+                logger.error(f"Error sending message to Telegram chat {chat_id}: {e}")
+                return False
+
+
+# Uygulama genelinde kullanılan Telegram göndericisi
+telegram_sender = TelegramSender()
+atexit.register(telegram_sender.stop)
@@ -1,7 +1,8 @@
 import os
+import html
 import logging
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 # Telegram modüllerini düzgün bir şekilde import ediyoruz
 try:
     # python-telegram-bot 20.x için
@@ -78,6 +79,12 @@ bot_updater = None
 bot_lock = threading.Lock()
 update_id_offset = 0  # Son işlenen Update ID'sini takip etmek için
 
+# /rez komutunda sayfa başına varsayılan ve en fazla rezervasyon sayısı
+REZ_DEFAULT_LIMIT = int(os.environ.get('REZ_DEFAULT_LIMIT', 30))
+REZ_MAX_LIMIT = 100
+# Telegram mesaj uzunluğu sınırı (karakter)
+TELEGRAM_MESSAGE_LIMIT = 4096
+
 def bot_is_running():
     """
     Check if the bot is currently running
@@ -128,98 +135,69 @@ def send_message(chat_id, message):
         chat_id (str): The chat ID to send the message to
         message (str): The message text to send
     """
-    try:
-        # Directly send message in the current thread (which is already a background thread)
-        # This is simpler and avoids nested threading issues
-        token = get_bot_token()
-        if not token:
-            logger.error("Telegram Bot Token is not set")
-            return False
-        
-        # Log details for debugging
-        logger.info(f"Attempting to send message using token: {token[:5]}...{token[-4:]} to chat_id: {chat_id}")
-        
-        # Convert chat_id to int if it's a string containing numbers
-        if isinstance(chat_id, str) and chat_id.lstrip('-').isdigit():
-            chat_id = int(chat_id)
-            logger.info(f"Converting chat_id to integer: {chat_id}")
-        
-        # Create bot and send message
-        import asyncio
-        
-        async def send_async_message():
-            bot = Bot(token=token)
-            await bot.send_message(chat_id=chat_id, text=message, parse_mode=ParseMode.HTML)
-            logger.info(f"Message successfully sent to chat {chat_id}")
-            return True
-            
-        # python-telegram-bot 20.x sürümünde async kullanımı gerekli
-        return asyncio.run(send_async_message())
-            
-    except Exception as e:
-        logger.error(f"Error sending message to Telegram: {e}")
-        # Print detailed error for debugging
-        import traceback
-        logger.error(f"Detailed error: {traceback.format_exc()}")
-        return False
+    # Kalıcı event loop ve HTTP bağlantı havuzu üzerinden gönder (bkz. telegram_sender.py)
+    from telegram_sender import telegram_sender
+    return telegram_sender.send(chat_id, message)
 
-def send_reservation_notification(reservation, branch, staff):
+def send_message_async(chat_id, message):
     """
-    Send reservation notification to the branch's Telegram channel
+    Send a message without waiting for the result
+    
+    Returns:
+        concurrent.futures.Future: Resolves to True on success, False otherwise
+        (raises telegram_sender.TelegramThrottled if the local rate limit refused it)
+    """
+    from telegram_sender import telegram_sender
+    return telegram_sender.submit(chat_id, message)
+
+def build_reservation_message(reservation, branch, staff):
+    """
+    Build the new-reservation notification text for a branch's Telegram channel
     
     Args:
         reservation: The reservation object
         branch: The branch object
         staff: The staff object
     """
-    # Add a debug log to track number of calls
-    logger.info(f"send_reservation_notification called for reservation ID: {reservation.id}")
+    # Calculate advance payment
+    advance_payment = 0
+    try:
+        # If advance_payment_amount is a method
+        if callable(getattr(reservation, 'advance_payment_amount', None)):
+            advance_payment = reservation.advance_payment_amount()
+        # If it's a direct attribute
+        elif hasattr(reservation, 'advance_payment_amount'):
+            advance_payment = reservation.advance_payment_amount
+        # Otherwise calculate manually
+        else:
+            advance_payment = (reservation.advance_payment_percentage / 100) * reservation.total_price
+    except Exception as e:
+        logger.error(f"Error calculating advance payment: {e}")
+        advance_payment = 0
+        
+    # Calculate remaining amount
+    remaining_amount = reservation.total_price - advance_payment
     
-    if not branch.telegram_enabled or not branch.telegram_chat_id:
-        logger.info(f"Telegram notifications disabled for branch {branch.name}")
-        return
+    # Format reservation date/time
+    formatted_date = reservation.reservation_date.strftime('%d.%m.%Y')
+    formatted_time = reservation.reservation_time.strftime('%H:%M')
     
-    try:    
-        # Calculate advance payment
-        advance_payment = 0
-        try:
-            # If advance_payment_amount is a method
-            if callable(getattr(reservation, 'advance_payment_amount', None)):
-                advance_payment = reservation.advance_payment_amount()
-            # If it's a direct attribute
-            elif hasattr(reservation, 'advance_payment_amount'):
-                advance_payment = reservation.advance_payment_amount
-            # Otherwise calculate manually
-            else:
-                advance_payment = (reservation.advance_payment_percentage / 100) * reservation.total_price
-        except Exception as e:
-            logger.error(f"Error calculating advance payment: {e}")
-            advance_payment = 0
-            
-        # Calculate remaining amount
-        remaining_amount = reservation.total_price - advance_payment
-        
-        # Format reservation date/time
-        formatted_date = reservation.reservation_date.strftime('%d.%m.%Y')
-        formatted_time = reservation.reservation_time.strftime('%H:%M')
-        
-        # Ödeme tipini Türkçeleştir
-        payment_type_tr = {
-            "CASH": "🧾 Nakit",
-            "POS": "💳 Kredi Kartı",
-            "IBAN": "🏦 Havale/EFT",
-            "OTHER": "📝 Diğer"
-        }.get(reservation.payment_type, reservation.payment_type)
-        
-        # Ödeme durumunu emojilerle belirt
-        payment_status = {
-            "PENDING": "⏳ Ödeme Bekliyor",
-            "ADVANCE": "💰 Ön Ödeme Yapıldı",
-            "PAID": "✅ Tamamen Ödendi"
-        }.get(reservation.payment_status, reservation.payment_status)
-        
-        # Create message
-        message = f"""
+    # Ödeme tipini Türkçeleştir
+    payment_type_tr = {
+        "CASH": "🧾 Nakit",
+        "POS": "💳 Kredi Kartı",
+        "IBAN": "🏦 Havale/EFT",
+        "OTHER": "📝 Diğer"
+    }.get(reservation.payment_type, reservation.payment_type)
+    
+    # Ödeme durumunu emojilerle belirt
+    payment_status = {
+        "PENDING": "⏳ Ödeme Bekliyor",
+        "ADVANCE": "💰 Ön Ödeme Yapıldı",
+        "PAID": "✅ Tamamen Ödendi"
+    }.get(reservation.payment_status, reservation.payment_status)
+    
+    return f"""
 <b>🎉 YENİ REZERVASYON OLUŞTURULDU 🎉</b>
 ━━━━━━━━━━━━━━━━━━━━━━━
 
@@ -228,7 +206,7 @@ def send_reservation_notification(reservation, branch, staff):
 📞 <b>Telefon:</b> {reservation.customer_phone}
 👥 <b>Kişi Sayısı:</b> {reservation.num_people}
 🗓️ <b>Tarih/Saat:</b> {formatted_date} | ⏰ {formatted_time}
-👨‍💼 <b>Personel:</b> {staff.name}
+👨‍💼 <b>Personel:</b> {staff.name if staff else 'Belirtilmemiş'}
 
 💵 <b>Toplam Ücret:</b> ₺{reservation.total_price:.2f}
 💸 <b>Ön Ödeme:</b> ₺{advance_payment:.2f} (%{reservation.advance_payment_percentage})
@@ -240,6 +218,25 @@ def send_reservation_notification(reservation, branch, staff):
 ━━━━━━━━━━━━━━━━━━━━━━━
 <i>Bu mesaj otomatik olarak gönderilmiştir.</i>
 """
+
+def send_reservation_notification(reservation, branch, staff):
+    """
+    Send reservation notification to the branch's Telegram channel
+    
+    Args:
+        reservation: The reservation object
+        branch: The branch object
+        staff: The staff object
+    """
+    # Add a debug log to track number of calls
+    logger.info(f"send_reservation_notification called for reservation ID: {reservation.id}")
+    
+    if not branch.telegram_enabled or not branch.telegram_chat_id:
+        logger.info(f"Telegram notifications disabled for branch {branch.name}")
+        return
+    
+    try:    
+        message = build_reservation_message(reservation, branch, staff)
         
         # Send message
         logger.info(f"Attempting to send notification for reservation ID: {reservation.id}")
@@ -250,9 +247,9 @@ def send_reservation_notification(reservation, branch, staff):
         import traceback
         logger.error(f"Detailed error: {traceback.format_exc()}")
 
-def send_cancellation_notification(reservation, branch, staff, with_refund=False, operator_name=None):
+def build_cancellation_message(reservation, branch, staff, with_refund=False, operator_name=None):
     """
-    Send reservation cancellation notification to the branch's Telegram channel
+    Build the cancellation notification text for a branch's Telegram channel
     
     Args:
         reservation: The reservation object
@@ -261,54 +258,46 @@ def send_cancellation_notification(reservation, branch, staff, with_refund=False
         with_refund: Whether this is a full refund cancellation
         operator_name: Name of person who cancelled (optional)
     """
-    # Add a debug log to track number of calls
-    logger.info(f"send_cancellation_notification called for reservation ID: {reservation.id}")
+    # Format reservation date/time
+    formatted_date = reservation.reservation_date.strftime('%d.%m.%Y')
+    formatted_time = reservation.reservation_time.strftime('%H:%M')
     
-    if not branch.telegram_enabled or not branch.telegram_chat_id:
-        logger.info(f"Telegram notifications disabled for branch {branch.name}")
-        return False
-    
-    try:    
-        # Format reservation date/time
-        formatted_date = reservation.reservation_date.strftime('%d.%m.%Y')
-        formatted_time = reservation.reservation_time.strftime('%H:%M')
-        
-        # Calculate advance payment
-        advance_payment = 0
-        try:
-            # If advance_payment_amount is a method
-            if callable(getattr(reservation, 'advance_payment_amount', None)):
-                advance_payment = reservation.advance_payment_amount()
-            # If it's a direct attribute
-            elif hasattr(reservation, 'advance_payment_amount'):
-                advance_payment = reservation.advance_payment_amount
-            # Otherwise calculate manually
-            else:
-                advance_payment = (reservation.advance_payment_percentage / 100) * reservation.total_price
-        except Exception as e:
-            logger.error(f"Error calculating advance payment: {e}")
-            advance_payment = 0
-        
-        # İptal tipine göre ikonu belirleme
-        if with_refund:
-            cancel_title = "💰 REZERVASYON TAM İADE İLE İPTAL EDİLDİ"
-            cancel_emoji = "🔙"  # Geri ödeme olduğunu belirten emoji
-        else:
-            cancel_title = "❌ REZERVASYON İPTAL EDİLDİ"
-            cancel_emoji = "💸"  # Para kalıyor emojisi
-        
-        # Ödeme bilgisi
-        refund_info = ""
-        if with_refund:
-            refund_info = f"\n💱 <b>İade Edilen Tutar:</b> ₺{advance_payment:.2f} (Tam İade)"
+    # Calculate advance payment
+    advance_payment = 0
+    try:
+        # If advance_payment_amount is a method
+        if callable(getattr(reservation, 'advance_payment_amount', None)):
+            advance_payment = reservation.advance_payment_amount()
+        # If it's a direct attribute
+        elif hasattr(reservation, 'advance_payment_amount'):
+            advance_payment = reservation.advance_payment_amount
+        # Otherwise calculate manually
         else:
-            refund_info = f"\n💸 <b>Kesinti Yapılan Tutar:</b> ₺{advance_payment:.2f} (%{reservation.advance_payment_percentage})" if advance_payment > 0 else ""
-        
-        # İptal eden bilgisi
-        operator_info = f"\n👨‍💼 <b>İptal Eden:</b> {operator_name}" if operator_name else ""
-        
-        # Mesaj oluşturma
-        message = f"""
+            advance_payment = (reservation.advance_payment_percentage / 100) * reservation.total_price
+    except Exception as e:
+        logger.error(f"Error calculating advance payment: {e}")
+        advance_payment = 0
+    
+    # İptal tipine göre ikonu belirleme
+    if with_refund:
+        cancel_title = "💰 REZERVASYON TAM İADE İLE İPTAL EDİLDİ"
+        cancel_emoji = "🔙"  # Geri ödeme olduğunu belirten emoji
+    else:
+        cancel_title = "❌ REZERVASYON İPTAL EDİLDİ"
+        cancel_emoji = "💸"  # Para kalıyor emojisi
+    
+    # Ödeme bilgisi
+    refund_info = ""
+    if with_refund:
+        refund_info = f"\n💱 <b>İade Edilen Tutar:</b> ₺{advance_payment:.2f} (Tam İade)"
+    else:
+        refund_info = f"\n💸 <b>Kesinti Yapılan Tutar:</b> ₺{advance_payment:.2f} (%{reservation.advance_payment_percentage})" if advance_payment > 0 else ""
+    
+    # İptal eden bilgisi
+    operator_info = f"\n👨‍💼 <b>İptal Eden:</b> {operator_name}" if operator_name else ""
+    
+    # Mesaj oluşturma
+    return f"""
 <b>{cancel_title}</b>
 ━━━━━━━━━━━━━━━━━━━━━━━
 
@@ -317,7 +306,7 @@ def send_cancellation_notification(reservation, branch, staff, with_refund=False
 📞 <b>Telefon:</b> {reservation.customer_phone}
 👥 <b>Kişi Sayısı:</b> {reservation.num_people}
 🗓️ <b>Tarih/Saat:</b> {formatted_date} | ⏰ {formatted_time}
-👨‍💼 <b>Personel:</b> {staff.name}
+👨‍💼 <b>Personel:</b> {staff.name if staff else 'Belirtilmemiş'}
 
 💵 <b>Toplam Ücret:</b> ₺{reservation.total_price:.2f}{refund_info}
 🆔 <b>Rezervasyon ID:</b> #{reservation.id}{operator_info}
@@ -326,6 +315,27 @@ def send_cancellation_notification(reservation, branch, staff, with_refund=False
 ━━━━━━━━━━━━━━━━━━━━━━━
 <i>Bu mesaj otomatik olarak gönderilmiştir.</i>
 """
+
+def send_cancellation_notification(reservation, branch, staff, with_refund=False, operator_name=None):
+    """
+    Send reservation cancellation notification to the branch's Telegram channel
+    
+    Args:
+        reservation: The reservation object
+        branch: The branch object
+        staff: The staff object
+        with_refund: Whether this is a full refund cancellation
+        operator_name: Name of person who cancelled (optional)
+    """
+    # Add a debug log to track number of calls
+    logger.info(f"send_cancellation_notification called for reservation ID: {reservation.id}")
+    
+    if not branch.telegram_enabled or not branch.telegram_chat_id:
+        logger.info(f"Telegram notifications disabled for branch {branch.name}")
+        return False
+    
+    try:    
+        message = build_cancellation_message(reservation, branch, staff, with_refund, operator_name)
         
         # Send message
         logger.info(f"Attempting to send cancellation notification for reservation ID: {reservation.id}")
@@ -338,6 +348,28 @@ def send_cancellation_notification(reservation, branch, staff, with_refund=False
         logger.error(f"Detailed error: {traceback.format_exc()}")
         return False
         
+def submit_command(update, fn, *args):
+    """
+    Komutun veritabanı işini sınırlı thread havuzuna (command_executor) gönderir
+
+    Tüm thread'ler meşgulse kullanıcıya komutun sırada olduğu, kuyruk doluysa
+    komutun alınamadığı bildirilir.
+
+    Returns:
+        bool: Komut kuyruğa alındıysa True
+    """
+    from command_executor import command_executor
+
+    busy = command_executor.is_busy()
+    if command_executor.submit(fn, *args) is None:
+        update.message.reply_text("❌ Sistem şu anda yoğun, komut alınamadı. Lütfen biraz sonra tekrar deneyin.")
+        return False
+    if busy:
+        update.message.reply_text(
+            f"⏳ Komutunuz kuyrukta, lütfen bekleyin. (Sırada: {command_executor.queue_depth()})"
+        )
+    return True
+
 def handle_iptal_command(update, context):
     """
     Handle /iptal [id] command - Cancel reservation but keep advance payment in revenue
@@ -356,13 +388,8 @@ def handle_iptal_command(update, context):
         operator_name = update.effective_user.full_name or update.effective_user.username or "Bilinmeyen Kullanıcı"
         from_chat_id = update.effective_chat.id
         
-        # Execute cancellation in a thread to avoid blocking bot
-        thread = threading.Thread(
-            target=process_cancellation,
-            args=(reservation_id, from_chat_id, operator_name, False),
-            daemon=True
-        )
-        thread.start()
+        # İptal, botu bekletmemek için sınırlı komut havuzunda işlenir
+        submit_command(update, process_cancellation, reservation_id, from_chat_id, operator_name, False)
         
     except Exception as e:
         logger.error(f"Error in iptal command: {e}")
@@ -386,31 +413,159 @@ def handle_iade_command(update, context):
         operator_name = update.effective_user.full_name or update.effective_user.username or "Bilinmeyen Kullanıcı"
         from_chat_id = update.effective_chat.id
         
-        # Execute cancellation in a thread to avoid blocking bot
-        thread = threading.Thread(
-            target=process_cancellation,
-            args=(reservation_id, from_chat_id, operator_name, True),
-            daemon=True
-        )
-        thread.start()
+        # İptal, botu bekletmemek için sınırlı komut havuzunda işlenir
+        submit_command(update, process_cancellation, reservation_id, from_chat_id, operator_name, True)
         
     except Exception as e:
         logger.error(f"Error in iade command: {e}")
         update.message.reply_text(f"Hata oluştu: {str(e)}")
 
+def parse_rez_args(args):
+    """
+    /rez komutunun argümanlarını çözümler
+
+    Örnekler: /rez, /rez 3g, /rez 3g 20, /rez 3g 20 20250115-1930-42
+
+    Returns:
+        tuple: (gün sayısı veya None, sayfa boyutu, imleç veya None)
+
+    Raises:
+        ValueError: Tanınmayan argümanda
+    """
+    days, limit, cursor = None, REZ_DEFAULT_LIMIT, None
+    for arg in args or []:
+        arg = arg.strip().lower()
+        if re.fullmatch(r'\d+g', arg):
+            days = max(1, int(arg[:-1]))
+        elif arg.isdigit():
+            limit = max(1, min(int(arg), REZ_MAX_LIMIT))
+        elif decode_rez_cursor(arg):
+            cursor = arg
+        else:
+            raise ValueError(arg)
+    return days, limit, cursor
+
+def encode_rez_cursor(reservation):
+    """Sayfanın son rezervasyonundan sonraki sayfanın imlecini oluşturur (YYYYMMDD-HHMM-id)"""
+    return f"{reservation.reservation_date.strftime('%Y%m%d')}-{reservation.reservation_time.strftime('%H%M')}-{reservation.id}"
+
+def decode_rez_cursor(cursor):
+    """
+    İmleci (tarih, saat, id) üçlüsüne çevirir
+
+    Returns:
+        tuple veya None: Geçersiz imleçte None
+    """
+    if not cursor:
+        return None
+    try:
+        date_part, time_part, reservation_id = cursor.split('-')
+        position = datetime.strptime(f"{date_part}{time_part}", '%Y%m%d%H%M')
+        return position.date(), position.time(), int(reservation_id)
+    except ValueError:
+        return None
+
+def upcoming_reservations_query(branch_id, days=None, cursor=None, now=None):
+    """
+    Şubenin yaklaşan (iptal edilmemiş) rezervasyonları için (tarih, saat, id) sıralı sorgu
+
+    ix_reservations_active_branch_date_time indeksi üzerinde aralık taraması yapar.
+
+    Args:
+        branch_id: Şube ID
+        days: Bugünden itibaren kaç gün (None: tüm gelecek)
+        cursor: Önceki sayfanın imleci
+        now: Şu anki zaman (varsayılan: datetime.now())
+    """
+    from models import Reservation
+    from sqlalchemy import tuple_
+
+    now = now or datetime.now()
+    today = now.date()
+
+    query = Reservation.query.filter(
+        Reservation.branch_id == branch_id,
+        Reservation.is_canceled == False,  # İptal edilmemiş rezervasyonları filtrele
+        Reservation.reservation_date >= today,  # İndeks aralık taraması için alt sınır
+        # Bugünün geçmiş saatleri hariç
+        tuple_(Reservation.reservation_date, Reservation.reservation_time) >= (today, now.time().replace(microsecond=0))
+    )
+    if days:
+        query = query.filter(Reservation.reservation_date < today + timedelta(days=days))
+
+    position = decode_rez_cursor(cursor)
+    if position:
+        query = query.filter(
+            Reservation.reservation_date >= position[0],
+            tuple_(Reservation.reservation_date, Reservation.reservation_time, Reservation.id) > position
+        )
+
+    return query.order_by(
+        Reservation.reservation_date,
+        Reservation.reservation_time,
+        Reservation.id
+    )
+
+def fetch_upcoming_reservations(branch_id, days=None, limit=REZ_DEFAULT_LIMIT, cursor=None, now=None):
+    """
+    Yaklaşan rezervasyonların bir sayfasını getirir (en fazla limit + 1 satır okunur)
+
+    Returns:
+        tuple: (rezervasyonlar, sonraki sayfa imleci veya None)
+    """
+    reservations = upcoming_reservations_query(branch_id, days, cursor, now).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(reservations) > limit:
+        reservations = reservations[:limit]
+        next_cursor = encode_rez_cursor(reservations[-1])
+    return reservations, next_cursor
+
+def split_message_chunks(lines, limit=TELEGRAM_MESSAGE_LIMIT):
+    """
+    Satırları Telegram uzunluk sınırını aşmayan mesajlara böler (satırlar bölünmez)
+
+    Returns:
+        list: Mesaj metinleri
+    """
+    chunks = []
+    current = []
+    current_length = 0
+    for line in lines:
+        if len(line) > limit:
+            line = line[:limit - 1] + "…"
+        added_length = len(line) + (1 if current else 0)
+        if current and current_length + added_length > limit:
+            chunks.append("\n".join(current))
+            current, current_length = [], 0
+            added_length = len(line)
+        current.append(line)
+        current_length += added_length
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
 def handle_rez_command(update, context):
     """
-    Handle /rez command - List all upcoming reservations sorted by date and time
+    Handle /rez command - List upcoming reservations sorted by date and time
+
+    Kullanım: /rez [Ng] [adet] [imleç] - örn. /rez 3g (önümüzdeki 3 gün), /rez 3g 20.
+    Sonuçlar sayfalanır; sonraki sayfa için mesajın sonundaki komut kullanılır.
+    Uzun listeler 4096 karakteri aşmayan birden fazla mesaja bölünür.
     """
     try:
         logger.info(f"Received /rez command in chat {update.effective_chat.id}")
         chat_id = update.effective_chat.id
         
+        try:
+            days, limit, cursor = parse_rez_args(context.args)
+        except ValueError:
+            update.message.reply_text("❌ Kullanım: /rez [gün]g [adet] - örn. /rez 3g veya /rez 3g 20")
+            return
+        
         # Import models and app within the function to avoid circular imports
-        from models import db, Reservation, Branch
+        from models import Branch
         from app import app
-        from datetime import datetime, date
-        from sqlalchemy import and_, or_
         
         # Use application context
         with app.app_context():
@@ -421,37 +576,20 @@ def handle_rez_command(update, context):
                 update.message.reply_text("❌ Bu Telegram grubu herhangi bir şube ile ilişkilendirilmemiş.")
                 return
             
-            # Get upcoming reservations for this branch
-            today = date.today()
-            now = datetime.now()
-            
-            # Select both today's future reservations and all upcoming days
-            # İptal edilmeyen rezervasyonları filtrele - bu çok önemli!
-            reservations = Reservation.query.filter(
-                and_(
-                    Reservation.branch_id == branch.id,
-                    Reservation.is_canceled == False,  # İptal edilmemiş rezervasyonları filtrele
-                    or_(
-                        # Today but after current time
-                        and_(
-                            Reservation.reservation_date == today,
-                            Reservation.reservation_time >= now.time()
-                        ),
-                        # Future days
-                        Reservation.reservation_date > today
-                    )
-                )
-            ).order_by(
-                Reservation.reservation_date, 
-                Reservation.reservation_time
-            ).all()
+            reservations, next_cursor = fetch_upcoming_reservations(branch.id, days, limit, cursor)
             
             if not reservations:
-                update.message.reply_text("📅 Önümüzdeki günlerde hiç rezervasyon bulunmuyor.")
+                if cursor:
+                    update.message.reply_text("📅 Başka rezervasyon bulunmuyor.")
+                elif days:
+                    update.message.reply_text(f"📅 Önümüzdeki {days} günde hiç rezervasyon bulunmuyor.")
+                else:
+                    update.message.reply_text("📅 Önümüzdeki günlerde hiç rezervasyon bulunmuyor.")
                 return
                 
             # Format reservations list
-            message_lines = [f"📋 <b>{branch.name} - Yaklaşan Rezervasyonlar</b>"]
+            period = f" ({days} gün)" if days else ""
+            message_lines = [f"📋 <b>{html.escape(branch.name)} - Yaklaşan Rezervasyonlar{period}</b>"]
             message_lines.append("━━━━━━━━━━━━━━━━━━━━━━━")
             
             current_date = None
@@ -477,15 +615,19 @@ def handle_rez_command(update, context):
                 
                 # Add reservation details
                 message_lines.append(
-                    f"⏰ <b>{time_str}</b> | {payment_emoji} | {people_emoji} {r.num_people} | {r.customer_name} | 📞 {r.customer_phone} | 🆔 <code>{r.id}</code>"
+                    f"⏰ <b>{time_str}</b> | {payment_emoji} | {people_emoji} {r.num_people} | {html.escape(r.customer_name)} | 📞 {html.escape(r.customer_phone)} | 🆔 <code>{r.id}</code>"
                 )
             
-            # Join all lines and send message
             message_lines.append("\n━━━━━━━━━━━━━━━━━━━━━━━")
+            if next_cursor:
+                next_command = " ".join(part for part in ["/rez", f"{days}g" if days else "", str(limit), next_cursor] if part)
+                message_lines.append(f"➡️ Sonraki sayfa: <code>{next_command}</code>")
             message_lines.append("<i>📝 Detaylar için: /detay [id]</i>")
             message_lines.append("<i>❌ İptal için: /iptal [id] veya /iade [id]</i>")
-            message = "\n".join(message_lines)
-            update.message.reply_html(message)
+            
+            # Mesajı Telegram sınırını aşmayacak parçalar halinde gönder
+            for chunk in split_message_chunks(message_lines):
+                update.message.reply_html(chunk)
             
     except Exception as e:
         logger.error(f"Error in rez command: {e}")
@@ -626,6 +768,7 @@ def process_cancellation(reservation_id, chat_id, operator_name, with_refund):
         from models import db, Reservation, Branch, Staff, Log
         from flask import current_app
         from app import app
+        from report_service import reservation_stat_snapshot, apply_daily_stats_change
         
         # Use application context
         with app.app_context():
@@ -666,6 +809,9 @@ def process_cancellation(reservation_id, chat_id, operator_name, with_refund):
             # Calculate advance payment for revenue tracking
             advance_amount = (reservation.advance_payment_percentage / 100) * reservation.total_price
             
+            # İptal öncesi rapor katkısını sakla
+            stats_before = reservation_stat_snapshot(reservation)
+            
             # Set is_canceled flag instead of deleting the reservation
             reservation.is_canceled = True
             reservation.cancel_type = cancel_type
@@ -675,6 +821,9 @@ def process_cancellation(reservation_id, chat_id, operator_name, with_refund):
                 reservation.cancel_revenue = advance_amount
             else:
                 reservation.cancel_revenue = 0
+            
+            # Günlük rapor özetini aynı transaction içinde güncelle
+            apply_daily_stats_change(before=stats_before, after=reservation_stat_snapshot(reservation))
                 
             # Add log entry
             Log.add_log(
@@ -685,15 +834,26 @@ def process_cancellation(reservation_id, chat_id, operator_name, with_refund):
                 branch_id=branch_id
             )
             
-            # Değişiklikleri kaydet
-            db.session.commit()
-            
-            # Send notification of successful cancellation
-            send_cancellation_notification(reservation, branch, staff, with_refund, operator_name)
+            # Bildirim ve onay mesajı iptal ile aynı transaction içinde kuyruğa alınır (outbox)
+            from outbox import enqueue_message
+            if branch.telegram_enabled and branch.telegram_chat_id:
+                enqueue_message(
+                    branch.telegram_chat_id,
+                    build_cancellation_message(reservation, branch, staff, with_refund, operator_name),
+                    kind='RESERVATION_CANCEL',
+                    dedupe_key=f"reservation:{reservation.id}:cancel"
+                )
             
             # Confirm to the user who issued the command
             action_type = "tam iade ile" if with_refund else ""
-            send_message(chat_id, f"✅ #{reservation_id} numaralı rezervasyon {action_type} başarıyla iptal edildi!")
+            enqueue_message(
+                chat_id,
+                f"✅ #{reservation_id} numaralı rezervasyon {action_type} başarıyla iptal edildi!",
+                kind='COMMAND_REPLY'
+            )
+            
+            # Değişiklikleri kaydet
+            db.session.commit()
         
     except Exception as e:
         logger.error(f"Error processing cancellation: {e}")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Müşteri araması için veritabanı şemasını günceller
+
+- customers.phone_digits sütununu ekler ve mevcut kayıtlar için doldurur
+- customers.updated_at indeksini oluşturur
+- PostgreSQL'de pg_trgm GIN indekslerini, SQLite'ta FTS5 gölge tablosunu oluşturur
+"""
+from sqlalchemy import text, inspect
+from app import app, db
+from models import normalize_phone
+from customer_search import ensure_search_indexes
+
+BATCH_SIZE = 1000
+
+with app.app_context():
+    dialect = db.engine.dialect.name
+    columns = [column['name'] for column in inspect(db.engine).get_columns('customers')]
+    
+    # phone_digits sütununu ekle
+    if 'phone_digits' not in columns:
+        db.session.execute(text("ALTER TABLE customers ADD COLUMN phone_digits VARCHAR(20)"))
+        db.session.commit()
+        print("phone_digits sütunu eklendi.")
+    else:
+        print("phone_digits sütunu zaten mevcut.")
+    
+    # Mevcut kayıtlar için phone_digits değerini doldur
+    if dialect == 'postgresql':
+        result = db.session.execute(text(
+            "UPDATE customers SET phone_digits = regexp_replace(phone, '\\D', '', 'g') WHERE phone_digits IS NULL"
+        ))
+        db.session.commit()
+        print(f"{result.rowcount} müşteri için phone_digits dolduruldu.")
+    else:
+        updated = 0
+        while True:
+            rows = db.session.execute(text(
+                "SELECT id, phone FROM customers WHERE phone_digits IS NULL LIMIT :limit"
+            ), {'limit': BATCH_SIZE}).all()
+            if not rows:
+                break
+            for customer_id, phone in rows:
+                db.session.execute(
+                    text("UPDATE customers SET phone_digits = :digits WHERE id = :id"),
+                    {'digits': normalize_phone(phone), 'id': customer_id}
+                )
+            db.session.commit()
+            updated += len(rows)
+        print(f"{updated} müşteri için phone_digits dolduruldu.")
+    
+    # B-tree indeksleri
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_customers_phone_digits ON customers (phone_digits)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_customers_updated_at ON customers (updated_at)"))
+    db.session.commit()
+    print("phone_digits ve updated_at indeksleri oluşturuldu/doğrulandı.")
+    
+    # Trigram / FTS5 arama indeksleri
+    try:
+        if ensure_search_indexes():
+            print(f"Müşteri arama indeksleri oluşturuldu/doğrulandı ({dialect}).")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Arama indeksleri oluşturulurken hata: {e}")
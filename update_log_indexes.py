@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+Log tablosu için sorgu indekslerini oluşturur
+
+- models.Log.__table_args__ içindeki indeksleri oluşturur (tekrar çalıştırılabilir)
+- PostgreSQL'de indeksler tabloyu kilitlememek için CONCURRENTLY ile oluşturulur
+"""
+from app import app
+from models import Log
+from db_indexes import create_table_indexes
+
+with app.app_context():
+    create_table_indexes(Log.__table__)
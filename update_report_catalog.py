@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Aylık rapor kataloğunu (archived_reports) oluşturur
+
+- Tabloyu oluşturur (yoksa)
+- static/reports dizinindeki, katalogda olmayan PDF'leri kataloğa ekler (tekrar çalıştırılabilir)
+"""
+import os
+from app import app, db
+from models import ArchivedReport
+from report_catalog import sync_report_catalog
+
+with app.app_context():
+    ArchivedReport.__table__.create(db.engine, checkfirst=True)
+    print("archived_reports tablosu oluşturuldu/doğrulandı.")
+
+    added, skipped = sync_report_catalog(os.path.join('static', 'reports'))
+    print(f"{added} rapor kataloğa eklendi.")
+    for file_name in skipped:
+        print(f"Dosya adı çözümlenemedi, atlandı: {file_name}")
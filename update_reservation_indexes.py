@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Rezervasyon tablosu için sorgu indekslerini oluşturur
+
+- models.Reservation.__table_args__ içindeki indeksleri oluşturur (tekrar çalıştırılabilir)
+- PostgreSQL'de indeksler tabloyu kilitlememek için CONCURRENTLY ile oluşturulur;
+  iptal edilmemiş rezervasyonlar için kısmi (partial) indeks de buna dahildir
+- Oluşturmadan önce ve sonra sık kullanılan sorguların EXPLAIN planlarını yazdırır
+"""
+from app import app, db
+from models import Reservation
+from db_indexes import create_table_indexes
+from explain_reservation_queries import print_plans
+
+with app.app_context():
+    print_plans('İndekslerden önce')
+    db.session.rollback()
+
+    create_table_indexes(Reservation.__table__)
+
+    print_plans('İndekslerden sonra')
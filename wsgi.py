@@ -63,6 +63,10 @@ if __name__ == "__main__":
             # Normal polling modunda başlat
             logger.info("Telegram botu polling modunda başlatılıyor...")
             telegram_service.start_telegram_bot()
+        
+        # Outbox'taki bildirimleri bu süreçte gönder (gunicorn'da bot_worker.py gönderir)
+        from outbox import outbox_dispatcher
+        outbox_dispatcher.start()
             
         # Uygulama durduğunda bot'u da durdur
         import atexit